@@ -0,0 +1,1517 @@
+"""
+Incremental document ingestion for challenge 1.
+
+Runs the same steps as 1.document-processing.ipynb and 2.document-vectorization.ipynb
+(upload → process → chunk → index) but keeps a content-hash manifest, so a rerun only
+uploads, processes and re-indexes files that are new or changed, and removes the blobs
+and search chunks of files that were deleted. The search index is created if it is missing,
+and chunks the notebook indexed under random IDs are replaced the first time a file is indexed.
+
+Usage:
+    python ingestion.py              # ingest new and changed files
+    python ingestion.py --dry-run    # show what would change
+    python ingestion.py --force      # ignore the manifest and redo everything
+"""
+import io
+import os
+import math
+import re
+import sys
+import json
+import sqlite3
+import base64
+import time
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Configuration
+class Config:
+    # Storage configuration
+    AZURE_STORAGE_CONNECTION_STRING = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
+
+    # Set to a local directory to use the filesystem stand-in instead of Azure Storage
+    BLOB_STORAGE_ROOT = os.getenv('BLOB_STORAGE_ROOT')
+    BLOB_TRANSFER_WORKERS = int(os.getenv('BLOB_TRANSFER_WORKERS', '4'))
+    BLOB_BLOCK_CONCURRENCY = int(os.getenv('BLOB_BLOCK_CONCURRENCY', '4'))
+    BLOB_BLOCK_SIZE = int(os.getenv('BLOB_BLOCK_SIZE', str(4 * 1024 * 1024)))
+    BLOB_INFLIGHT_BYTES = int(os.getenv('BLOB_INFLIGHT_BYTES', str(64 * 1024 * 1024)))
+
+    # Azure OpenAI configuration
+    AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
+    AZURE_OPENAI_API_KEY = os.getenv('AZURE_OPENAI_KEY')
+    AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION', '2024-02-15-preview')
+    AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4.1-mini')
+    # Deployment quota; 0 disables the limit
+    AZURE_OPENAI_RPM = int(os.getenv('AZURE_OPENAI_RPM', '0'))
+    AZURE_OPENAI_TPM = int(os.getenv('AZURE_OPENAI_TPM', '0'))
+    AZURE_OPENAI_MAX_RETRIES = int(os.getenv('AZURE_OPENAI_MAX_RETRIES', '5'))
+    # Structured outputs (claim extraction) need a newer API version than the vision calls
+    AZURE_OPENAI_STRUCTURED_API_VERSION = os.getenv('AZURE_OPENAI_STRUCTURED_API_VERSION', '2024-08-01-preview')
+
+    # Cosmos DB crash reports; the claims stage is skipped when COSMOS_ENDPOINT is not set
+    COSMOS_ENDPOINT = os.getenv('COSMOS_ENDPOINT')
+    COSMOS_KEY = os.getenv('COSMOS_KEY')
+    COSMOS_DATABASE = 'insurance_claims'
+    COSMOS_CONTAINER = 'crash_reports'
+
+    # Client-side embeddings for content_vector; set INGESTION_EMBEDDINGS=none to upload text only
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT', 'text-embedding-ada-002')
+    INGESTION_EMBEDDINGS = os.getenv('INGESTION_EMBEDDINGS', 'client')
+    EMBEDDING_BATCH_INPUTS = int(os.getenv('EMBEDDING_BATCH_INPUTS', '256'))
+    EMBEDDING_BATCH_TOKENS = int(os.getenv('EMBEDDING_BATCH_TOKENS', '64000'))
+    EMBEDDING_MAX_INPUT_TOKENS = 8191
+    EMBEDDING_CACHE_PATH = Path(os.getenv('EMBEDDING_CACHE_PATH', Path(__file__).resolve().parent / 'embedding_cache.sqlite'))
+    AZURE_OPENAI_EMBEDDING_RPM = int(os.getenv('AZURE_OPENAI_EMBEDDING_RPM', '0'))
+    AZURE_OPENAI_EMBEDDING_TPM = int(os.getenv('AZURE_OPENAI_EMBEDDING_TPM', '0'))
+
+    # Image pre-processing before the vision call
+    IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '1024'))
+    IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '85'))
+    IMAGE_DEDUPE = os.getenv('IMAGE_DEDUPE', 'true').lower() == 'true'
+
+    # Parallel processing
+    PROCESSING_WORKERS = int(os.getenv('INGESTION_WORKERS', '8'))
+
+    # Azure AI Search configuration
+    SEARCH_SERVICE_ENDPOINT = os.getenv('SEARCH_SERVICE_ENDPOINT')
+    SEARCH_ADMIN_KEY = os.getenv('SEARCH_ADMIN_KEY')
+    SEARCH_INDEX_NAME = 'insurance-documents-index'
+    CHUNK_SIZE = 1000  # Characters per chunk
+    CHUNK_OVERLAP = 200  # Overlap between chunks
+
+    # Container names
+    POLICIES_CONTAINER = 'policies'
+    CLAIMS_CONTAINER = 'claims'
+    PROCESSED_CONTAINER = 'processed-documents'
+    STATEMENTS_CONTAINER = 'statements'
+    PROCESSED_BLOB = 'processed_documents_for_vectorization.json'
+
+    # Local data paths
+    DATA_DIR = Path(__file__).resolve().parent / 'data'
+    POLICIES_DIR = DATA_DIR / 'policies'
+    CLAIMS_DIR = DATA_DIR / 'claims'
+    STATEMENTS_DIR = DATA_DIR / 'statements'
+    MANIFEST_PATH = Path(os.getenv('INGESTION_MANIFEST', Path(__file__).resolve().parent / 'ingestion_manifest.json'))
+    # Rewrite the manifest after this many completed files or seconds, whichever comes first
+    MANIFEST_SAVE_EVERY = int(os.getenv('MANIFEST_SAVE_EVERY', '25'))
+    MANIFEST_SAVE_SECONDS = float(os.getenv('MANIFEST_SAVE_SECONDS', '5'))
+
+# Source directory, blob container and results category for each document kind
+SOURCES = [
+    (Config.POLICIES_DIR, Config.POLICIES_CONTAINER, "policies"),
+    (Config.STATEMENTS_DIR, Config.STATEMENTS_CONTAINER, "statements"),
+    (Config.CLAIMS_DIR, Config.CLAIMS_CONTAINER, "claims"),
+]
+
+# Only policies are indexed for search, as in the vectorization notebook
+INDEXED_CATEGORIES = ("policies",)
+
+IMAGE_SYSTEM_PROMPT = """You are an expert insurance claims analyst with advanced image analysis capabilities.
+                        Your task is to provide detailed, professional descriptions of insurance-related images, particularly vehicle damage and accident scenes.
+
+                        Focus on:
+                        - Type of vehicle and visible damage
+                        - Location and extent of damage (scratches, dents, broken parts, etc.)
+                        - Environmental context (road conditions, weather signs, location type)
+                        - Any visible people, other vehicles, or relevant objects
+                        - Overall severity assessment
+                        - Any safety concerns or hazards visible
+
+                        Provide clear, objective descriptions that would be useful for insurance claim processing and risk assessment."""
+IMAGE_MAX_TOKENS = 4000
+
+# Crash statement/photo → claim ID, as in 1.document-processing.ipynb (crash4 is a second crash on CL001)
+CRASH_CLAIMS = {
+    'crash1': 'CL001',
+    'crash2': 'CL002',
+    'crash3': 'CL003',
+    'crash4': 'CL001',
+    'crash5': 'CL004',
+}
+
+CLAIM_SYSTEM_PROMPT = """You are an expert insurance claims processor. Extract structured information from crash statements and insurance claims.
+                    If any field is not available in the text, use "N/A" as the value.
+                    Be thorough and accurate in extracting all available information."""
+CLAIM_MAX_TOKENS = 2000
+# The notebook's ClaimInfo model, as a strict JSON schema so pydantic is not needed
+CLAIM_INFO_FIELDS = [
+    'claimant_id', 'policyholder_name', 'policyholder_address', 'policyholder_phone', 'policyholder_email',
+    'policy_number', 'vehicle_year_make_model', 'vehicle_color', 'vehicle_vin', 'vehicle_license_plate',
+    'incident_date', 'incident_time', 'incident_location', 'incident_description', 'damage_description',
+    'witness_name', 'witness_phone', 'police_department', 'police_report_number', 'repair_shop_name',
+    'repair_shop_address', 'attachments', 'claim_request', 'signature_name', 'signature_date',
+]
+CLAIM_INFO_SCHEMA = {
+    "name": "ClaimInfo",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {field: {"type": "string"} for field in CLAIM_INFO_FIELDS},
+        "required": CLAIM_INFO_FIELDS,
+        "additionalProperties": False
+    }
+}
+# Prompt tokens an image costs at high detail, for rate-limit accounting
+IMAGE_TOKEN_ESTIMATE = 1100
+
+def sha256_file(file_path: Path) -> str:
+    """Content hash of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class TextChunker:
+    """Class to handle intelligent text chunking for search index"""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize text"""
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\n+', '\n', text)
+        return text.strip()
+
+    def chunk_text_for_search(self, text: str, metadata: Dict) -> List[Dict]:
+        """Create chunks optimized for search index"""
+        text = self.clean_text(text)
+        chunks = []
+
+        if len(text) <= self.chunk_size:
+            return [{
+                'content': text,
+                'chunk_id': 0,
+                'chunk_count': 1,
+                'metadata': metadata.copy()
+            }]
+
+        # Simple sliding window chunking
+        start = 0
+        chunk_id = 0
+
+        while start < len(text):
+            end = start + self.chunk_size
+
+            # Try to break at sentence boundaries
+            if end < len(text):
+                sentence_end = text.rfind('.', start, end)
+                if sentence_end > start:
+                    end = sentence_end + 1
+
+            chunk_text = text[start:end].strip()
+
+            if chunk_text:
+                chunks.append({
+                    'content': chunk_text,
+                    'chunk_id': chunk_id,
+                    'chunk_count': 0,  # Will be updated later
+                    'metadata': metadata.copy()
+                })
+                chunk_id += 1
+
+            # Move start position with overlap
+            start = max(start + self.chunk_size - self.chunk_overlap, end)
+
+        # Update chunk count
+        for chunk in chunks:
+            chunk['chunk_count'] = len(chunks)
+
+        return chunks
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at capacity per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait_time(self, amount: float) -> float:
+        """Take amount if available and return 0, else return the seconds until it will be"""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+class RateLimiter:
+    """
+    Client-side limiter for an Azure OpenAI deployment's RPM and TPM quota. Every call takes one
+    request and its estimated tokens (prompt + max_tokens, which is how the quota is charged)
+    before it is sent, and a 429 pauses all workers for the server's Retry-After.
+    """
+
+    def __init__(self, rpm: int = Config.AZURE_OPENAI_RPM, tpm: int = Config.AZURE_OPENAI_TPM,
+                 max_retries: int = Config.AZURE_OPENAI_MAX_RETRIES):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_retries = max_retries
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def acquire(self, estimated_tokens: int):
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay <= 0 and self.requests:
+                delay = self.requests.wait_time(1)
+            if delay <= 0 and self.tokens:
+                delay = self.tokens.wait_time(estimated_tokens)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def call(self, fn, estimated_tokens: int):
+        """Run fn() under the limiter, retrying 429s after Retry-After (or exponential backoff)"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated_tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = retry_after_seconds(e) or min(2 ** attempt, 60)
+                self.throttled += 1
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                print(f"⏳ Rate limited (429), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, 'status_code', None) == 429 or "429" in str(error) or "RateLimit" in type(error).__name__
+
+def retry_after_seconds(error: Exception) -> float:
+    """Server-requested delay from the Retry-After headers or message of a 429, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    match = re.search(r"retry after (\d+) second", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else 0.0
+
+def vision_token_estimate(width: int, height: int) -> int:
+    """Image tokens at high detail: fit in 2048x2048, shortest side to 768, then 170 per 512px tile + 85"""
+    if not width or not height:
+        return IMAGE_TOKEN_ESTIMATE
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
+
+class ImagePreprocessor:
+    """
+    Shrinks claim photos before they are sent to the vision model: applies the EXIF orientation,
+    downscales to IMAGE_MAX_DIMENSION, and re-encodes as JPEG at IMAGE_JPEG_QUALITY without EXIF
+    metadata. Also computes a 64-bit difference hash (dHash) used to skip duplicate photos.
+    Without Pillow the original bytes are sent unchanged.
+    """
+
+    def __init__(self, max_dimension: int = Config.IMAGE_MAX_DIMENSION, quality: int = Config.IMAGE_JPEG_QUALITY):
+        self.max_dimension = max_dimension
+        self.quality = quality
+
+    def prepare(self, file_path: Path) -> Dict:
+        started = time.perf_counter()
+        original = file_path.read_bytes()
+        prepared = {
+            "bytes": original,
+            "format": "png" if file_path.suffix.lower() == ".png" else "jpeg",
+            "phash": None,
+            "original_size_bytes": len(original),
+            "original_dimensions": None,
+            "dimensions": None
+        }
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            print("⚠️ Pillow not installed - sending images without pre-processing")
+            prepared["phash"] = hashlib.sha256(original).hexdigest()[:16]
+            prepared["preprocess_seconds"] = time.perf_counter() - started
+            return prepared
+
+        with Image.open(io.BytesIO(original)) as image:
+            prepared["original_dimensions"] = list(image.size)
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            prepared["phash"] = self.dhash(image)
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+            buffer = io.BytesIO()
+            # No exif= argument, so metadata is dropped
+            image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+            prepared["dimensions"] = list(image.size)
+
+        # Keep the original if re-encoding didn't help (already small, heavily compressed files)
+        if buffer.tell() < len(original):
+            prepared["bytes"] = buffer.getvalue()
+            prepared["format"] = "jpeg"
+        else:
+            prepared["dimensions"] = prepared["original_dimensions"]
+        prepared["preprocess_seconds"] = time.perf_counter() - started
+        return prepared
+
+    def fingerprint(self, file_path: Path) -> str:
+        """The dHash prepare() would record, without re-encoding or keeping the image bytes"""
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return hashlib.sha256(file_path.read_bytes()).hexdigest()[:16]
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            return self.dhash(image)
+
+    @staticmethod
+    def dhash(image) -> str:
+        """Difference hash: compare adjacent pixels of a 9x8 grayscale thumbnail"""
+        small = image.convert("L").resize((9, 8))
+        pixels = list(small.getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return f"{bits:016x}"
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for batching and rate limiting"""
+    return len(text) // 4 + 1
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store in SQLite, keyed by (model, SHA-256 of the input text).
+    Vectors are stored as float32 blobs.
+    """
+
+    def __init__(self, path: Path = Config.EMBEDDING_CACHE_PATH):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, dimensions INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self.connection.commit()
+
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        import array
+
+        found = {}
+        unique = list(dict.fromkeys(text_hashes))
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = self.connection.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [model, *batch]
+            )
+            for text_hash, blob in rows:
+                found[text_hash] = array.array('f', blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        import array
+
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dimensions, vector) VALUES (?, ?, ?, ?)",
+            [(model, text_hash, len(vector), array.array('f', vector).tobytes()) for text_hash, vector in vectors.items()]
+        )
+        self.connection.commit()
+
+    def count(self, model: str = None) -> int:
+        if model:
+            return self.connection.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+        return self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+class BatchEmbedder:
+    """
+    Embeds texts through the cache: only texts never embedded with this model reach the API, and
+    those are sent many per request, packed up to EMBEDDING_BATCH_INPUTS / EMBEDDING_BATCH_TOKENS.
+    """
+
+    def __init__(self, openai_client, model: str = Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT, cache: EmbeddingCache = None,
+                 rate_limiter: RateLimiter = None, max_inputs: int = Config.EMBEDDING_BATCH_INPUTS,
+                 max_tokens: int = Config.EMBEDDING_BATCH_TOKENS):
+        self.openai_client = openai_client
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+        self.rate_limiter = rate_limiter or RateLimiter(Config.AZURE_OPENAI_EMBEDDING_RPM, Config.AZURE_OPENAI_EMBEDDING_TPM)
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.stats = {'cache_hits': 0, 'embedded': 0, 'api_calls': 0}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        hashes = [sha256_text(text) for text in texts]
+        vectors = self.cache.get_many(self.model, hashes)
+        missing = {text_hash: text for text_hash, text in zip(hashes, texts) if text_hash not in vectors}
+        self.stats['cache_hits'] += len(texts) - sum(1 for text_hash in hashes if text_hash in missing)
+
+        for batch in self._batches(list(missing.items())):
+            fresh = self._embed_batch(batch)
+            self.cache.put_many(self.model, fresh)
+            vectors.update(fresh)
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def _batches(self, items: List[tuple]):
+        batch, batch_tokens = [], 0
+        for text_hash, text in items:
+            tokens = min(estimate_tokens(text), Config.EMBEDDING_MAX_INPUT_TOKENS)
+            if batch and (len(batch) >= self.max_inputs or batch_tokens + tokens > self.max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append((text_hash, text))
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: List[tuple]) -> Dict[str, List[float]]:
+        response = self.rate_limiter.call(
+            lambda: self.openai_client.embeddings.create(model=self.model, input=[text for _, text in batch]),
+            estimated_tokens=sum(estimate_tokens(text) for _, text in batch)
+        )
+        self.stats['api_calls'] += 1
+        self.stats['embedded'] += len(batch)
+        # Results carry the input index; don't rely on response order
+        return {batch[item.index][0]: list(item.embedding) for item in response.data}
+
+class ByteBudget:
+    """Caps the bytes buffered by concurrent transfers; acquire blocks until enough is released"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount: int) -> int:
+        amount = max(1, min(amount, self.limit))
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight + amount <= self.limit)
+            self.in_flight += amount
+        return amount
+
+    def release(self, amount: int):
+        with self.condition:
+            self.in_flight -= amount
+            self.condition.notify_all()
+
+class BlobTransfer:
+    """
+    Concurrent blob uploads and streaming downloads. Files transfer on BLOB_TRANSFER_WORKERS threads,
+    each blob in BLOB_BLOCK_CONCURRENCY parallel blocks, and every transfer reserves the memory it can
+    buffer (block size x block concurrency, or the blob size if smaller) from a shared ByteBudget.
+    """
+
+    def __init__(self, blob_service_client, workers: int = Config.BLOB_TRANSFER_WORKERS,
+                 block_concurrency: int = Config.BLOB_BLOCK_CONCURRENCY, block_size: int = Config.BLOB_BLOCK_SIZE,
+                 max_inflight_bytes: int = Config.BLOB_INFLIGHT_BYTES):
+        self.blob_service_client = blob_service_client
+        self.workers = max(1, workers)
+        self.block_concurrency = max(1, block_concurrency)
+        self.block_size = block_size
+        self.budget = ByteBudget(max_inflight_bytes)
+
+    def _reservation(self, size: int) -> int:
+        return min(size, self.block_size * self.block_concurrency)
+
+    def upload_file(self, file_path: Path, container_name: str, blob_name: str = None, overwrite: bool = True):
+        """Upload one file as a stream; large files go up as parallel blocks"""
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name or file_path.name)
+        reserved = self.budget.acquire(self._reservation(file_path.stat().st_size))
+        try:
+            with open(file_path, 'rb') as data:
+                blob_client.upload_blob(data, overwrite=overwrite, max_concurrency=self.block_concurrency)
+        finally:
+            self.budget.release(reserved)
+
+    def upload_many(self, jobs: List[tuple]):
+        """Upload (file_path, container, blob_name) jobs concurrently, yielding (job, error or None) as each finishes"""
+        if not jobs:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            futures = {executor.submit(self.upload_file, *job): job for job in jobs}
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+
+    def iter_download(self, container_name: str, blob_name: str):
+        """Stream a blob in chunks instead of buffering it with readall()"""
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        downloader = blob_client.download_blob(max_concurrency=self.block_concurrency)
+        reserved = self.budget.acquire(self._reservation(downloader.size))
+        try:
+            for chunk in downloader.chunks():
+                yield chunk
+        finally:
+            self.budget.release(reserved)
+
+    def download_file(self, container_name: str, blob_name: str, file_path: Path) -> int:
+        """Download a blob to a file via a temporary name, returning the bytes written"""
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_name(file_path.name + '.part')
+        written = 0
+        with open(tmp_path, 'wb') as f:
+            for chunk in self.iter_download(container_name, blob_name):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, file_path)
+        return written
+
+    def download_container(self, container_name: str, directory: Path) -> Dict[str, bool]:
+        """Download every blob in a container into a directory, several at a time"""
+        container_client = self.blob_service_client.get_container_client(container_name)
+        blob_names = [blob.name for blob in container_client.list_blobs()]
+        results = {}
+        if not blob_names:
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(blob_names))) as executor:
+            futures = {executor.submit(self.download_file, container_name, name, Path(directory) / name): name for name in blob_names}
+            for future in as_completed(futures):
+                name = futures[future]
+                error = future.exception()
+                results[name] = error is None
+                if error:
+                    print(f"❌ Error downloading {container_name}/{name}: {error}")
+                else:
+                    print(f"✅ Downloaded: {container_name}/{name} ({future.result() / 1024:.0f} KB)")
+        return results
+
+class LocalBlobServiceClient:
+    """
+    Filesystem stand-in for BlobServiceClient (containers are directories under root), covering the
+    calls this module makes. Select it with BLOB_STORAGE_ROOT; for the real SDK against a local
+    emulator, point AZURE_STORAGE_CONNECTION_STRING at Azurite instead.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def get_blob_client(self, container: str, blob: str):
+        return LocalBlobClient(self.root / container / blob)
+
+    def get_container_client(self, container: str):
+        return LocalContainerClient(self.root / container)
+
+class LocalContainerClient:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def create_container(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def list_blobs(self):
+        if not self.path.exists():
+            return []
+        return [_LocalBlobProperties(p.name, p.stat().st_size) for p in sorted(self.path.iterdir()) if p.is_file() and not p.name.endswith('.part')]
+
+    def get_blob_client(self, blob: str):
+        return LocalBlobClient(self.path / blob)
+
+class _LocalBlobProperties:
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+class LocalBlobClient:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def upload_blob(self, data, overwrite: bool = False, max_concurrency: int = 1, **kwargs):
+        if self.path.exists() and not overwrite:
+            raise FileExistsError(f"BlobAlreadyExists: {self.path.name}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.part')
+        with open(tmp_path, 'wb') as f:
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                for block in iter(lambda: data.read(Config.BLOB_BLOCK_SIZE), b''):
+                    f.write(block)
+        os.replace(tmp_path, self.path)
+
+    def download_blob(self, max_concurrency: int = 1, **kwargs):
+        if not self.path.exists():
+            raise FileNotFoundError(f"BlobNotFound: {self.path.name}")
+        return _LocalDownloader(self.path)
+
+    def get_blob_properties(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"BlobNotFound: {self.path.name}")
+        return _LocalBlobProperties(self.path.name, self.path.stat().st_size)
+
+    def delete_blob(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"BlobNotFound: {self.path.name}")
+        self.path.unlink()
+
+class _LocalDownloader:
+    """Mimics StorageStreamDownloader: size, chunks() and readall()"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = path.stat().st_size
+
+    def chunks(self):
+        with open(self.path, 'rb') as f:
+            for block in iter(lambda: f.read(Config.BLOB_BLOCK_SIZE), b''):
+                yield block
+
+    def readall(self) -> bytes:
+        return self.path.read_bytes()
+
+class IngestionManifest:
+    """
+    Content-hash manifest stored as JSON. One entry per source file, keyed "<container>/<file name>",
+    recording the file hash plus the hash each stage last completed for, so an interrupted run
+    resumes at the first stage that is behind.
+    """
+
+    def __init__(self, path: Path = Config.MANIFEST_PATH, save_every: int = Config.MANIFEST_SAVE_EVERY,
+                 save_seconds: float = Config.MANIFEST_SAVE_SECONDS):
+        self.path = Path(path)
+        self.files: Dict[str, Dict] = {}
+        self.save_every = max(1, save_every)
+        self.save_seconds = save_seconds
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+
+    def entry(self, key: str) -> Dict:
+        return self.files.setdefault(key, {})
+
+    def save(self):
+        """Write atomically so a crash never leaves a half-written manifest"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': datetime.now().isoformat(), 'files': self.files}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+
+    def checkpoint(self):
+        """
+        Record one completed change and save once save_every changes or save_seconds have
+        accumulated. Each save rewrites the whole file, so saving per file would be quadratic;
+        callers save() once more when their batch ends.
+        """
+        self.unsaved += 1
+        if self.unsaved >= self.save_every or time.monotonic() - self.saved_at >= self.save_seconds:
+            self.save()
+
+def vectorizer_resource_url(endpoint: str) -> str:
+    """The https://<resource>.openai.azure.com form of an Azure OpenAI endpoint that the search vectorizer expects"""
+    endpoint = (endpoint or '').rstrip('/')
+    if endpoint.endswith('.openai.azure.com'):
+        return endpoint
+    resource_name = endpoint.split('//')[-1].split('.')[0]
+    return f"https://{resource_name}.openai.azure.com"
+
+def build_search_index(index_name: str = Config.SEARCH_INDEX_NAME):
+    """The search index schema of 2.document-vectorization.ipynb. The vectorizer only embeds queries; content_vector is filled by the pipeline."""
+    from azure.search.documents.indexes.models import (
+        SearchIndex, SearchField, SearchFieldDataType, SimpleField, SearchableField,
+        VectorSearch, VectorSearchProfile, HnswAlgorithmConfiguration, ExhaustiveKnnAlgorithmConfiguration,
+        SemanticConfiguration, SemanticPrioritizedFields, SemanticField, SemanticSearch,
+        AzureOpenAIVectorizer, AzureOpenAIVectorizerParameters
+    )
+
+    vectorizer = AzureOpenAIVectorizer(
+        vectorizer_name="insurance-vectorizer",
+        parameters=AzureOpenAIVectorizerParameters(
+            resource_url=vectorizer_resource_url(Config.AZURE_OPENAI_ENDPOINT),
+            deployment_name=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            model_name="text-embedding-ada-002",
+            api_key=Config.AZURE_OPENAI_API_KEY
+        )
+    )
+    vector_search = VectorSearch(
+        algorithms=[
+            HnswAlgorithmConfiguration(name="insurance-algorithm", kind="hnsw"),
+            ExhaustiveKnnAlgorithmConfiguration(name="my-eknn-vector-config", kind="exhaustiveKnn")
+        ],
+        profiles=[VectorSearchProfile(name="insurance-profile", algorithm_configuration_name="insurance-algorithm",
+                                      vectorizer_name="insurance-vectorizer")],
+        vectorizers=[vectorizer]
+    )
+    semantic_search = SemanticSearch(configurations=[SemanticConfiguration(
+        name="insurance-semantic",
+        prioritized_fields=SemanticPrioritizedFields(
+            title_field=SemanticField(field_name="title"),
+            content_fields=[SemanticField(field_name="content")],
+            keywords_fields=[SemanticField(field_name="category"), SemanticField(field_name="file_name")]
+        )
+    )])
+    fields = [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+        SearchableField(name="title", type=SearchFieldDataType.String),
+        SearchableField(name="content", type=SearchFieldDataType.String),
+        SearchableField(name="category", type=SearchFieldDataType.String, filterable=True, facetable=True),
+        SearchableField(name="file_name", type=SearchFieldDataType.String, filterable=True),
+        SimpleField(name="file_type", type=SearchFieldDataType.String, filterable=True),
+        SimpleField(name="chunk_id", type=SearchFieldDataType.Int32),
+        SimpleField(name="chunk_count", type=SearchFieldDataType.Int32),
+        SimpleField(name="original_length", type=SearchFieldDataType.Int32),
+        SimpleField(name="chunk_length", type=SearchFieldDataType.Int32),
+        SimpleField(name="processing_date", type=SearchFieldDataType.DateTimeOffset),
+        SearchField(
+            name="content_vector",
+            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+            searchable=True,
+            vector_search_dimensions=1536,  # ada-002 embedding dimension
+            vector_search_profile_name="insurance-profile"
+        )
+    ]
+    return SearchIndex(name=index_name, fields=fields, vector_search=vector_search, semantic_search=semantic_search)
+
+def odata_string(value: str) -> str:
+    """Quote a value for an OData filter"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+class IngestionPipeline:
+    """Incremental upload → process → chunk → index pipeline driven by an IngestionManifest"""
+
+    def __init__(self, blob_service_client=None, openai_client=None, search_client=None,
+                 manifest: IngestionManifest = None, chunker: TextChunker = None, dry_run: bool = False,
+                 workers: int = Config.PROCESSING_WORKERS, rate_limiter: RateLimiter = None,
+                 embedder: BatchEmbedder = None, image_preprocessor: ImagePreprocessor = None,
+                 transfer: BlobTransfer = None, search_index_client=None, structured_client=None,
+                 cosmos_container=None):
+        self.blob_service_client = blob_service_client
+        self.openai_client = openai_client
+        self.search_client = search_client
+        self.manifest = manifest or IngestionManifest()
+        self.chunker = chunker or TextChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+        self.dry_run = dry_run
+        self.workers = max(1, workers)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.latencies: List[tuple] = []
+        self.embedder = embedder
+        self.image_preprocessor = image_preprocessor or ImagePreprocessor()
+        self.transfer = transfer or BlobTransfer(blob_service_client)
+        self.search_index_client = search_index_client
+        self.structured_client = structured_client or openai_client
+        self.cosmos_container = cosmos_container
+        self.index_created = False
+        self.reindex_all = False
+        self.stats = {'unchanged': 0, 'uploaded': 0, 'processed': 0, 'chunks_upserted': 0, 'chunks_deleted': 0, 'removed': 0,
+                      'claims_extracted': 0, 'claims_saved': 0, 'failed': 0}
+
+    # --- Search index ---
+
+    def ensure_index(self) -> bool:
+        """
+        Create the search index if it does not exist. A new index is empty, so every indexed
+        file's manifest state is reset and the whole corpus is indexed again in this run.
+        """
+        if self.search_index_client is None:
+            return False
+        try:
+            self.search_index_client.get_index(Config.SEARCH_INDEX_NAME)
+            return False
+        except Exception as e:
+            if "ResourceNotFound" not in type(e).__name__ and "not found" not in str(e).lower():
+                raise
+        self.search_index_client.create_index(build_search_index(Config.SEARCH_INDEX_NAME))
+        self.index_created = True
+        for entry in self.manifest.files.values():
+            entry.pop('indexed_sha256', None)
+            entry.pop('chunks', None)
+        self.manifest.save()
+        print(f"✅ Created search index '{Config.SEARCH_INDEX_NAME}'")
+        return True
+
+    def _untracked_chunks(self, item: Dict, keep) -> List[str]:
+        """IDs of search documents for this file that the manifest does not know, e.g. the notebook's uuid-keyed chunks"""
+        filter_expression = f"file_name eq {odata_string(item['path'].name)} and category eq {odata_string(item['category'])}"
+        results = self.search_client.search(search_text="*", filter=filter_expression, select=["id"])
+        return [doc['id'] for doc in results if doc['id'] not in keep]
+
+    # --- Change detection ---
+
+    def scan(self, sources=SOURCES, force: bool = False) -> Dict[str, List]:
+        """Compare the local files against the manifest and classify them as changed or removed"""
+        changed, seen, scanned = [], set(), set()
+        for directory, container, category in sources:
+            if not directory.exists():
+                # Never treat a missing directory as "every file deleted"
+                print(f"⚠️ Directory not found: {directory}")
+                continue
+            scanned.add(container)
+            for file_path in sorted(directory.glob('*')):
+                if not file_path.is_file():
+                    continue
+                key = f"{container}/{file_path.name}"
+                seen.add(key)
+                sha256 = sha256_file(file_path)
+                entry = self.manifest.files.get(key, {})
+                if force or entry.get('sha256') != sha256 or not self._is_complete(entry, category):
+                    changed.append({'key': key, 'path': file_path, 'container': container, 'category': category, 'sha256': sha256})
+                else:
+                    self.stats['unchanged'] += 1
+
+        removed = [key for key in self.manifest.files if key not in seen and key.split('/', 1)[0] in scanned]
+        return {'changed': changed, 'removed': removed}
+
+    def _is_complete(self, entry: Dict, category: str) -> bool:
+        """True when every stage ran against the file's current hash"""
+        sha256 = entry.get('sha256')
+        done = entry.get('uploaded_sha256') == sha256 and entry.get('processed_sha256') == sha256
+        if category in INDEXED_CATEGORIES:
+            done = done and entry.get('indexed_sha256') == sha256
+        return done
+
+    # --- Stages ---
+
+    def upload(self, item: Dict) -> bool:
+        """Upload a new or changed file to blob storage"""
+        entry = self.manifest.entry(item['key'])
+        if entry.get('uploaded_sha256') == item['sha256']:
+            return True
+        try:
+            self.transfer.upload_file(item['path'], item['container'])
+        except Exception as e:
+            return self._record_upload(item, e)
+        return self._record_upload(item, None)
+
+    def upload_many(self, items: List[Dict]) -> List[Dict]:
+        """Upload files concurrently; returns the items that are now in blob storage"""
+        pending = {(item['path'], item['container'], item['path'].name): item for item in items
+                   if self.manifest.entry(item['key']).get('uploaded_sha256') != item['sha256']}
+        if pending:
+            print(f"📤 Uploading {len(pending)} files with {min(self.transfer.workers, len(pending))} workers...")
+        try:
+            for job, error in self.transfer.upload_many(list(pending)):
+                self._record_upload(pending[job], error)
+                # An interruption loses at most one checkpoint's worth of uploads, which are redone
+                self.manifest.checkpoint()
+        finally:
+            self.manifest.save()
+        return [item for item in items if self.manifest.entry(item['key']).get('uploaded_sha256') == item['sha256']]
+
+    def _record_upload(self, item: Dict, error: Optional[Exception]) -> bool:
+        if error is not None:
+            print(f"❌ Error uploading {item['path'].name}: {error}")
+            return False
+        self.manifest.entry(item['key'])['uploaded_sha256'] = item['sha256']
+        self.stats['uploaded'] += 1
+        print(f"✅ Uploaded: {item['path'].name} → {item['container']}/{item['path'].name}")
+        return True
+
+    def process(self, item: Dict) -> bool:
+        """Prepare markdown for vectorization or describe an image with GPT, storing the result in the manifest"""
+        if self.manifest.entry(item['key']).get('processed_sha256') == item['sha256']:
+            return True
+        return self._record(item, *self._timed_process(item))
+
+    def process_many(self, items: List[Dict]) -> Dict[str, bool]:
+        """
+        Process files on a pool of worker threads. The GPT calls - image descriptions and the
+        structured extraction of crash statements - go through the rate limiter, and each claim's
+        crash report is upserted to Cosmos DB on the same pool as soon as all of its inputs are
+        settled. Results are written to the manifest from this thread as they complete.
+        """
+        pending = [item for item in items if self.manifest.entry(item['key']).get('processed_sha256') != item['sha256']]
+        outcome = {item['key']: True for item in items}
+        pending_keys = {item['key'] for item in pending}
+        extractions = [key for key in self.manifest.files if key not in pending_keys and self._needs_extraction(key)]
+        if not pending and self.cosmos_container is None:
+            return outcome
+
+        if pending:
+            print(f"⚙️ Processing {len(pending)} documents with {min(self.workers, len(pending))} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            duplicates = {}
+            if Config.IMAGE_DEDUPE:
+                # Hash-only first pass; each image is shrunk inside its own task, right before its vision call
+                images = [item for item in pending if self._is_image(item)]
+                for item, phash in zip(images, executor.map(self._fingerprint, images)):
+                    item['phash'] = phash
+                duplicates = self._find_duplicates(images)
+
+            futures = {executor.submit(self._timed_process, item): ('process', item) for item in pending if item['key'] not in duplicates}
+            for key in extractions:
+                futures[executor.submit(self._extract_claim_info, key, self.manifest.files[key]['result']['text'])] = ('extract', key)
+            # Files whose results are not final yet; a claim is saved once none of its inputs is in here
+            unsettled = pending_keys | set(extractions)
+            scheduled_claims = set()
+            try:
+                while True:
+                    if not any(kind == 'process' for kind, _ in futures.values()) and duplicates:
+                        # Duplicates reuse a source description, which may only just have completed
+                        for item in pending:
+                            if item['key'] in duplicates:
+                                outcome[item['key']] = self._record_duplicate(item, duplicates[item['key']])
+                                unsettled.discard(item['key'])
+                        duplicates = {}
+                        self.manifest.checkpoint()
+                    for report in self._ready_claim_reports(unsettled, scheduled_claims):
+                        futures[executor.submit(self._save_claim_report, report)] = ('claim', report)
+                    if not futures:
+                        break
+                    done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, payload = futures.pop(future)
+                        if kind == 'process':
+                            outcome[payload['key']] = self._record(payload, *future.result())
+                            if outcome[payload['key']] and self._needs_extraction(payload['key']):
+                                futures[executor.submit(self._extract_claim_info, payload['key'], self.manifest.files[payload['key']]['result']['text'])] = ('extract', payload['key'])
+                            else:
+                                unsettled.discard(payload['key'])
+                        elif kind == 'extract':
+                            self._record_extraction(payload, future.result())
+                            unsettled.discard(payload)
+                        else:
+                            self._record_claim_report(payload, future.result())
+                        self.manifest.checkpoint()
+            finally:
+                # Results that did complete survive an interruption
+                self.manifest.save()
+        return outcome
+
+    def _is_image(self, item: Dict) -> bool:
+        return item['path'].name.lower().endswith(('.jpg', '.jpeg', '.png'))
+
+    def _fingerprint(self, item: Dict) -> Optional[str]:
+        try:
+            return self.image_preprocessor.fingerprint(item['path'])
+        except Exception as e:
+            print(f"⚠️ Could not hash {item['path'].name}, skipping duplicate detection for it: {e}")
+            return None
+
+    def _prepare_image(self, item: Dict) -> Optional[Dict]:
+        try:
+            prepared = self.image_preprocessor.prepare(item['path'])
+        except Exception as e:
+            print(f"⚠️ Could not pre-process {item['path'].name}, sending original: {e}")
+            return None
+        before, after = prepared['original_size_bytes'], len(prepared['bytes'])
+        print(f"🗜️ {item['path'].name}: {before / 1024:.0f} KB → {after / 1024:.0f} KB "
+              f"({(after - before) / before:+.0%}), {prepared['original_dimensions']} → {prepared['dimensions']}, "
+              f"{prepared['preprocess_seconds'] * 1000:.0f} ms")
+        return prepared
+
+    def _find_duplicates(self, images: List[Dict]) -> Dict[str, str]:
+        """Map each image whose perceptual hash was already described (earlier run or this batch) to the source key"""
+        known = {
+            entry['result']['metadata'].get('phash'): key
+            for key, entry in self.manifest.files.items()
+            if entry.get('result', {}).get('description') and entry['result']['metadata'].get('phash')
+        }
+        duplicates = {}
+        for item in images:
+            phash = item.get('phash')
+            if not phash:
+                continue
+            if phash in known and known[phash] != item['key']:
+                duplicates[item['key']] = known[phash]
+                print(f"♻️ {item['path'].name} matches {known[phash]} - reusing its description")
+            else:
+                known[phash] = item['key']
+        return duplicates
+
+    def _record_duplicate(self, item: Dict, source_key: str) -> bool:
+        source = self.manifest.files.get(source_key, {}).get('result')
+        if not source or not source.get('success'):
+            # The source failed in this run; describe this copy on its own
+            return self._record(item, *self._timed_process(item))
+        result = json.loads(json.dumps(source))
+        result['metadata'].update(file_name=item['path'].name, container=item['container'], duplicate_of=source_key,
+                                  processing_date=datetime.now().isoformat())
+        return self._record(item, result, 0.0)
+
+    def _timed_process(self, item: Dict):
+        started = time.perf_counter()
+        name = item['path'].name
+        if name.lower().endswith('.md'):
+            result = self._process_markdown(item)
+        elif name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            result = self._process_image(item)
+        else:
+            print(f"⚠️ Skipping unsupported file: {name}")
+            result = None
+        return result, time.perf_counter() - started
+
+    def _record(self, item: Dict, result: Optional[Dict], seconds: float) -> bool:
+        entry = self.manifest.entry(item['key'])
+        if result is None:
+            entry['processed_sha256'] = item['sha256']
+            return True
+        self.latencies.append((item['key'], seconds))
+        if not result.get('success'):
+            return False
+        metadata = result['metadata']
+        metadata['processing_seconds'] = round(seconds, 3)
+        entry['result'] = result
+        entry['processed_sha256'] = item['sha256']
+        self.stats['processed'] += 1
+        if metadata.get('file_type') == 'image' and 'duplicate_of' not in metadata:
+            self.stats['image_bytes_before'] = self.stats.get('image_bytes_before', 0) + metadata['original_size_bytes']
+            self.stats['image_bytes_after'] = self.stats.get('image_bytes_after', 0) + metadata['image_size_bytes']
+        return True
+
+    # --- Crash reports (structured claim info → Cosmos DB) ---
+
+    def _needs_extraction(self, key: str) -> bool:
+        """True for a processed crash statement whose structured claim info is missing or stale"""
+        container, name = key.split('/', 1)
+        if self.cosmos_container is None or container != Config.STATEMENTS_CONTAINER or Path(name).stem not in CRASH_CLAIMS:
+            return False
+        entry = self.manifest.files.get(key, {})
+        return (entry.get('processed_sha256') == entry.get('sha256') and entry.get('result', {}).get('success', False)
+                and entry.get('structured_sha256') != entry.get('sha256'))
+
+    def _extract_claim_info(self, key: str, text_content: str) -> Optional[Dict]:
+        """Structured claim info for a crash statement (extract_structured_claim_info in the notebook); runs on a worker"""
+        crash = Path(key).stem
+        claim_id = CRASH_CLAIMS[crash]
+        print(f"🔍 Extracting structured info for {crash} (Claim: {claim_id})...")
+        try:
+            response = self.rate_limiter.call(lambda: self.structured_client.chat.completions.create(
+                model=Config.AZURE_OPENAI_DEPLOYMENT_NAME,
+                messages=[
+                    {"role": "system", "content": CLAIM_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Extract the structured information from this crash statement for claim {claim_id}:\n\n{text_content}"}
+                ],
+                response_format={"type": "json_schema", "json_schema": CLAIM_INFO_SCHEMA},
+                max_tokens=CLAIM_MAX_TOKENS
+            ), estimated_tokens=estimate_tokens(CLAIM_SYSTEM_PROMPT + text_content) + CLAIM_MAX_TOKENS)
+            return json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"❌ Error extracting structured data for claim {claim_id}: {e}")
+            return None
+
+    def _record_extraction(self, key: str, structured: Optional[Dict]):
+        if structured is None:
+            self.stats['failed'] += 1
+            return
+        entry = self.manifest.entry(key)
+        entry['structured'] = structured
+        entry['structured_sha256'] = entry['sha256']
+        self.stats['claims_extracted'] += 1
+        print(f"✅ Extracted structured data for {key}")
+
+    def _current_result(self, key: str):
+        """A file's processing result if it is up to date, 'missing' if the file is unknown, else None"""
+        entry = self.manifest.files.get(key)
+        if entry is None:
+            return 'missing'
+        if entry.get('processed_sha256') != entry.get('sha256') or not entry.get('result', {}).get('success'):
+            return None
+        return entry['result']
+
+    def _claim_report(self, claim_id: str) -> Optional[Dict]:
+        """
+        The crash_reports document for a claim, combined like process_crash_reports_simplified in the
+        notebook: the first crash's structured info plus additional_crashes, and every crash photo's
+        description. None while an input failed or is stale, so an earlier report is never overwritten
+        with a partial one.
+        """
+        structured, image_descriptions = [], []
+        for crash in [crash for crash, mapped in CRASH_CLAIMS.items() if mapped == claim_id]:
+            statement_key = f"{Config.STATEMENTS_CONTAINER}/{crash}.md"
+            image_key = next((key for key in (f"{Config.CLAIMS_CONTAINER}/{crash}.jpg", f"{Config.CLAIMS_CONTAINER}/{crash}.jpeg")
+                              if key in self.manifest.files), None)
+            statement = self._current_result(statement_key)
+            image = self._current_result(image_key) if image_key else 'missing'
+            if statement is None or image is None:
+                return None
+            if statement == 'missing' or image == 'missing':
+                continue
+            entry = self.manifest.files[statement_key]
+            if entry.get('structured_sha256') != entry['sha256']:
+                return None
+            structured.append((crash, entry['structured']))
+            image_descriptions.append({"crash_number": crash, "image_file": image_key.split('/', 1)[1], "description": image['description']})
+        if not image_descriptions:
+            return None
+
+        structured_claim_info = dict(structured[0][1])
+        if len(structured) > 1:
+            structured_claim_info["additional_crashes"] = [{"crash_number": crash, "structured_data": data} for crash, data in structured[1:]]
+        return {"id": claim_id, "claim_id": claim_id, "structured_claim_info": structured_claim_info, "image_descriptions": image_descriptions}
+
+    def _ready_claim_reports(self, unsettled: set, scheduled: set) -> List[Dict]:
+        """Reports of claims whose inputs are all settled and whose content changed since the last save"""
+        if self.cosmos_container is None:
+            return []
+        reports = []
+        for claim_id in sorted(set(CRASH_CLAIMS.values()) - scheduled):
+            crashes = [crash for crash, mapped in CRASH_CLAIMS.items() if mapped == claim_id]
+            if any(key.split('/', 1)[1].rsplit('.', 1)[0] in crashes for key in unsettled):
+                continue
+            scheduled.add(claim_id)
+            report = self._claim_report(claim_id)
+            key = f"{Config.COSMOS_CONTAINER}/{claim_id}"
+            if report and self.manifest.files.get(key, {}).get('report_sha256') != sha256_text(json.dumps(report, sort_keys=True)):
+                reports.append(report)
+        return reports
+
+    def _save_claim_report(self, report: Dict) -> Optional[Exception]:
+        """Upsert a crash report into Cosmos DB; runs on a worker and returns the error instead of raising"""
+        try:
+            self.cosmos_container.upsert_item(body=report)
+        except Exception as e:
+            return e
+        return None
+
+    def _record_claim_report(self, report: Dict, error: Optional[Exception]):
+        if error is not None:
+            print(f"❌ Error saving {report['claim_id']}: {error}")
+            self.stats['failed'] += 1
+            return
+        self.manifest.entry(f"{Config.COSMOS_CONTAINER}/{report['claim_id']}")['report_sha256'] = sha256_text(json.dumps(report, sort_keys=True))
+        self.stats['claims_saved'] += 1
+        print(f"💾 Saved Claim {report['claim_id']} to Cosmos DB ({len(report['image_descriptions'])} crashes)")
+
+    def latency_report(self) -> Dict:
+        """Per-document processing latency summary for the run"""
+        if not self.latencies:
+            return {}
+        ordered = sorted(seconds for _, seconds in self.latencies)
+        percentile = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+        return {
+            "documents": len(ordered),
+            "p50_seconds": round(percentile(0.5), 3),
+            "p95_seconds": round(percentile(0.95), 3),
+            "max_seconds": round(ordered[-1], 3),
+            "slowest": [key for key, _ in sorted(self.latencies, key=lambda x: -x[1])[:3]],
+            "throttled_retries": self.rate_limiter.throttled
+        }
+
+    def _process_markdown(self, item: Dict) -> Dict:
+        content = item['path'].read_text(encoding='utf-8')
+        print(f"📄 Preparing markdown for vectorization: {item['path'].name}...")
+        return {
+            "success": True,
+            "text": content,
+            "metadata": {
+                "file_name": item['path'].name,
+                "container": item['container'],
+                "file_type": "markdown",
+                "text_length": len(content),
+                "processing_date": datetime.now().isoformat(),
+                "processing_method": "direct_vectorization",
+                "ready_for_embedding": True
+            }
+        }
+
+    def _process_image(self, item: Dict) -> Dict:
+        name = item['path'].name
+        try:
+            prepared = self._prepare_image(item)
+            if prepared is None:
+                original = item['path'].read_bytes()
+                prepared = {"bytes": original, "format": "png" if item['path'].suffix.lower() == ".png" else "jpeg",
+                            "original_size_bytes": len(original), "dimensions": None, "phash": None, "preprocess_seconds": 0.0}
+            image_bytes = prepared['bytes']
+            image_format = prepared['format']
+            base64_image = base64.b64encode(image_bytes).decode('utf-8')
+            width, height = prepared['dimensions'] or (0, 0)
+
+            print(f"🖼️ Generating description for image: {name}...")
+            vision_started = time.perf_counter()
+
+            response = self.rate_limiter.call(lambda: self.openai_client.chat.completions.create(
+                model=Config.AZURE_OPENAI_DEPLOYMENT_NAME,
+                messages=[
+                    {"role": "system", "content": IMAGE_SYSTEM_PROMPT},
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": "Please provide a detailed description of this insurance claim image. Focus on damage assessment, environmental factors, and any relevant details for insurance processing."
+                            },
+                            {"type": "image_url", "image_url": {"url": f"data:image/{image_format};base64,{base64_image}"}}
+                        ]
+                    }
+                ],
+                max_tokens=IMAGE_MAX_TOKENS,
+                temperature=0.3
+            ), estimated_tokens=len(IMAGE_SYSTEM_PROMPT) // 4 + vision_token_estimate(width, height) + IMAGE_MAX_TOKENS)
+            vision_seconds = time.perf_counter() - vision_started
+            description = response.choices[0].message.content
+            return {
+                "success": True,
+                "description": description,
+                "metadata": {
+                    "file_name": name,
+                    "container": item['container'],
+                    "file_type": "image",
+                    "image_format": image_format,
+                    "image_size_bytes": len(image_bytes),
+                    "original_size_bytes": prepared['original_size_bytes'],
+                    "image_dimensions": prepared['dimensions'],
+                    "phash": prepared['phash'],
+                    "preprocess_seconds": round(prepared['preprocess_seconds'], 3),
+                    "vision_seconds": round(vision_seconds, 3),
+                    "description_length": len(description),
+                    "processing_date": datetime.now().isoformat(),
+                    "model_used": Config.AZURE_OPENAI_DEPLOYMENT_NAME,
+                    "processing_type": "image_description",
+                    "ready_for_embedding": True
+                }
+            }
+        except Exception as e:
+            print(f"❌ Error processing {name}: {e}")
+            return {"success": False, "error": str(e)}
+
+    def chunk(self, item: Dict) -> List[Dict]:
+        """Search documents for a processed file. IDs are stable per (file, chunk number), so reruns overwrite in place."""
+        entry = self.manifest.entry(item['key'])
+        result = entry.get('result', {})
+        text_content = result.get('text', '')
+        if not text_content:
+            return []
+
+        file_name = item['path'].name
+        metadata = dict(result.get('metadata', {}), category=item['category'])
+        file_id = hashlib.md5(item['key'].encode('utf-8')).hexdigest()
+        processing_date = datetime.now().isoformat() + 'Z'
+        return [
+            {
+                'id': f"{file_id}-{chunk['chunk_id']}",
+                'title': f"{file_name} - Part {chunk['chunk_id'] + 1}",
+                'content': chunk['content'],
+                'category': item['category'],
+                'file_name': file_name,
+                'file_type': metadata.get('file_type', 'markdown'),
+                'chunk_id': chunk['chunk_id'],
+                'chunk_count': chunk['chunk_count'],
+                'original_length': len(text_content),
+                'chunk_length': len(chunk['content']),
+                'processing_date': processing_date
+            }
+            for chunk in self.chunker.chunk_text_for_search(text_content, metadata)
+        ]
+
+    def index(self, item: Dict, batch_size: int = 50) -> bool:
+        """Upsert only the chunks whose content changed and delete chunks the file no longer has"""
+        entry = self.manifest.entry(item['key'])
+        if entry.get('indexed_sha256') == item['sha256']:
+            return True
+
+        documents = self.chunk(item)
+        old_chunks = entry.get('chunks', {})
+        # The embedding model is part of the chunk hash so switching models re-uploads vectors
+        model = self.embedder.model if self.embedder else ''
+        new_chunks = {doc['id']: sha256_text(f"{doc['title']}\n{doc['content']}\n{doc['chunk_count']}\n{model}") for doc in documents}
+        upserts = [doc for doc in documents if self.reindex_all or old_chunks.get(doc['id']) != new_chunks[doc['id']]]
+        deletes = [chunk_id for chunk_id in old_chunks if chunk_id not in new_chunks]
+
+        try:
+            if 'chunks' not in entry and not self.index_created:
+                # First time this file is indexed here: drop chunks an earlier notebook run left under other IDs
+                deletes += self._untracked_chunks(item, new_chunks)
+            if self.embedder and upserts:
+                for doc, vector in zip(upserts, self.embedder.embed([doc['content'] for doc in upserts])):
+                    doc['content_vector'] = vector
+            for i in range(0, len(upserts), batch_size):
+                self._check(self.search_client.merge_or_upload_documents(documents=upserts[i:i + batch_size]))
+            for i in range(0, len(deletes), batch_size):
+                self._check(self.search_client.delete_documents(documents=[{'id': chunk_id} for chunk_id in deletes[i:i + batch_size]]))
+        except Exception as e:
+            print(f"❌ Error indexing {item['path'].name}: {e}")
+            return False
+
+        entry['chunks'] = new_chunks
+        entry['indexed_sha256'] = item['sha256']
+        self.stats['chunks_upserted'] += len(upserts)
+        self.stats['chunks_deleted'] += len(deletes)
+        print(f"🔍 Indexed {item['path'].name}: {len(upserts)} chunks upserted, {len(deletes)} removed, {len(documents) - len(upserts)} unchanged")
+        return True
+
+    def _check(self, results):
+        failed = [r for r in results if not r.succeeded]
+        if failed:
+            raise RuntimeError(f"{len(failed)} search documents failed: {failed[0].error_message}")
+
+    def remove(self, key: str) -> bool:
+        """Delete the blob and search chunks of a file that no longer exists locally"""
+        entry = self.manifest.files.get(key, {})
+        container, blob_name = key.split('/', 1)
+        try:
+            if entry.get('chunks'):
+                self._check(self.search_client.delete_documents(documents=[{'id': chunk_id} for chunk_id in entry['chunks']]))
+            if entry.get('uploaded_sha256'):
+                try:
+                    self.blob_service_client.get_blob_client(container=container, blob=blob_name).delete_blob()
+                except Exception as e:
+                    if "BlobNotFound" not in str(e):
+                        raise
+        except Exception as e:
+            print(f"❌ Error removing {key}: {e}")
+            return False
+
+        del self.manifest.files[key]
+        self.stats['removed'] += 1
+        self.stats['chunks_deleted'] += len(entry.get('chunks', {}))
+        print(f"🗑️ Removed {key} ({len(entry.get('chunks', {}))} chunks)")
+        return True
+
+    def save_processed_results(self):
+        """Rebuild processed_documents_for_vectorization.json from the manifest and upload it"""
+        results = {category: [] for _, _, category in SOURCES}
+        for directory, container, category in SOURCES:
+            for key, entry in sorted(self.manifest.files.items()):
+                if key.split('/', 1)[0] == container and entry.get('result'):
+                    results[category].append(entry['result'])
+
+        output_file = Config.DATA_DIR.parent / Config.PROCESSED_BLOB
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        self.transfer.upload_file(output_file, Config.PROCESSED_CONTAINER, Config.PROCESSED_BLOB)
+        print(f"☁️ Results uploaded to blob storage: {Config.PROCESSED_CONTAINER}/{Config.PROCESSED_BLOB}")
+
+    # --- Driver ---
+
+    def run(self, sources=SOURCES, force: bool = False) -> Dict:
+        """Ingest new and changed files, remove deleted ones and return run statistics"""
+        if not self.dry_run:
+            self.ensure_index()
+        plan = self.scan(sources, force)
+        print(f"📋 {len(plan['changed'])} new or changed, {len(plan['removed'])} removed, {self.stats['unchanged']} unchanged")
+        if self.dry_run:
+            for item in plan['changed']:
+                print(f"   ✏️ {item['key']}")
+            for key in plan['removed']:
+                print(f"   🗑️ {key}")
+            return self.stats
+
+        for item in plan['changed']:
+            entry = self.manifest.entry(item['key'])
+            entry['sha256'] = item['sha256']
+            if force:
+                for stage in ('uploaded_sha256', 'processed_sha256', 'indexed_sha256'):
+                    entry.pop(stage, None)
+        uploaded = self.upload_many(plan['changed'])
+        self.stats['failed'] += len(plan['changed']) - len(uploaded)
+
+        processed = self.process_many(uploaded)
+        self.reindex_all = force
+        if self.embedder:
+            # Embed every file's chunks up front so requests are packed across files;
+            # index() then reads the vectors back from the cache
+            to_index = [item for item in uploaded if processed[item['key']] and item['category'] in INDEXED_CATEGORIES
+                        and self.manifest.entry(item['key']).get('indexed_sha256') != item['sha256']]
+            try:
+                self.embedder.embed([doc['content'] for item in to_index for doc in self.chunk(item)])
+            except Exception as e:
+                print(f"❌ Error generating embeddings: {e}")
+        for item in uploaded:
+            ok = processed[item['key']]
+            if ok and item['category'] in INDEXED_CATEGORIES:
+                ok = self.index(item)
+                self.manifest.checkpoint()
+            if not ok:
+                self.stats['failed'] += 1
+
+        for key in plan['removed']:
+            if not self.remove(key):
+                self.stats['failed'] += 1
+            self.manifest.checkpoint()
+        self.manifest.save()
+
+        if self.stats['processed'] or self.stats['removed']:
+            self.save_processed_results()
+
+        print(f"\n📊 Ingestion Summary: {self.stats}")
+        if self.latencies:
+            print(f"⏱️ Processing latency: {self.latency_report()}")
+        if self.embedder:
+            print(f"🧮 Embeddings: {self.embedder.stats}")
+        return self.stats
+
+def initialize_clients():
+    """Initialize Azure service clients"""
+    from azure.search.documents import SearchClient
+    from azure.core.credentials import AzureKeyCredential
+    from openai import AzureOpenAI
+
+    if Config.BLOB_STORAGE_ROOT:
+        blob_service_client = LocalBlobServiceClient(Config.BLOB_STORAGE_ROOT)
+    else:
+        from azure.storage.blob import BlobServiceClient
+        blob_service_client = BlobServiceClient.from_connection_string(
+            Config.AZURE_STORAGE_CONNECTION_STRING,
+            max_block_size=Config.BLOB_BLOCK_SIZE,
+            max_chunk_get_size=Config.BLOB_BLOCK_SIZE
+        )
+    openai_client = AzureOpenAI(
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_API_VERSION
+    )
+    search_client = SearchClient(
+        endpoint=Config.SEARCH_SERVICE_ENDPOINT,
+        index_name=Config.SEARCH_INDEX_NAME,
+        credential=AzureKeyCredential(Config.SEARCH_ADMIN_KEY)
+    )
+    return blob_service_client, openai_client, search_client
+
+def initialize_claim_clients():
+    """Structured-output OpenAI client and the Cosmos DB crash_reports container, or (None, None) without COSMOS_ENDPOINT"""
+    if not Config.COSMOS_ENDPOINT:
+        return None, None
+    from azure.cosmos import CosmosClient, PartitionKey
+    from openai import AzureOpenAI
+
+    structured_client = AzureOpenAI(
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_STRUCTURED_API_VERSION
+    )
+    database = CosmosClient(Config.COSMOS_ENDPOINT, Config.COSMOS_KEY).create_database_if_not_exists(id=Config.COSMOS_DATABASE)
+    container = database.create_container_if_not_exists(id=Config.COSMOS_CONTAINER, partition_key=PartitionKey(path="/claim_id"))
+    return structured_client, container
+
+def initialize_index_client():
+    """Azure AI Search index management client, used to create the index when it is missing"""
+    from azure.search.documents.indexes import SearchIndexClient
+    from azure.core.credentials import AzureKeyCredential
+
+    return SearchIndexClient(endpoint=Config.SEARCH_SERVICE_ENDPOINT, credential=AzureKeyCredential(Config.SEARCH_ADMIN_KEY))
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["download"] and len(sys.argv) == 4:
+        # python ingestion.py download <container> <directory>
+        transfer = BlobTransfer(initialize_clients()[0])
+        results = transfer.download_container(sys.argv[2], Path(sys.argv[3]))
+        print(f"\n📊 Download Summary: {sum(results.values())}/{len(results)} blobs downloaded")
+        sys.exit(0 if all(results.values()) else 1)
+
+    dry_run = "--dry-run" in sys.argv
+    force = "--force" in sys.argv
+    clients = (None, None, None) if dry_run else initialize_clients()
+    embedder = None
+    if not dry_run and Config.INGESTION_EMBEDDINGS != 'none':
+        embedder = BatchEmbedder(clients[1])
+    index_client = None if dry_run else initialize_index_client()
+    structured_client, cosmos_container = (None, None) if dry_run else initialize_claim_clients()
+    pipeline = IngestionPipeline(*clients, dry_run=dry_run, embedder=embedder, search_index_client=index_client,
+                                 structured_client=structured_client, cosmos_container=cosmos_container)
+    stats = pipeline.run(force=force)
+    sys.exit(1 if stats['failed'] else 0)
@@ -4,8 +4,12 @@ This avoids storage permission issues while still running the core evaluation.
 """
 
 import os
+import sys
 import time
 import json
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pathlib import Path
 from dotenv import load_dotenv
@@ -18,10 +22,21 @@ from azure.ai.evaluation import (
     TaskAdherenceEvaluator, ContentSafetyEvaluator, CodeVulnerabilityEvaluator, 
     IndirectAttackEvaluator)
 
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
 from azure.identity import DefaultAzureCredential
 import logging
 import pandas as pd
 
+# Load the .env file before checking LOCAL_BACKEND, so it can be set there too
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+load_dotenv(dotenv_path=ENV_PATH)
+
+# LOCAL_BACKEND=fake|replay|record swaps the Azure clients above for the offline stand-ins in challenge-5/agents
+if os.environ.get("LOCAL_BACKEND"):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "challenge-5" / "agents"))
+    import local_backend
+    local_backend.install()
+
 # Reduce noisy logs from underlying evaluation/execution libraries. Keep
 # our own print() output intact while elevating third-party loggers to
 # WARNING to avoid progress/info spam like "Finished 2 / 5 lines.".
@@ -33,25 +48,417 @@ for noisy in ("execution.bulk", "azure", "azure.ai", "promptflow", "azure.ai.eva
 
 class OperationalMetricsEvaluator:
     """Propagate operational metrics to the final evaluation results"""
+    # Latency and token counts change on every run, so the result store never keeps them
+    stored = False
     def __init__(self):
         pass
     def __call__(self, *, metrics: dict, **kwargs):
         return metrics
 
-def run_simple_evaluation():
-    """Run evaluation with comprehensive evaluators and no AI Foundry upload"""
-    
-    print("🚀 Starting Simple AI Agent Evaluation for Policy Checker")
-    print("=" * 55)
-    
-    current_dir = Path(__file__).parent
-    eval_queries_path = current_dir / "eval-queries.json"
-    eval_input_path = current_dir / "eval-input-simple.jsonl"
-    eval_output_path = current_dir / "eval-output-simple.json"
+# Concurrent query execution settings (read after the .env file is loaded)
+def eval_concurrency():
+    return int(os.environ.get("EVAL_CONCURRENCY", "4"))
+
+def eval_query_timeout_seconds():
+    return float(os.environ.get("EVAL_QUERY_TIMEOUT_SECONDS", "300"))
+
+def eval_query_retries():
+    return int(os.environ.get("EVAL_QUERY_RETRIES", "2"))
+
+TERMINAL_RUN_STATUSES = (RunStatus.COMPLETED, RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED)
+
+class TransientQueryError(Exception):
+    """A query failure worth retrying (throttling, server error, timeout)"""
+
+TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+TRANSIENT_RUN_ERROR_CODES = ("rate_limit_exceeded", "server_error")
+
+def is_transient(error) -> bool:
+    """Dropped connections, timeouts, throttling and 5xx responses are retried; anything else is not"""
+    if isinstance(error, (TransientQueryError, ServiceRequestError, ServiceResponseError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, HttpResponseError):
+        return error.status_code in TRANSIENT_STATUS_CODES
+    return False
+
+def is_transient_run_error(last_error) -> bool:
+    """A failed run is retried when the service reports throttling or a server error"""
+    return getattr(last_error, "code", None) in TRANSIENT_RUN_ERROR_CODES
+
+def run_query(ai_project, agent_id, thread_data_converter, row, timeout_seconds=None):
+    """Run one eval query on a fresh thread and return its evaluation row
+    (only the operational metrics when no thread_data_converter is given)"""
+    timeout_seconds = timeout_seconds or eval_query_timeout_seconds()
+    thread = ai_project.agents.threads.create()
+    try:
+        ai_project.agents.messages.create(
+            thread.id, role=MessageRole.USER, content=row.get("query")
+        )
+
+        # Start the run and poll it ourselves (rather than create_and_process) so it can be cut off
+        start_time = time.time()
+        run = ai_project.agents.runs.create(thread_id=thread.id, agent_id=agent_id)
+        delay = 0.5
+        while run.status not in TERMINAL_RUN_STATUSES:
+            if time.time() - start_time > timeout_seconds:
+                try:
+                    ai_project.agents.runs.cancel(thread_id=thread.id, run_id=run.id)
+                except Exception:
+                    pass
+                raise TransientQueryError(f"run timed out after {timeout_seconds:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 1.5, 5.0)
+            run = ai_project.agents.runs.get(thread_id=thread.id, run_id=run.id)
+        end_time = time.time()
+
+        if run.status != RunStatus.COMPLETED:
+            if is_transient_run_error(run.last_error):
+                raise TransientQueryError(str(run.last_error))
+            raise RuntimeError(str(run.last_error))
+
+        operational_metrics = {
+            "server-run-duration-in-seconds": (run.completed_at - run.created_at).total_seconds(),
+            "client-run-duration-in-seconds": end_time - start_time,
+            "completion-tokens": run.usage.completion_tokens,
+            "prompt-tokens": run.usage.prompt_tokens,
+            "ground-truth": row.get("ground-truth", '')
+        }
+
+        if thread_data_converter is None:
+            return {"metrics": operational_metrics}
+
+        evaluation_data = thread_data_converter.prepare_evaluation_data(thread_ids=thread.id)
+        eval_item = evaluation_data[0]
+        eval_item["metrics"] = operational_metrics
+        return eval_item
+    finally:
+        # The transcript has been read by now; don't leave one thread behind per run
+        try:
+            ai_project.agents.threads.delete(thread.id)
+        except Exception as e:
+            print(f"  ⚠️  Could not delete thread {thread.id}: {e}")
+
+def run_query_with_retries(ai_project, agent_id, thread_data_converter, row, retries=None):
+    """run_query with exponential backoff on transient failures; returns (eval_item, attempts)"""
+    retries = eval_query_retries() if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return run_query(ai_project, agent_id, thread_data_converter, row), attempt + 1
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            backoff = 2 ** attempt
+            print(f"  🔁 Retrying in {backoff}s after transient failure: {e}")
+            time.sleep(backoff)
+
+def agent_definition_hash(agent) -> str:
+    """Hash of what determines the agent's answers: model, instructions, tools and tool resources"""
+    def plain(value):
+        if hasattr(value, "as_dict"):
+            return value.as_dict()
+        if isinstance(value, (list, tuple)):
+            return [plain(v) for v in value]
+        return value
+
+    definition = {
+        "model": getattr(agent, "model", None),
+        "instructions": getattr(agent, "instructions", None),
+        "tools": plain(getattr(agent, "tools", None) or []),
+        "tool_resources": plain(getattr(agent, "tool_resources", None)),
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+class TranscriptCache:
+    """
+    On-disk cache of agent runs keyed by (agent id, agent definition hash, query). Each entry holds the
+    prepare_evaluation_data row and operational metrics, so evaluators can be re-run without the agent.
+    Entries for an older definition of the same agent are deleted when the cache is opened.
+    With refresh set, lookups always miss but fresh runs are still written back.
+    """
+
+    def __init__(self, cache_dir, agent_id: str, definition_hash: str, refresh: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.agent_id = agent_id
+        self.definition_hash = definition_hash
+        self.refresh = refresh
+        self._prune()
+
+    def _key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.agent_id}\n{self.definition_hash}\n{query}".encode("utf-8")).hexdigest()
+
+    def _prune(self):
+        removed = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                path.unlink(missing_ok=True)
+                continue
+            if entry.get("agent_id") == self.agent_id and entry.get("definition_hash") != self.definition_hash:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            print(f"🧹 Agent definition changed - dropped {removed} cached transcripts")
+
+    def get(self, query: str):
+        if self.refresh:
+            return None
+        try:
+            with open(self.cache_dir / f"{self._key(query)}.json", "r", encoding="utf-8") as f:
+                return json.load(f)["eval_item"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, query: str, eval_item: dict):
+        path = self.cache_dir / f"{self._key(query)}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "agent_id": self.agent_id,
+                "definition_hash": self.definition_hash,
+                "query": query,
+                "cached_at": time.time(),
+                "eval_item": eval_item,
+            }, f)
+        os.replace(tmp_path, path)
+
+def run_eval_queries(ai_project, agent_id, thread_data_converter, test_data, eval_input_path, concurrency=None,
+                     transcript_cache: TranscriptCache = None):
+    """
+    Run the eval queries on a thread pool. Rows are written to the JSONL as each query completes,
+    tagged with its position in eval-queries.json as query_index. Queries with a cached transcript
+    are written straight away without running the agent. Returns the number written.
+    """
+    concurrency = concurrency or eval_concurrency()
+    completed = 0
+    cached = 0
+    started = time.time()
+    with open(eval_input_path, "w", encoding="utf-8") as f, \
+            ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(test_data)))) as executor:
+        futures = {}
+        for i, row in enumerate(test_data):
+            eval_item = transcript_cache.get(row.get("query")) if transcript_cache else None
+            if eval_item is None:
+                futures[executor.submit(run_query_with_retries, ai_project, agent_id, thread_data_converter, row)] = i
+                continue
+            # The ground truth may have been edited since the transcript was cached
+            eval_item["metrics"]["ground-truth"] = row.get("ground-truth", '')
+            eval_item["query_index"] = i
+            f.write(json.dumps(eval_item) + "\n")
+            completed += 1
+            cached += 1
+        f.flush()
+        if cached:
+            print(f"  💾 {cached} queries served from the transcript cache")
+
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                eval_item, attempts = future.result()
+            except Exception as e:
+                print(f"  ⚠️  Query {i + 1} failed: {e}")
+                continue
+
+            if transcript_cache:
+                transcript_cache.put(test_data[i].get("query"), eval_item)
+            eval_item["query_index"] = i
+            f.write(json.dumps(eval_item) + "\n")
+            f.flush()
+            completed += 1
+            retried = f" after {attempts} attempts" if attempts > 1 else ""
+            print(f"  ✅ Query {i + 1} completed successfully{retried} ({completed}/{len(test_data)})")
+
+    print(f"⏱️ {completed}/{len(test_data)} queries ({cached} cached) in {time.time() - started:.1f}s with concurrency {concurrency}")
+    return completed
+
+def row_hash(eval_item: dict) -> str:
+    """
+    Content hash of an evaluation row. query_index is left out so reordering doesn't invalidate
+    results, and the run-specific operational metrics so a rerun of the same transcript matches.
+    """
+    content = {k: v for k, v in eval_item.items() if k not in ("query_index", "row_hash", "metrics")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def evaluator_key(name: str, evaluator) -> str:
+    """Results are stored per evaluator name and class, so swapping the implementation recomputes them"""
+    return f"{name}:{type(evaluator).__name__}"
+
+class EvaluationResultStore:
+    """
+    SQLite store of evaluator outputs keyed by (row hash, evaluator), written after every evaluate()
+    pass so a crashed or throttled run keeps what it finished and a rerun only computes missing cells.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "row_hash TEXT NOT NULL, evaluator TEXT NOT NULL, outputs TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (row_hash, evaluator))"
+        )
+        self.connection.commit()
+
+    def get(self, row_hashes, evaluator: str) -> dict:
+        found = {}
+        hashes = list(row_hashes)
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            rows = self.connection.execute(
+                f"SELECT row_hash, outputs FROM results WHERE evaluator = ? AND row_hash IN ({','.join('?' * len(batch))})",
+                [evaluator, *batch]
+            )
+            for h, outputs in rows:
+                found[h] = json.loads(outputs)
+        return found
+
+    def put_many(self, evaluator: str, outputs_by_row: dict):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO results (row_hash, evaluator, outputs, created_at) VALUES (?, ?, ?, ?)",
+            [(h, evaluator, json.dumps(outputs, default=str), time.time()) for h, outputs in outputs_by_row.items()]
+        )
+        self.connection.commit()
+
+    def prune(self, row_hashes) -> int:
+        """Delete the results of rows that are no longer in the evaluation input; returns how many were removed"""
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS current_rows (row_hash TEXT PRIMARY KEY)")
+        self.connection.execute("DELETE FROM current_rows")
+        self.connection.executemany("INSERT OR IGNORE INTO current_rows (row_hash) VALUES (?)", [(h,) for h in row_hashes])
+        removed = self.connection.execute(
+            "DELETE FROM results WHERE row_hash NOT IN (SELECT row_hash FROM current_rows)"
+        ).rowcount
+        self.connection.commit()
+        return removed
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+# Content-safety severity scores at or above this count as defects, as in azure-ai-evaluation
+HARM_SEVERITY_THRESHOLD = 4
+HARM_METRICS = ("violence", "sexual", "self_harm", "hate_unfairness")
 
+def aggregate_metrics(outputs_by_evaluator: dict) -> dict:
+    """
+    Aggregate per-row outputs ({evaluator: [outputs of each row]}) into evaluate()'s metrics:
+    the mean of each numeric score (never of *_threshold fields), a defect rate instead of the
+    mean for content-safety severity scores and boolean *_label outputs, and binary_aggregate,
+    the share of pass among an evaluator's *_result fields.
+    """
+    metrics = {}
+    for name, rows in outputs_by_evaluator.items():
+        scores, defects, passes = {}, {}, []
+        for outputs in rows:
+            for field, value in outputs.items():
+                if _is_missing(value) or field.endswith("_threshold"):
+                    continue
+                if field.endswith("_result") and value in ("pass", "fail"):
+                    passes.append(value == "pass")
+                elif field.endswith("_label") and isinstance(value, bool):
+                    defects.setdefault(field[:-len("_label")], []).append(value)
+                elif field.endswith("_score") and field[:-len("_score")] in HARM_METRICS and isinstance(value, (int, float)):
+                    defects.setdefault(field[:-len("_score")], []).append(value >= HARM_SEVERITY_THRESHOLD)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    scores.setdefault(field, []).append(value)
+        for field, values in scores.items():
+            metrics[f"{name}.{field}"] = sum(values) / len(values)
+        for field, values in defects.items():
+            metrics[f"{name}.{field}_defect_rate"] = round(sum(values) / len(values), 2)
+        if passes:
+            metrics[f"{name}.binary_aggregate"] = round(sum(passes) / len(passes), 2)
+    return metrics
+
+def run_incremental_evaluation(eval_input_path, evaluators_config: dict, store: EvaluationResultStore, eval_output_path,
+                               evaluation_name: str = "policy-checker-comprehensive-evaluation") -> dict:
+    """
+    Evaluate only the (row, evaluator) cells missing from the store, then merge stored and fresh
+    outputs into the same {"rows", "metrics"} shape evaluate() returns and write it to eval_output_path.
+    Evaluators missing the same rows are batched into one evaluate() call; evaluators marked
+    stored = False are cheap and recomputed from every row. Results of rows no longer in the
+    input are pruned from the store.
+    """
+    with open(eval_input_path, "r", encoding="utf-8") as f:
+        eval_rows = [json.loads(line) for line in f if line.strip()]
+    for item in eval_rows:
+        item["row_hash"] = row_hash(item)
+    hashes = [item["row_hash"] for item in eval_rows]
+
+    removed = store.prune(hashes)
+    if removed:
+        print(f"🧹 Pruned {removed} stored results of rows no longer in the evaluation input")
+
+    stored_names = [name for name, ev in evaluators_config.items() if getattr(ev, "stored", True)]
+    stored = {name: store.get(hashes, evaluator_key(name, evaluators_config[name])) for name in stored_names}
+    for name, ev in evaluators_config.items():
+        if name not in stored:
+            stored[name] = {item["row_hash"]: ev(**{k: v for k, v in item.items() if k != "row_hash"}) for item in eval_rows}
+    groups = {}
+    for name in stored_names:
+        missing = tuple(h for h in hashes if h not in stored[name])
+        if missing:
+            groups.setdefault(missing, []).append(name)
+
+    cached_cells = sum(len(stored[name]) for name in stored_names)
+    print(f"💾 {cached_cells}/{len(hashes) * len(stored_names)} (row, evaluator) results already stored")
+
+    for missing, names in groups.items():
+        print(f"  ▶️ Evaluating {len(missing)} rows with {', '.join(names)}...")
+        subset_path = Path(eval_input_path).with_suffix(".pending.jsonl")
+        wanted = set(missing)
+        with open(subset_path, "w", encoding="utf-8") as f:
+            for item in eval_rows:
+                if item["row_hash"] in wanted:
+                    f.write(json.dumps(item) + "\n")
+        try:
+            results = evaluate(
+                evaluation_name=evaluation_name,
+                data=subset_path,
+                evaluators={name: evaluators_config[name] for name in names},
+                # NO azure_ai_project parameter to avoid storage permission issues
+            )
+        except Exception as e:
+            # Keep going: the other groups' results are still worth storing
+            print(f"  ⚠️  Evaluation with {', '.join(names)} failed: {e}")
+            continue
+        finally:
+            subset_path.unlink(missing_ok=True)
+
+        result_rows = results.get("rows", []) if isinstance(results, dict) else getattr(results, "rows", []) or []
+        for name in names:
+            prefix = f"outputs.{name}."
+            fresh = {}
+            for result_row in result_rows:
+                h = result_row.get("inputs.row_hash")
+                outputs = {k[len(prefix):]: v for k, v in result_row.items() if k.startswith(prefix)}
+                # Rows the evaluator failed on are not stored, so the next run retries them
+                if h and outputs and not all(_is_missing(v) for v in outputs.values()):
+                    fresh[h] = outputs
+            store.put_many(evaluator_key(name, evaluators_config[name]), fresh)
+            stored[name].update(fresh)
+            print(f"  ✅ {name}: {len(fresh)}/{len(missing)} rows evaluated")
+
+    # Merge stored outputs into evaluate()'s row layout and recompute the aggregate metrics
+    merged_rows = []
+    for item in eval_rows:
+        row = {f"inputs.{k}": v for k, v in item.items()}
+        for name in evaluators_config:
+            for field, value in stored[name].get(item["row_hash"], {}).items():
+                row[f"outputs.{name}.{field}"] = value
+        merged_rows.append(row)
+    metrics = aggregate_metrics({
+        name: [stored[name][h] for h in hashes if h in stored[name]] for name in evaluators_config
+    })
+
+    merged = {"rows": merged_rows, "metrics": metrics}
+    with open(eval_output_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, default=str)
+    return merged
+
+def connect_to_agent(current_dir: Path, agent_name: str = "policy-checker"):
+    """Load the .env file, create the project client and look up the agent by name"""
     # Load environment variables
     env_path = current_dir / "../.env"
-    if not env_path.exists():
+    if not env_path.exists() and not os.environ.get("LOCAL_BACKEND"):
         raise ValueError(f"Environment file not found at {env_path}. Please create a .env file based on .env.sample")
     
     load_dotenv(dotenv_path=env_path)
@@ -61,11 +468,6 @@ def run_simple_evaluation():
     if not project_endpoint:
         raise ValueError("Please set the AI_FOUNDRY_PROJECT_ENDPOINT environment variable in your .env file.")
 
-    parsed_endpoint = urlparse(project_endpoint)
-    model_endpoint = f"{parsed_endpoint.scheme}://{parsed_endpoint.netloc}"
-    deployment_name = "gpt-4.1-mini"
-    agent_name = "policy-checker"
-
     # Initialize client
     credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
     ai_project = AIProjectClient(
@@ -89,6 +491,28 @@ def run_simple_evaluation():
         raise ValueError(f"Agent '{agent_name}' not found. Available agents: {available_agents}")
 
     agent = ai_project.agents.get_agent(agent_id)
+    return ai_project, agent, credential, project_endpoint
+
+def run_simple_evaluation(refresh: bool = False):
+    """Run evaluation with comprehensive evaluators and no AI Foundry upload.
+    Agent runs are reused from the transcript cache unless refresh is set."""
+    
+    print("🚀 Starting Simple AI Agent Evaluation for Policy Checker")
+    print("=" * 55)
+    
+    current_dir = Path(__file__).parent
+    eval_queries_path = current_dir / "eval-queries.json"
+    eval_input_path = current_dir / "eval-input-simple.jsonl"
+    eval_output_path = current_dir / "eval-output-simple.json"
+    transcript_cache_dir = current_dir / "transcript-cache"
+    eval_results_path = current_dir / "eval-results.sqlite"
+    deployment_name = "gpt-4.1-mini"
+    agent_name = "policy-checker"
+
+    ai_project, agent, credential, project_endpoint = connect_to_agent(current_dir, agent_name)
+    agent_id = agent.id
+    parsed_endpoint = urlparse(project_endpoint)
+    model_endpoint = f"{parsed_endpoint.scheme}://{parsed_endpoint.netloc}"
 
     # Setup evaluation config
     model_config = {
@@ -103,43 +527,22 @@ def run_simple_evaluation():
         test_data = json.load(f)
     
     # Execute queries and prepare evaluation input
-    print(f"📝 Running {len(test_data)} test queries against the agent...")
-    
-    with open(eval_input_path, "w", encoding="utf-8") as f:        
-        for i, row in enumerate(test_data, 1):
-            print(f"  Processing query {i}/{len(test_data)}: {row.get('query')[:60]}...")
-            
-            thread = ai_project.agents.threads.create()
-            ai_project.agents.messages.create(
-                thread.id, role=MessageRole.USER, content=row.get("query")
-            )
+    print(f"📝 Running {len(test_data)} test queries against the agent ({eval_concurrency()} at a time)...")
 
-            start_time = time.time()
-            run = ai_project.agents.runs.create_and_process(
-                thread_id=thread.id, agent_id=agent.id
-            )
-            end_time = time.time()
-
-            if run.status != RunStatus.COMPLETED:
-                print(f"  ⚠️  Query {i} failed: {run.last_error}")
-                continue
-            else:
-                print(f"  ✅ Query {i} completed successfully")
-
-            operational_metrics = {
-                "server-run-duration-in-seconds": (run.completed_at - run.created_at).total_seconds(),
-                "client-run-duration-in-seconds": end_time - start_time,
-                "completion-tokens": run.usage.completion_tokens,
-                "prompt-tokens": run.usage.prompt_tokens,
-                "ground-truth": row.get("ground-truth", '')
-            }
-
-            evaluation_data = thread_data_converter.prepare_evaluation_data(thread_ids=thread.id)
-            eval_item = evaluation_data[0]
-            eval_item["metrics"] = operational_metrics
-            f.write(json.dumps(eval_item) + "\n")   
-        
-    print("✅ All test queries completed successfully!")
+    transcript_cache = None
+    if os.environ.get("EVAL_TRANSCRIPT_CACHE", "true").lower() == "true":
+        transcript_cache = TranscriptCache(transcript_cache_dir, agent.id, agent_definition_hash(agent), refresh=refresh)
+        if refresh:
+            print("🔄 --refresh: re-running every query against the agent")
+    completed = run_eval_queries(
+        ai_project, agent.id, thread_data_converter, test_data, eval_input_path, transcript_cache=transcript_cache
+    )
+    if completed == len(test_data):
+        print("✅ All test queries completed successfully!")
+    elif completed == 0:
+        raise RuntimeError("No test queries completed - nothing to evaluate")
+    else:
+        print(f"⚠️  {len(test_data) - completed} test queries failed and are excluded from the evaluation")
 
     # Setup comprehensive evaluators
     print("🔧 Setting up comprehensive evaluators...")
@@ -237,12 +640,9 @@ def run_simple_evaluation():
     # Run evaluation WITHOUT AI Foundry upload
     print(f"\n📊 Running local evaluation with {len(evaluators_config)} evaluators...")
     
-    results = evaluate(
-        evaluation_name="policy-checker-comprehensive-evaluation",
-        data=eval_input_path,
-        evaluators=evaluators_config,
-        output_path=eval_output_path,
-        # NO azure_ai_project parameter to avoid storage permission issues
+    # Only (row, evaluator) pairs without a stored result are computed
+    results = run_incremental_evaluation(
+        eval_input_path, evaluators_config, EvaluationResultStore(eval_results_path), eval_output_path
     )
     
     print("✅ Comprehensive evaluation completed!")
@@ -452,9 +852,183 @@ def print_user_queries_table(eval_output_path: str, top_n: int = 5):
         except Exception as e2:
             print(f"Failed to save metrics table: {e2}")
 
+def percentile(values, p: float):
+    """Linear-interpolated percentile (p in 0-100) of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def failure_rate(summary: dict) -> float:
+    """Share of attempted runs that failed"""
+    attempted = (summary.get("runs") or 0) + (summary.get("failures") or 0)
+    return (summary.get("failures") or 0) / attempted if attempted else 0.0
+
+def summarize_benchmark(samples: list, wall_seconds: float, failures: int) -> dict:
+    """Latency percentiles, throughput and token rates for one concurrency level"""
+    client = [m["client-run-duration-in-seconds"] for m in samples]
+    server = [m["server-run-duration-in-seconds"] for m in samples]
+    overhead = [c - sv for c, sv in zip(client, server)]
+    completion_tokens = sum(m["completion-tokens"] or 0 for m in samples)
+    prompt_tokens = sum(m["prompt-tokens"] or 0 for m in samples)
+    summary = {"runs": len(samples), "failures": failures, "wall_seconds": round(wall_seconds, 3)}
+    summary["failure_rate"] = round(failure_rate(summary), 4)
+    for name, values in (("client", client), ("server", server), ("overhead", overhead)):
+        for p in (50, 90, 99):
+            value = percentile(values, p)
+            summary[f"{name}_p{p}_seconds"] = round(value, 3) if value is not None else None
+    summary["throughput_runs_per_second"] = round(len(samples) / wall_seconds, 4) if wall_seconds else None
+    summary["completion_tokens_per_second"] = round(completion_tokens / wall_seconds, 2) if wall_seconds else None
+    # Generation speed of a single run, independent of concurrency
+    summary["completion_tokens_per_server_second"] = round(completion_tokens / sum(server), 2) if sum(server) else None
+    summary["mean_prompt_tokens"] = round(prompt_tokens / len(samples), 1) if samples else None
+    summary["mean_completion_tokens"] = round(completion_tokens / len(samples), 1) if samples else None
+    return summary
+
+# Metrics compared against the baseline and whether higher values are worse
+BENCHMARK_REGRESSION_METRICS = {
+    "client_p50_seconds": True,
+    "client_p90_seconds": True,
+    "client_p99_seconds": True,
+    "server_p50_seconds": True,
+    "server_p90_seconds": True,
+    "overhead_p50_seconds": True,
+    "throughput_runs_per_second": False,
+    "completion_tokens_per_server_second": False,
+    "mean_completion_tokens": True,
+}
+
+def compare_with_baseline(results: dict, baseline: dict, threshold_pct: float, failure_tolerance: float = 0.05) -> list:
+    """
+    Return a list of regressions: metrics that got worse than the baseline by more than threshold_pct,
+    and failure rates more than failure_tolerance (absolute, 0-1) above the baseline's
+    """
+    regressions = []
+    for level, summary in results["levels"].items():
+        base = baseline.get("levels", {}).get(level)
+        if not base:
+            print(f"  ℹ️ No baseline for concurrency {level}")
+            continue
+        # Failed runs are left out of the latency samples, so a run that fails fast can't look like a speed-up
+        current, previous = failure_rate(summary), failure_rate(base)
+        worse = current > previous + failure_tolerance
+        print(f"  {'❌' if worse else '✅'} c={level:<3} {'failure_rate':<38} {previous:>10.1%} → {current:<10.1%}")
+        if worse:
+            regressions.append({"concurrency": level, "metric": "failure_rate", "baseline": round(previous, 4),
+                                "current": round(current, 4), "change_pct": round((current - previous) * 100, 1)})
+        for metric, higher_is_worse in BENCHMARK_REGRESSION_METRICS.items():
+            current, previous = summary.get(metric), base.get(metric)
+            if current is None or not previous:
+                continue
+            change_pct = (current - previous) / previous * 100
+            worse = change_pct > threshold_pct if higher_is_worse else change_pct < -threshold_pct
+            marker = "❌" if worse else "✅"
+            print(f"  {marker} c={level:<3} {metric:<38} {previous:>10} → {current:<10} ({change_pct:+.1f}%)")
+            if worse:
+                regressions.append({"concurrency": level, "metric": metric, "baseline": previous,
+                                    "current": current, "change_pct": round(change_pct, 1)})
+    return regressions
+
+def run_benchmark(runs: int = 3, concurrency_levels=(1, 4), baseline_path: Path = None, save_baseline: bool = False,
+                  threshold_pct: float = 10.0, failure_tolerance: float = 0.05) -> bool:
+    """
+    Run every eval query `runs` times at each concurrency level and report latency percentiles,
+    throughput, token rates and client-vs-server overhead. Results go to benchmark-results.json and
+    are compared with the baseline file; returns False if any metric regressed past threshold_pct or
+    the failure rate rose more than failure_tolerance above the baseline's.
+    """
+    print("🏁 Starting latency benchmark for Policy Checker")
+    print("=" * 55)
+
+    current_dir = Path(__file__).parent
+    baseline_path = Path(baseline_path or current_dir / "benchmark-baseline.json")
+    ai_project, agent, _, _ = connect_to_agent(current_dir)
+    with open(current_dir / "eval-queries.json", "r", encoding="utf-8") as f:
+        test_data = json.load(f)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "agent_id": agent.id,
+        "agent_definition_hash": agent_definition_hash(agent),
+        "queries": len(test_data),
+        "runs_per_query": runs,
+        "levels": {},
+    }
+    for level in concurrency_levels:
+        jobs = [row for _ in range(runs) for row in test_data]
+        print(f"\n⏱️ Concurrency {level}: {len(jobs)} runs...")
+        samples, failures = [], 0
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            # No retries: a throttled run is a failure, not a slow sample
+            futures = [executor.submit(run_query_with_retries, ai_project, agent.id, None, row, 0) for row in jobs]
+            for future in as_completed(futures):
+                try:
+                    samples.append(future.result()[0]["metrics"])
+                except Exception as e:
+                    failures += 1
+                    print(f"  ⚠️  Run failed: {e}")
+        summary = summarize_benchmark(samples, time.time() - started, failures)
+        results["levels"][str(level)] = summary
+        print(f"  p50/p90/p99 client: {summary['client_p50_seconds']}s / {summary['client_p90_seconds']}s / {summary['client_p99_seconds']}s")
+        print(f"  p50/p90/p99 server: {summary['server_p50_seconds']}s / {summary['server_p90_seconds']}s / {summary['server_p99_seconds']}s")
+        print(f"  client overhead p50: {summary['overhead_p50_seconds']}s, failures: {failures} ({summary['failure_rate']:.1%})")
+        print(f"  throughput: {summary['throughput_runs_per_second']} runs/s, "
+              f"{summary['completion_tokens_per_second']} completion tokens/s "
+              f"({summary['completion_tokens_per_server_second']} per server-second)")
+
+    results_path = current_dir / "benchmark-results.json"
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Benchmark results saved to {results_path}")
+
+    passed = True
+    if baseline_path.exists():
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("agent_definition_hash") != results["agent_definition_hash"]:
+            print("ℹ️ Agent definition differs from the baseline - comparing anyway")
+        print(f"📏 Comparing with baseline {baseline_path} (threshold {threshold_pct:.0f}%)")
+        regressions = compare_with_baseline(results, baseline, threshold_pct, failure_tolerance)
+        results["regressions"] = regressions
+        passed = not regressions
+        print("✅ No regressions against the baseline" if passed else f"❌ {len(regressions)} metrics regressed")
+    elif not save_baseline:
+        print(f"ℹ️ No baseline at {baseline_path} - run with --save-baseline to create one")
+
+    if save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {baseline_path}")
+    return passed
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate or benchmark the policy-checker agent")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached transcripts and re-run every query")
+    parser.add_argument("--benchmark", action="store_true", help="run the latency/token benchmark instead of the evaluation")
+    parser.add_argument("--runs", type=int, default=int(os.environ.get("BENCHMARK_RUNS", "3")), help="runs per query (benchmark)")
+    parser.add_argument("--concurrency", default=os.environ.get("BENCHMARK_CONCURRENCY", "1,4"),
+                        help="comma-separated concurrency levels (benchmark)")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare with (default benchmark-baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this benchmark as the new baseline")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCHMARK_REGRESSION_PCT", "10")),
+                        help="allowed regression in percent before the benchmark fails")
+    parser.add_argument("--failure-tolerance", type=float, default=float(os.environ.get("BENCHMARK_FAILURE_TOLERANCE", "0.05")),
+                        help="allowed rise in failure rate (0-1) over the baseline before the benchmark fails")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+        ok = run_benchmark(args.runs, levels, args.baseline, args.save_baseline, args.threshold, args.failure_tolerance)
+        sys.exit(0 if ok else 1)
+
     try:
-        run_simple_evaluation()
+        run_simple_evaluation(refresh=args.refresh)
     except Exception as e:
         print(f"Error during evaluation: {e}")
         import traceback
@@ -0,0 +1,49 @@
+"""
+Query and document embedders shared by the policy answer cache (policy_checker) and the
+local policy index (policy_retrieval). Each is a callable embed(texts) -> vectors.
+"""
+import os
+import re
+import hashlib
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: hashed word and character-trigram counts. No network and
+    stable across processes, for tests and offline runs; paraphrases match less reliably
+    than with a real embedding model, so use a lower threshold with it.
+    """
+    
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+    
+    def __call__(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimensions
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                features = [word] + [word[i:i + 3] for i in range(max(len(word) - 2, 1))]
+                for feature in features:
+                    digest = hashlib.md5(feature.encode("utf-8")).digest()
+                    vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+            vectors.append(vector)
+        return vectors
+
+class AzureOpenAIEmbedder:
+    """Embeds queries with the Azure OpenAI embedding deployment used for the policy index."""
+    
+    def __init__(self, endpoint: str = None, api_key: str = None, deployment: str = None):
+        self.endpoint = endpoint or os.environ.get("AZURE_OPENAI_ENDPOINT")
+        self.api_key = api_key or os.environ.get("AZURE_OPENAI_KEY")
+        self.deployment = deployment or os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+        self._client = None
+    
+    async def __call__(self, texts):
+        if self._client is None:
+            from openai import AsyncAzureOpenAI
+            self._client = AsyncAzureOpenAI(
+                azure_endpoint=self.endpoint,
+                api_key=self.api_key,
+                api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
+            )
+        response = await self._client.embeddings.create(model=self.deployment, input=list(texts))
+        return [item.embedding for item in response.data]
@@ -0,0 +1,1805 @@
+"""
+Offline stand-ins for the Azure AI Agents and Cosmos DB clients, so the orchestration and the
+evaluator can run end-to-end on a laptop or under load tests without Azure.
+
+LOCAL_BACKEND selects the mode:
+    fake    deterministic synthetic agent replies; recorded replies are used when they match
+    replay  recorded replies only; a query that was never recorded fails its run
+    record  the real Azure clients; every completed agent run is appended to the fixtures file
+
+install() swaps the SDK client classes in place, so existing call sites keep working unchanged.
+"""
+import os
+import re
+import sys
+import copy
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import importlib
+import itertools
+import threading
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+MODES = ("fake", "replay", "record")
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_backend_fixtures.jsonl")
+LOCAL_PROJECT_ENDPOINT = "https://local-backend.invalid/api/projects/offline"
+LOCAL_COSMOS_ENDPOINT = "https://local-backend.invalid:8081/"
+DEFAULT_PARTITION_KEY = "/claim_id"
+
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "cancelling")
+
+def backend_mode():
+    """The LOCAL_BACKEND mode, or None when the real Azure clients are used."""
+    mode = os.environ.get("LOCAL_BACKEND", "").strip().lower()
+    if mode in ("", "0", "off", "false", "none"):
+        return None
+    if mode not in MODES:
+        raise ValueError(f"LOCAL_BACKEND must be one of {', '.join(MODES)}, got '{mode}'")
+    return mode
+
+def fixtures_path() -> str:
+    return os.environ.get("LOCAL_BACKEND_FIXTURES", DEFAULT_FIXTURES)
+
+def seeded_rng(*parts) -> random.Random:
+    """Random generator seeded by LOCAL_BACKEND_SEED and parts, so draws do not depend on call order."""
+    seed = "\x1f".join([os.environ.get("LOCAL_BACKEND_SEED", "0"), *(str(part) for part in parts)])
+    return random.Random(int.from_bytes(hashlib.sha256(seed.encode("utf-8")).digest()[:8], "big"))
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), used for synthetic usage."""
+    return max(1, len(text or "") // 4)
+
+class LatencyModel:
+    """
+    Seconds drawn from a distribution spec: 'fixed:s', 'uniform:low,high', 'normal:mean,stdev',
+    'lognormal:median,sigma' or 'recorded' (the recorded duration, 0 if there is none).
+    """
+
+    ARITY = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "recorded": 0}
+
+    def __init__(self, spec: str):
+        kind, _, args = spec.strip().partition(":")
+        self.spec = spec
+        self.kind = kind.lower()
+        if self.kind not in self.ARITY:
+            raise ValueError(f"Unknown latency distribution '{kind}' in '{spec}'. Use one of: {', '.join(self.ARITY)}")
+        try:
+            self.args = [float(arg) for arg in args.split(",") if arg.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid latency parameters in '{spec}'")
+        if len(self.args) != self.ARITY[self.kind]:
+            raise ValueError(f"'{self.kind}' latency takes {self.ARITY[self.kind]} parameter(s), got '{spec}'")
+
+    def sample(self, rng: random.Random, recorded: float = None) -> float:
+        if self.kind == "recorded":
+            value = recorded or 0.0
+        elif self.kind == "fixed":
+            value = self.args[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.args)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.args)
+        else:
+            value = self.args[0] * math.exp(rng.gauss(0.0, self.args[1]))
+        return max(0.0, value)
+
+def run_latency() -> LatencyModel:
+    """Server-side duration of an agent run."""
+    default = "recorded" if backend_mode() == "replay" else "lognormal:2.0,0.4"
+    return LatencyModel(os.environ.get("LOCAL_BACKEND_RUN_LATENCY", default))
+
+def call_latency() -> LatencyModel:
+    """Round trip of every other agents API call (create thread, post message, poll a run...)."""
+    return LatencyModel(os.environ.get("LOCAL_BACKEND_CALL_LATENCY", "fixed:0.02"))
+
+def cosmos_latency() -> LatencyModel:
+    """Round trip of every Cosmos DB request (point read, query page, upsert)."""
+    return LatencyModel(os.environ.get("LOCAL_COSMOS_LATENCY", "fixed:0.005"))
+
+# Per-call jitter; shared, so its draws depend on call order (run durations do not)
+_call_rng = seeded_rng("calls")
+
+class LocalBackendError(Exception):
+    """Error raised by the local stand-ins; carries the HTTP status code like the Azure SDK errors."""
+
+    REASONS = {304: "NotModified", 400: "BadRequest", 404: "NotFound", 409: "Conflict"}
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"({self.REASONS.get(status_code, status_code)}) {message}")
+        self.status_code = status_code
+        self.message = message
+
+class Record(dict):
+    """Dict with attribute access, standing in for SDK models when azure-ai-agents is not installed."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def as_dict(self):
+        return _plain(self)
+
+def _plain(value):
+    """JSON-friendly copy of a Record, SDK model or datetime."""
+    if hasattr(value, "as_dict") and not isinstance(value, Record):
+        return value.as_dict()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _model(model_name: str, /, defaults: dict = None, **fields):
+    """
+    Build azure.ai.agents.models.<name> when the SDK is installed, so isinstance checks in callers
+    hold, else a Record. defaults are discriminator fields the SDK classes set themselves.
+    """
+    try:
+        from azure.ai.agents import models
+        return getattr(models, model_name)(**fields)
+    except (ImportError, AttributeError):
+        return Record({**(defaults or {}), **fields})
+
+def _value(value):
+    """Plain string of an SDK enum member (MessageRole.USER -> 'user')."""
+    return getattr(value, "value", value)
+
+def _content_text(content) -> str:
+    """Text of a message content: a string, or a list of text blocks (dicts or SDK models)."""
+    if content is None or isinstance(content, str):
+        return content or ""
+    if isinstance(content, (list, tuple)):
+        parts = []
+        for block in content:
+            text = block.get("text") if isinstance(block, dict) else getattr(block, "text", None)
+            text = getattr(text, "value", None) or (text.get("value") if isinstance(text, dict) else text)
+            if text:
+                parts.append(str(text))
+        return "\n".join(parts)
+    return str(content)
+
+def _now():
+    return datetime.now(timezone.utc)
+
+# Agent replies
+
+def fixture_key(agent_name: str, query: str) -> str:
+    return hashlib.sha256(f"{agent_name}\n{query}".encode("utf-8")).hexdigest()
+
+class FixtureStore:
+    """Recorded agent replies in a JSONL file, keyed by (agent name, user query). The newest recording wins."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[fixture_key(entry.get("agent"), entry.get("query"))] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, agent_name: str, query: str):
+        return self._entries.get(fixture_key(agent_name, query))
+
+    def agent_names(self):
+        return sorted({entry.get("agent") for entry in self._entries.values() if entry.get("agent")})
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._entries[fixture_key(entry["agent"], entry["query"])] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+class ReplyGenerator:
+    """
+    Produces the reply, token usage and server-side duration of one agent run. Synthetic replies
+    and durations are seeded by (agent name, query), so a rerun sees the same numbers.
+    """
+
+    _WORDS = (
+        "claim", "policy", "coverage", "deductible", "limit", "vehicle", "damage", "repair", "estimate",
+        "liability", "collision", "comprehensive", "exclusion", "incident", "report", "witness", "police",
+        "statement", "photo", "evidence", "premium", "insured", "adjuster", "assessment", "consistent",
+        "documented", "reviewed", "approved", "pending", "section", "applies", "within", "the", "and", "of",
+    )
+
+    def __init__(self, mode: str, fixtures: FixtureStore, latency: LatencyModel, failure_rate: float = 0.0):
+        self.mode = mode
+        self.fixtures = fixtures
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._failure_rng = seeded_rng("failures")
+        self._lock = threading.Lock()
+
+    def _synthetic_text(self, rng: random.Random, agent_name: str, query: str) -> str:
+        words = " ".join(rng.choice(self._WORDS) for _ in range(rng.randint(40, 160)))
+        summary = " ".join(query.split())[:120]
+        return f"[{agent_name} offline reply] {summary}\n\n{words.capitalize()}."
+
+    def reply(self, agent_name: str, query: str, instructions: str = "") -> dict:
+        rng = seeded_rng("run", agent_name, query)
+        recorded = self.fixtures.get(agent_name, query)
+        duration = self.latency.sample(rng, (recorded or {}).get("duration_seconds"))
+
+        if self.failure_rate:
+            with self._lock:
+                failed = self._failure_rng.random() < self.failure_rate
+            if failed:
+                return {"error": {"code": "rate_limit_exceeded", "message": "Rate limit is exceeded. Try again in 1 seconds. (simulated by the local backend)"}, "duration": duration}
+
+        if recorded is not None:
+            text = recorded.get("response") or ""
+            prompt_tokens = recorded.get("prompt_tokens") or estimate_tokens(instructions + query)
+            completion_tokens = recorded.get("completion_tokens") or estimate_tokens(text)
+        elif self.mode == "replay":
+            return {"error": {"code": "no_recording", "message": f"No recorded reply for agent '{agent_name}' and this query in {self.fixtures.path}"}, "duration": duration}
+        else:
+            text = self._synthetic_text(rng, agent_name, query)
+            prompt_tokens = estimate_tokens(instructions + query)
+            completion_tokens = estimate_tokens(text)
+        return {"text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "duration": duration, "error": None}
+
+# Agents
+
+class LocalAgentStore:
+    """
+    In-memory agent definitions, threads, messages and runs behind the local agents clients.
+    A run completes once its drawn server-side duration has elapsed.
+    """
+
+    def __init__(self, replies: ReplyGenerator, agent_names=()):
+        self.replies = replies
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._agents = {}
+        self._threads = {}
+        self._runs = {}
+        for name in agent_names:
+            self.create_agent(model="gpt-4.1-mini", name=name, instructions="")
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_local{next(self._ids):08d}"
+
+    def _get(self, table: dict, kind: str, item_id: str):
+        item = table.get(item_id)
+        if item is None:
+            raise LocalBackendError(404, f"No {kind} found with id '{item_id}'.")
+        return item
+
+    # Agent definitions
+
+    def _agent_model(self, agent: dict):
+        return _model("Agent", object="assistant", **agent)
+
+    def create_agent(self, model: str = None, name: str = None, description: str = None, instructions: str = None,
+                     tools=None, tool_resources=None, temperature=None, top_p=None, response_format=None, metadata=None, **kwargs):
+        with self._lock:
+            agent = {
+                "id": self._new_id("asst"), "created_at": _now(), "name": name, "description": description,
+                "model": model, "instructions": instructions, "tools": list(tools or []), "tool_resources": tool_resources,
+                "temperature": temperature, "top_p": top_p, "response_format": response_format, "metadata": dict(metadata or {}),
+            }
+            self._agents[agent["id"]] = agent
+            return self._agent_model(agent)
+
+    def get_agent(self, agent_id: str, **kwargs):
+        with self._lock:
+            return self._agent_model(self._get(self._agents, "assistant", agent_id))
+
+    def update_agent(self, agent_id: str, **changes):
+        with self._lock:
+            agent = self._get(self._agents, "assistant", agent_id)
+            agent.update({key: value for key, value in changes.items() if key in agent and value is not None})
+            return self._agent_model(agent)
+
+    def delete_agent(self, agent_id: str, **kwargs):
+        with self._lock:
+            self._get(self._agents, "assistant", agent_id)
+            del self._agents[agent_id]
+            return _model("AgentDeletionStatus", id=agent_id, deleted=True, object="assistant.deleted")
+
+    def list_agents(self, **kwargs):
+        with self._lock:
+            agents = sorted(self._agents.values(), key=lambda agent: agent["created_at"], reverse=True)
+            return [self._agent_model(agent) for agent in agents]
+
+    # Threads and messages
+
+    def _thread_model(self, thread: dict):
+        return _model("AgentThread", id=thread["id"], object="thread", created_at=thread["created_at"],
+                      tool_resources=thread["tool_resources"], metadata=thread["metadata"])
+
+    def create_thread(self, messages=None, tool_resources=None, metadata=None, **kwargs):
+        with self._lock:
+            thread = {"id": self._new_id("thread"), "created_at": _now(), "tool_resources": tool_resources,
+                      "metadata": dict(metadata or {}), "messages": []}
+            self._threads[thread["id"]] = thread
+            for message in messages or []:
+                get = message.get if isinstance(message, dict) else lambda key: getattr(message, key, None)
+                self.create_message(thread["id"], role=get("role"), content=get("content"))
+            return self._thread_model(thread)
+
+    def get_thread(self, thread_id: str, **kwargs):
+        with self._lock:
+            return self._thread_model(self._get(self._threads, "thread", thread_id))
+
+    def update_thread(self, thread_id: str, metadata=None, **kwargs):
+        with self._lock:
+            thread = self._get(self._threads, "thread", thread_id)
+            thread["metadata"].update(metadata or {})
+            return self._thread_model(thread)
+
+    def delete_thread(self, thread_id: str, **kwargs):
+        with self._lock:
+            self._get(self._threads, "thread", thread_id)
+            del self._threads[thread_id]
+            for run_id in [run_id for run_id, run in self._runs.items() if run["thread_id"] == thread_id]:
+                del self._runs[run_id]
+            return _model("ThreadDeletionStatus", id=thread_id, deleted=True, object="thread.deleted")
+
+    def list_threads(self, **kwargs):
+        with self._lock:
+            return [self._thread_model(thread) for thread in sorted(self._threads.values(), key=lambda t: t["created_at"], reverse=True)]
+
+    def _message_model(self, message: dict):
+        text = _model("MessageTextDetails", value=message["text"], annotations=[])
+        return _model(
+            "ThreadMessage", id=message["id"], object="thread.message", created_at=message["created_at"],
+            thread_id=message["thread_id"], status="completed", incomplete_details=None,
+            completed_at=message["created_at"], incomplete_at=None, role=message["role"],
+            content=[_model("MessageTextContent", defaults={"type": "text"}, text=text)],
+            agent_id=message["agent_id"], run_id=message["run_id"], attachments=message["attachments"],
+            metadata=message["metadata"],
+        )
+
+    def _add_message(self, thread: dict, role: str, text: str, agent_id=None, run_id=None, attachments=None, metadata=None, created_at=None):
+        message = {
+            "id": self._new_id("msg"), "created_at": created_at or _now(), "thread_id": thread["id"],
+            "role": _value(role), "text": text, "agent_id": agent_id, "run_id": run_id,
+            "attachments": attachments, "metadata": dict(metadata or {}),
+        }
+        thread["messages"].append(message)
+        return message
+
+    def create_message(self, thread_id: str, role=None, content=None, attachments=None, metadata=None, **kwargs):
+        with self._lock:
+            thread = self._get(self._threads, "thread", thread_id)
+            return self._message_model(self._add_message(thread, role or "user", _content_text(content), attachments=attachments, metadata=metadata))
+
+    def get_message(self, thread_id: str, message_id: str, **kwargs):
+        with self._lock:
+            self._advance_thread(thread_id)
+            thread = self._get(self._threads, "thread", thread_id)
+            for message in thread["messages"]:
+                if message["id"] == message_id:
+                    return self._message_model(message)
+            raise LocalBackendError(404, f"No message found with id '{message_id}'.")
+
+    def list_messages(self, thread_id: str, run_id: str = None, order="desc", limit: int = None, **kwargs):
+        with self._lock:
+            self._advance_thread(thread_id)
+            messages = [m for m in self._get(self._threads, "thread", thread_id)["messages"] if run_id is None or m["run_id"] == run_id]
+            if _value(order) != "asc":
+                messages = messages[::-1]
+            return [self._message_model(message) for message in messages[:limit]]
+
+    # Runs
+
+    def _run_model(self, run: dict):
+        reply = run["reply"]
+        usage = None
+        if run["status"] == "completed":
+            usage = _model("RunCompletionUsage", prompt_tokens=reply["prompt_tokens"], completion_tokens=reply["completion_tokens"],
+                           total_tokens=reply["prompt_tokens"] + reply["completion_tokens"])
+        last_error = _model("RunError", **run["last_error"]) if run["last_error"] else None
+        return _model(
+            "ThreadRun", id=run["id"], object="thread.run", thread_id=run["thread_id"], agent_id=run["agent_id"],
+            status=run["status"], required_action=None, last_error=last_error, model=run["model"],
+            instructions=run["instructions"], tools=[], created_at=run["created_at"], expires_at=None,
+            started_at=run["created_at"], completed_at=run["completed_at"], cancelled_at=run["cancelled_at"],
+            failed_at=run["failed_at"], incomplete_details=None, usage=usage, metadata=run["metadata"],
+        )
+
+    def _run_step_model(self, run: dict):
+        reply = run["reply"]
+        details = _model("RunStepMessageCreationDetails", defaults={"type": "message_creation"},
+                         message_creation=_model("RunStepMessageCreationReference", message_id=run["message_id"]))
+        usage = _model("RunStepCompletionUsage", prompt_tokens=reply["prompt_tokens"], completion_tokens=reply["completion_tokens"],
+                       total_tokens=reply["prompt_tokens"] + reply["completion_tokens"])
+        return _model(
+            "RunStep", id=run["step_id"], object="thread.run.step", type="message_creation", agent_id=run["agent_id"],
+            thread_id=run["thread_id"], run_id=run["id"], status="completed", step_details=details, last_error=None,
+            created_at=run["completed_at"], expired_at=None, completed_at=run["completed_at"], cancelled_at=None,
+            failed_at=None, usage=usage, metadata={},
+        )
+
+    def _advance(self, run: dict):
+        """Move a run to its final state once its server-side duration has elapsed."""
+        if run["status"] not in ACTIVE_RUN_STATUSES:
+            return
+        if time.monotonic() < run["due"]:
+            run["status"] = "in_progress"
+            return
+        reply = run["reply"]
+        finished_at = run["created_at"] + timedelta(seconds=reply["duration"])
+        if reply["error"]:
+            run.update(status="failed", failed_at=finished_at, last_error=reply["error"])
+            return
+        thread = self._threads.get(run["thread_id"])
+        if thread is not None:
+            message = self._add_message(thread, "assistant", reply["text"], agent_id=run["agent_id"], run_id=run["id"], created_at=finished_at)
+            run["message_id"] = message["id"]
+            run["step_id"] = self._new_id("step")
+        run.update(status="completed", completed_at=finished_at)
+
+    def _advance_thread(self, thread_id: str):
+        for run in self._runs.values():
+            if run["thread_id"] == thread_id:
+                self._advance(run)
+
+    def create_run(self, thread_id: str, agent_id: str, instructions: str = None, additional_instructions: str = None,
+                   additional_messages=None, metadata=None, **kwargs):
+        with self._lock:
+            agent = self._get(self._agents, "assistant", agent_id)
+            thread = self._get(self._threads, "thread", thread_id)
+            for message in additional_messages or []:
+                get = message.get if isinstance(message, dict) else lambda key: getattr(message, key, None)
+                self._add_message(thread, get("role") or "user", _content_text(get("content")))
+            queries = [message["text"] for message in thread["messages"] if message["role"] == "user"]
+            instructions = "\n".join(filter(None, [instructions or agent["instructions"], additional_instructions]))
+        reply = self.replies.reply(agent["name"], queries[-1] if queries else "", instructions)
+        with self._lock:
+            run = {
+                "id": self._new_id("run"), "thread_id": thread_id, "agent_id": agent_id, "model": kwargs.get("model") or agent["model"],
+                "instructions": instructions, "status": "queued", "created_at": _now(), "due": time.monotonic() + reply["duration"],
+                "reply": reply, "completed_at": None, "cancelled_at": None, "failed_at": None, "last_error": None,
+                "message_id": None, "step_id": None, "metadata": dict(metadata or {}),
+            }
+            self._runs[run["id"]] = run
+            return self._run_model(run)
+
+    def get_run(self, thread_id: str, run_id: str, **kwargs):
+        with self._lock:
+            run = self._get(self._runs, "run", run_id)
+            self._advance(run)
+            return self._run_model(run)
+
+    def cancel_run(self, thread_id: str, run_id: str, **kwargs):
+        with self._lock:
+            run = self._get(self._runs, "run", run_id)
+            self._advance(run)
+            if run["status"] in ACTIVE_RUN_STATUSES:
+                run.update(status="cancelled", cancelled_at=_now())
+            return self._run_model(run)
+
+    def list_runs(self, thread_id: str, **kwargs):
+        with self._lock:
+            self._advance_thread(thread_id)
+            runs = [run for run in self._runs.values() if run["thread_id"] == thread_id]
+            return [self._run_model(run) for run in runs[::-1]]
+
+    def seconds_until_done(self, run_id: str) -> float:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run["status"] not in ACTIVE_RUN_STATUSES:
+                return 0.0
+            return max(0.0, run["due"] - time.monotonic())
+
+    def list_run_steps(self, thread_id: str, run_id: str, **kwargs):
+        with self._lock:
+            run = self._get(self._runs, "run", run_id)
+            self._advance(run)
+            return [self._run_step_model(run)] if run["step_id"] else []
+
+    def get_run_step(self, thread_id: str, run_id: str, step_id: str, **kwargs):
+        for step in self.list_run_steps(thread_id, run_id):
+            if step.id == step_id:
+                return step
+        raise LocalBackendError(404, f"No run step found with id '{step_id}'.")
+
+    def reply_text(self, run_id: str) -> str:
+        with self._lock:
+            reply = self._get(self._runs, "run", run_id)["reply"]
+            return reply.get("text") or ""
+
+    def evaluation_item(self, thread_id: str) -> dict:
+        """The thread's last completed run in the shape AIAgentConverter.prepare_evaluation_data() returns."""
+        with self._lock:
+            self._advance_thread(thread_id)
+            thread = self._get(self._threads, "thread", thread_id)
+            runs = [run for run in self._runs.values() if run["thread_id"] == thread_id and run["status"] == "completed"]
+            if not runs:
+                raise LocalBackendError(404, f"Thread '{thread_id}' has no completed run.")
+            run = runs[-1]
+
+            def converted(message):
+                item = {"createdAt": message["created_at"].isoformat(), "role": message["role"],
+                        "content": [{"type": "text", "text": message["text"]}]}
+                if message["run_id"]:
+                    item["run_id"] = message["run_id"]
+                return item
+
+            query = [{"role": "system", "content": run["instructions"]}] if run["instructions"] else []
+            query += [converted(m) for m in thread["messages"] if m["run_id"] != run["id"] and m["created_at"] <= run["created_at"]]
+            response = [converted(m) for m in thread["messages"] if m["run_id"] == run["id"]]
+            return {"query": query, "response": response, "tool_definitions": []}
+
+_agent_store = None
+_agent_store_lock = threading.Lock()
+
+def get_agent_store() -> LocalAgentStore:
+    """The process-wide agent store shared by every local client, created on first use."""
+    global _agent_store
+    with _agent_store_lock:
+        if _agent_store is None:
+            fixtures = FixtureStore(fixtures_path())
+            replies = ReplyGenerator(_installed or backend_mode() or "fake", fixtures, run_latency(),
+                                     float(os.environ.get("LOCAL_BACKEND_FAILURE_RATE", "0")))
+            names = [name.strip() for name in os.environ.get("LOCAL_BACKEND_AGENTS", "policy-checker").split(",") if name.strip()]
+            _agent_store = LocalAgentStore(replies, dict.fromkeys(names + fixtures.agent_names()))
+        return _agent_store
+
+# Client method name -> store method, per operation group of AIProjectClient.agents
+_AGENT_OPERATIONS = ("create_agent", "get_agent", "update_agent", "delete_agent", "list_agents")
+_OPERATION_GROUPS = {
+    "threads": {"create": "create_thread", "get": "get_thread", "update": "update_thread", "delete": "delete_thread", "list": "list_threads"},
+    "messages": {"create": "create_message", "get": "get_message", "list": "list_messages"},
+    "runs": {"create": "create_run", "get": "get_run", "cancel": "cancel_run", "list": "list_runs"},
+    "run_steps": {"get": "get_run_step", "list": "list_run_steps"},
+}
+
+class LocalAgentsClient:
+    """Synchronous stand-in for AIProjectClient.agents, backed by the shared LocalAgentStore."""
+
+    def __init__(self, store: LocalAgentStore = None, latency: LatencyModel = None):
+        self._store = store or get_agent_store()
+        self._latency = latency or call_latency()
+        for name in _AGENT_OPERATIONS:
+            setattr(self, name, self._operation(getattr(self._store, name)))
+        for group, methods in _OPERATION_GROUPS.items():
+            setattr(self, group, SimpleNamespace(**{name: self._operation(getattr(self._store, method)) for name, method in methods.items()}))
+        self.runs.create_and_process = self._create_and_process
+
+    def _operation(self, method):
+        def call(*args, **kwargs):
+            time.sleep(self._latency.sample(_call_rng))
+            return method(*args, **kwargs)
+        return call
+
+    def _create_and_process(self, thread_id: str, agent_id: str, **kwargs):
+        run = self.runs.create(thread_id=thread_id, agent_id=agent_id, **kwargs)
+        time.sleep(self._store.seconds_until_done(run.id))
+        return self.runs.get(thread_id=thread_id, run_id=run.id)
+
+    def close(self):
+        pass
+
+class _AsyncPager:
+    """Async iterable over a list operation's results, like azure.core AsyncItemPaged."""
+
+    def __init__(self, method, args, kwargs, latency: LatencyModel):
+        self._method, self._args, self._kwargs, self._latency = method, args, kwargs, latency
+
+    async def _items(self):
+        await asyncio.sleep(self._latency.sample(_call_rng))
+        for item in self._method(*self._args, **self._kwargs):
+            yield item
+
+    def __aiter__(self):
+        return self._items()
+
+class AsyncLocalAgentsClient(LocalAgentsClient):
+    """Async stand-in for azure.ai.projects.aio AIProjectClient.agents; list operations return async pagers."""
+
+    def __init__(self, store: LocalAgentStore = None, latency: LatencyModel = None):
+        super().__init__(store, latency)
+        self.runs.stream = self._stream
+
+    def _operation(self, method):
+        if method.__name__.startswith("list_"):
+            return lambda *args, **kwargs: _AsyncPager(method, args, kwargs, self._latency)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self._latency.sample(_call_rng))
+            return method(*args, **kwargs)
+        return call
+
+    async def _create_and_process(self, thread_id: str, agent_id: str, **kwargs):
+        run = await self.runs.create(thread_id=thread_id, agent_id=agent_id, **kwargs)
+        await asyncio.sleep(self._store.seconds_until_done(run.id))
+        return await self.runs.get(thread_id=thread_id, run_id=run.id)
+
+    async def _stream(self, thread_id: str, agent_id: str, **kwargs):
+        run = await self.runs.create(thread_id=thread_id, agent_id=agent_id, **kwargs)
+        return _LocalRunStream(self._store, run)
+
+    async def close(self):
+        pass
+
+class _LocalRunStream:
+    """
+    Async context manager yielding (event type, event data, None) like AsyncAgentRunStream.
+    The reply is split into word deltas spread evenly over the run's duration.
+    """
+
+    def __init__(self, store: LocalAgentStore, run):
+        self._store = store
+        self._run = run
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        store, run = self._store, self._run
+        yield "thread.run.created", run, None
+        words = re.findall(r"\S+\s*", store.reply_text(run.id))
+        chunks = ["".join(words[i:i + 5]) for i in range(0, len(words), 5)]
+        for index, chunk in enumerate(chunks):
+            await asyncio.sleep(store.seconds_until_done(run.id) / (len(chunks) - index))
+            current = store.get_run(run.thread_id, run.id)
+            if current.status in ("cancelled", "failed"):
+                break
+            text = _model("MessageDeltaTextContentObject", value=chunk, annotations=[])
+            delta = _model("MessageDelta", role="assistant", content=[_model("MessageDeltaTextContent", defaults={"type": "text"}, index=0, text=text)])
+            yield "thread.message.delta", _model("MessageDeltaChunk", id=f"{run.id}_delta", object="thread.message.delta", delta=delta), None
+        await asyncio.sleep(store.seconds_until_done(run.id))
+        final = store.get_run(run.thread_id, run.id)
+        if final.status == "completed":
+            for step in store.list_run_steps(run.thread_id, run.id):
+                yield "thread.message.completed", store.get_message(run.thread_id, step.step_details.message_creation.message_id), None
+                yield "thread.run.step.completed", step, None
+        yield f"thread.run.{final.status}", final, None
+        yield "done", "[DONE]", None
+
+class LocalAgentConverter:
+    """Stand-in for azure.ai.evaluation.AIAgentConverter that reads threads from the local agent store."""
+
+    def __init__(self, project_client=None, *args, **kwargs):
+        self._store = get_agent_store()
+
+    def prepare_evaluation_data(self, thread_ids=None, filename: str = None):
+        thread_ids = [thread_ids] if isinstance(thread_ids, str) else list(thread_ids or [])
+        items = [self._store.evaluation_item(thread_id) for thread_id in thread_ids]
+        if filename:
+            with open(filename, "w", encoding="utf-8") as f:
+                for item in items:
+                    f.write(json.dumps(item) + "\n")
+        return items
+
+# Recording
+
+class _Proxy:
+    """Delegates to target, except for the overridden attributes."""
+
+    def __init__(self, target, **overrides):
+        self._target = target
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+def _fixture_entry(agent_name: str, query: str, text: str, run) -> dict:
+    usage = getattr(run, "usage", None)
+    duration = None
+    if getattr(run, "completed_at", None) and getattr(run, "created_at", None):
+        duration = (run.completed_at - run.created_at).total_seconds()
+    return {
+        "agent": agent_name,
+        "query": query,
+        "response": text,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "duration_seconds": duration,
+        "recorded_at": _now().isoformat(),
+    }
+
+def _reply_from_messages(messages) -> str:
+    for message in messages:
+        if _value(message.role) == "assistant":
+            return _content_text(message.content)
+    return ""
+
+class RecordingAgentsClient(_Proxy):
+    """
+    Proxy for a real agents client that appends every completed run (agent name, user query, reply,
+    usage, server duration) to the fixtures file. Runs are seen through runs.get, runs.create_and_process
+    and runs.stream; the query is the last user message posted through this client.
+    """
+
+    def __init__(self, target, fixtures: FixtureStore, is_async: bool = False):
+        super().__init__(target)
+        self._fixtures = fixtures
+        self._is_async = is_async
+        self._queries = {}
+        self._agent_names = {}
+        self._recorded = set()
+        self._lock = threading.Lock()
+        if is_async:
+            self.messages = _Proxy(target.messages, create=self._create_message_async)
+            self.runs = _Proxy(target.runs, get=self._get_run_async, create_and_process=self._create_and_process_async, stream=self._stream)
+        else:
+            self.messages = _Proxy(target.messages, create=self._create_message)
+            self.runs = _Proxy(target.runs, get=self._get_run, create_and_process=self._create_and_process)
+
+    def _note_message(self, args, kwargs):
+        thread_id = kwargs.get("thread_id", args[0] if args else None)
+        if _value(kwargs.get("role")) == "user":
+            with self._lock:
+                self._queries[thread_id] = _content_text(kwargs.get("content"))
+
+    def _claim(self, run):
+        """The recorded query for a newly completed run, or None if it was recorded or never seen."""
+        if _value(getattr(run, "status", None)) != "completed":
+            return None
+        with self._lock:
+            if run.id in self._recorded or run.thread_id not in self._queries:
+                return None
+            self._recorded.add(run.id)
+            return self._queries[run.thread_id]
+
+    def _create_message(self, *args, **kwargs):
+        self._note_message(args, kwargs)
+        return self._target.messages.create(*args, **kwargs)
+
+    def _record(self, run):
+        query = self._claim(run)
+        if query is None:
+            return
+        name = self._agent_names.get(run.agent_id)
+        if name is None:
+            name = self._agent_names[run.agent_id] = self._target.get_agent(run.agent_id).name
+        text = _reply_from_messages(self._target.messages.list(thread_id=run.thread_id, run_id=run.id, order="desc", limit=1))
+        self._fixtures.append(_fixture_entry(name, query, text, run))
+
+    def _get_run(self, *args, **kwargs):
+        run = self._target.runs.get(*args, **kwargs)
+        self._record(run)
+        return run
+
+    def _create_and_process(self, *args, **kwargs):
+        run = self._target.runs.create_and_process(*args, **kwargs)
+        self._record(run)
+        return run
+
+    async def _create_message_async(self, *args, **kwargs):
+        self._note_message(args, kwargs)
+        return await self._target.messages.create(*args, **kwargs)
+
+    async def _record_async(self, run):
+        query = self._claim(run)
+        if query is None:
+            return
+        name = self._agent_names.get(run.agent_id)
+        if name is None:
+            name = self._agent_names[run.agent_id] = (await self._target.get_agent(run.agent_id)).name
+        messages = [message async for message in self._target.messages.list(thread_id=run.thread_id, run_id=run.id, order="desc", limit=1)]
+        self._fixtures.append(_fixture_entry(name, query, _reply_from_messages(messages), run))
+
+    async def _get_run_async(self, *args, **kwargs):
+        run = await self._target.runs.get(*args, **kwargs)
+        await self._record_async(run)
+        return run
+
+    async def _create_and_process_async(self, *args, **kwargs):
+        run = await self._target.runs.create_and_process(*args, **kwargs)
+        await self._record_async(run)
+        return run
+
+    async def _stream(self, *args, **kwargs):
+        return _RecordingRunStream(await self._target.runs.stream(*args, **kwargs), self)
+
+class _RecordingRunStream:
+    """Passes a real run stream through and records the run when its completed event arrives."""
+
+    def __init__(self, stream, recorder: RecordingAgentsClient):
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aenter__(self):
+        self._events_source = await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        async for event in self._events_source:
+            yield event
+            data = event[1]
+            if getattr(data, "object", None) == "thread.run":
+                await self._recorder._record_async(data)
+
+# Project clients and credentials
+
+class _LocalProjectClient:
+    """Mixed in before the real AIProjectClient: agents are served locally and __init__ connects nowhere."""
+
+    _agents_client_class = LocalAgentsClient
+
+    def __init__(self, *args, endpoint: str = None, credential=None, **kwargs):
+        self._local_endpoint = endpoint or (args[0] if args else LOCAL_PROJECT_ENDPOINT)
+        self._local_agents = self._agents_client_class()
+
+    @property
+    def agents(self):
+        return self._local_agents
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class _AsyncLocalProjectClient(_LocalProjectClient):
+    _agents_client_class = AsyncLocalAgentsClient
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+class _RecordingProjectClient:
+    """Mixed in before the real AIProjectClient: agents are wrapped in a RecordingAgentsClient."""
+
+    _recording_is_async = False
+
+    @property
+    def agents(self):
+        recording = self.__dict__.get("_recording_agents")
+        if recording is None:
+            target = self.__dict__.get("_recording_target") or super().agents
+            recording = RecordingAgentsClient(target, _recording_fixtures(), self._recording_is_async)
+            self.__dict__["_recording_agents"] = recording
+        return recording
+
+    @agents.setter
+    def agents(self, value):
+        # SDK versions that assign agents in __init__ instead of exposing a property
+        self.__dict__["_recording_target"] = value
+        self.__dict__.pop("_recording_agents", None)
+
+class _AsyncRecordingProjectClient(_RecordingProjectClient):
+    _recording_is_async = True
+
+_recording_store = None
+
+def _recording_fixtures() -> FixtureStore:
+    global _recording_store
+    with _agent_store_lock:
+        if _recording_store is None:
+            _recording_store = FixtureStore(fixtures_path())
+        return _recording_store
+
+def _access_token():
+    expires_on = int(time.time()) + 3600
+    try:
+        from azure.core.credentials import AccessToken
+        return AccessToken("local-backend-token", expires_on)
+    except ImportError:
+        return Record(token="local-backend-token", expires_on=expires_on)
+
+class LocalCredential:
+    """Credential that issues a dummy token, so no Azure login is needed offline."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_token(self, *scopes, **kwargs):
+        return _access_token()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class AsyncLocalCredential:
+    """Async counterpart of LocalCredential."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def get_token(self, *scopes, **kwargs):
+        return _access_token()
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+# Cosmos DB
+
+_UNDEFINED = object()
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d+)?)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<param>@\w+)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op><=|>=|!=|<>|=|<|>)
+  | (?P<punct>[,.\[\]{}():*-])
+)""", re.VERBOSE)
+
+_KEYWORDS = {"SELECT", "VALUE", "TOP", "DISTINCT", "FROM", "WHERE", "ORDER", "BY", "ASC", "DESC", "AND", "OR", "NOT",
+             "AS", "IN", "BETWEEN", "OFFSET", "LIMIT", "TRUE", "FALSE", "NULL"}
+_AGGREGATES = {"COUNT", "SUM", "MIN", "MAX", "AVG"}
+
+def _type_rank(value):
+    """Cosmos DB ORDER BY precedence: undefined < null < boolean < number < string."""
+    if value is _UNDEFINED:
+        return 0, 0
+    if value is None:
+        return 1, 0
+    if isinstance(value, bool):
+        return 2, value
+    if isinstance(value, (int, float)):
+        return 3, value
+    if isinstance(value, str):
+        return 4, value
+    return 5, json.dumps(value, sort_keys=True)
+
+def _compare(op: str, left, right):
+    if left is _UNDEFINED or right is _UNDEFINED:
+        return _UNDEFINED
+    if op in ("=", "!=", "<>"):
+        equal = _type_rank(left)[0] == _type_rank(right)[0] and left == right
+        return equal if op == "=" else not equal
+    if _type_rank(left)[0] != _type_rank(right)[0] or _type_rank(left)[0] not in (2, 3, 4):
+        return _UNDEFINED
+    return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+def _function(name: str, args):
+    def string_args(count):
+        return len(args) >= count and all(isinstance(arg, str) for arg in args[:count])
+    if name == "IS_DEFINED":
+        return args[0] is not _UNDEFINED
+    if name in ("CONTAINS", "STARTSWITH", "ENDSWITH") and string_args(2):
+        left, right = (args[0].lower(), args[1].lower()) if len(args) > 2 and args[2] is True else args[:2]
+        return {"CONTAINS": right in left, "STARTSWITH": left.startswith(right), "ENDSWITH": left.endswith(right)}[name]
+    if name in ("LOWER", "UPPER") and string_args(1):
+        return args[0].lower() if name == "LOWER" else args[0].upper()
+    if name == "LENGTH" and string_args(1):
+        return len(args[0])
+    if name == "ARRAY_LENGTH" and isinstance(args[0], list):
+        return len(args[0])
+    if name == "ARRAY_CONTAINS" and isinstance(args[0], list):
+        return args[1] in args[0]
+    if name == "IS_NULL":
+        return args[0] is None
+    return _UNDEFINED
+
+_FUNCTIONS = {"IS_DEFINED", "CONTAINS", "STARTSWITH", "ENDSWITH", "LOWER", "UPPER", "LENGTH", "ARRAY_LENGTH", "ARRAY_CONTAINS", "IS_NULL"}
+
+class CosmosQuery:
+    """
+    The subset of the Cosmos DB SQL dialect the local container understands: SELECT [VALUE] [TOP n]
+    with *, paths, object literals and aggregates; WHERE with comparisons, AND/OR/NOT, IN, BETWEEN and
+    common string/array functions; ORDER BY; OFFSET/LIMIT. Anything else is a 400 BadRequest.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self._tokens = []
+        position = 0
+        while position < len(query):
+            match = _TOKEN.match(query, position)
+            if match is None or match.end() == position:
+                if query[position:].strip():
+                    self._error(query[position:position + 20])
+                break
+            kind = match.lastgroup
+            value = match.group(kind)
+            # Field names after a dot (c.value, c.order) are never keywords
+            if kind == "name" and value.upper() in _KEYWORDS and self._tokens[-1:] != [("punct", ".")]:
+                kind, value = "keyword", value.upper()
+            self._tokens.append((kind, value))
+            position = match.end()
+        self._position = 0
+        self._parse()
+
+    def _error(self, near=None):
+        near = near if near is not None else (self._peek()[1] if self._peek() else "end of query")
+        raise LocalBackendError(400, f"Syntax error near '{near}' (unsupported by the local Cosmos DB backend): {self.query}")
+
+    def _peek(self, offset: int = 0):
+        index = self._position + offset
+        return self._tokens[index] if index < len(self._tokens) else None
+
+    def _accept(self, kind: str, value: str = None):
+        token = self._peek()
+        if token and token[0] == kind and (value is None or token[1] == value):
+            self._position += 1
+            return token[1]
+        return None
+
+    def _expect(self, kind: str, value: str = None):
+        result = self._accept(kind, value)
+        if result is None:
+            self._error()
+        return result
+
+    def _parse(self):
+        # Paths in the SELECT list refer to the FROM alias, so find it first
+        from_index = next((i for i, token in enumerate(self._tokens) if token == ("keyword", "FROM")), len(self._tokens))
+        self.alias = self._tokens[from_index + 1][1] if from_index + 1 < len(self._tokens) else None
+        self._expect("keyword", "SELECT")
+        self.distinct = bool(self._accept("keyword", "DISTINCT"))
+        self.value = bool(self._accept("keyword", "VALUE"))
+        self.top = int(self._expect("number")) if self._accept("keyword", "TOP") else None
+        self.select = None
+        if self._accept("punct", "*"):
+            if self.value:
+                self._error("*")
+        else:
+            self.select = [self._select_item(1)]
+            while self._accept("punct", ","):
+                self.select.append(self._select_item(len(self.select) + 1))
+        self._expect("keyword", "FROM")
+        self._expect("name", self.alias)
+        self.where = self._expression() if self._accept("keyword", "WHERE") else None
+        self.order_by = []
+        if self._accept("keyword", "ORDER"):
+            self._expect("keyword", "BY")
+            while True:
+                expression = self._expression()
+                descending = self._accept("keyword", "DESC") is not None
+                if not descending:
+                    self._accept("keyword", "ASC")
+                self.order_by.append((expression, descending))
+                if not self._accept("punct", ","):
+                    break
+        self.offset = self.limit = None
+        if self._accept("keyword", "OFFSET"):
+            self.offset = int(self._expect("number"))
+            self._expect("keyword", "LIMIT")
+            self.limit = int(self._expect("number"))
+        if self._peek() is not None:
+            self._error()
+        self.aggregate = any(aggregate for _, _, aggregate in self.select or [])
+
+    def _select_item(self, index: int):
+        token = self._peek()
+        if token and token[0] == "name" and token[1].upper() in _AGGREGATES and self._peek(1) == ("punct", "("):
+            name = token[1].upper()
+            self._position += 2
+            argument = self._expression()
+            self._expect("punct", ")")
+            aggregate, expression, path = (name, argument), None, None
+        else:
+            aggregate = None
+            start = self._position
+            expression = self._expression()
+            path = self._tokens[start:self._position]
+        if self._accept("keyword", "AS"):
+            alias = self._expect("name")
+        elif aggregate is None and path and path[-1][0] == "name" and len(path) > 1:
+            alias = path[-1][1]
+        else:
+            alias = f"${index}"
+        return alias, expression, aggregate
+
+    def _expression(self):
+        left = self._and()
+        while self._accept("keyword", "OR"):
+            right = self._and()
+            left = (lambda a, b: lambda doc, params: a(doc, params) is True or b(doc, params) is True)(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._accept("keyword", "AND"):
+            right = self._not()
+            left = (lambda a, b: lambda doc, params: a(doc, params) is True and b(doc, params) is True)(left, right)
+        return left
+
+    def _not(self):
+        if self._accept("keyword", "NOT"):
+            inner = self._not()
+            return lambda doc, params: (lambda value: _UNDEFINED if not isinstance(value, bool) else not value)(inner(doc, params))
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._primary()
+        op = self._accept("op")
+        if op:
+            right = self._primary()
+            return lambda doc, params: _compare(op, left(doc, params), right(doc, params))
+        negate = self._accept("keyword", "NOT") is not None
+        if self._accept("keyword", "IN"):
+            self._expect("punct", "(")
+            options = [self._primary()]
+            while self._accept("punct", ","):
+                options.append(self._primary())
+            self._expect("punct", ")")
+
+            def contains(doc, params):
+                value = left(doc, params)
+                if value is _UNDEFINED:
+                    return _UNDEFINED
+                return any(_compare("=", value, option(doc, params)) is True for option in options) != negate
+            return contains
+        if self._accept("keyword", "BETWEEN"):
+            low = self._primary()
+            self._expect("keyword", "AND")
+            high = self._primary()
+
+            def between(doc, params):
+                value = left(doc, params)
+                result = _compare(">=", value, low(doc, params)) is True and _compare("<=", value, high(doc, params)) is True
+                return result != negate
+            return between
+        if negate:
+            self._error("NOT")
+        return left
+
+    def _primary(self):
+        token = self._peek()
+        if token is None:
+            self._error()
+        kind, value = token
+        if kind == "punct" and value == "-" and self._peek(1) and self._peek(1)[0] == "number":
+            self._position += 1
+            number = self._primary()
+            return lambda doc, params: -number(doc, params)
+        self._position += 1
+        if kind == "number":
+            number = float(value) if "." in value else int(value)
+            return lambda doc, params: number
+        if kind == "string":
+            text = re.sub(r"\\(.)", r"\1", value[1:-1])
+            return lambda doc, params: text
+        if kind == "param":
+            def parameter(doc, params):
+                if value not in params:
+                    raise LocalBackendError(400, f"Parameter '{value}' is not defined: {self.query}")
+                return params[value]
+            return parameter
+        if kind == "keyword" and value in ("TRUE", "FALSE", "NULL"):
+            constant = {"TRUE": True, "FALSE": False, "NULL": None}[value]
+            return lambda doc, params: constant
+        if kind == "punct" and value == "(":
+            inner = self._expression()
+            self._expect("punct", ")")
+            return inner
+        if kind == "punct" and value == "{":
+            return self._object()
+        if kind == "punct" and value == "[":
+            items = []
+            while not self._accept("punct", "]"):
+                if items:
+                    self._expect("punct", ",")
+                items.append(self._primary())
+            return lambda doc, params: [item(doc, params) for item in items]
+        if kind == "name" and value == self.alias:
+            return self._path()
+        if kind == "name" and value.upper() in _FUNCTIONS and self._accept("punct", "("):
+            name, arguments = value.upper(), []
+            while not self._accept("punct", ")"):
+                if arguments:
+                    self._expect("punct", ",")
+                arguments.append(self._expression())
+            return lambda doc, params: _function(name, [argument(doc, params) for argument in arguments])
+        self._position -= 1
+        self._error()
+
+    def _path(self):
+        segments = []
+        while True:
+            if self._accept("punct", "."):
+                segments.append(self._expect("name"))
+            elif self._accept("punct", "["):
+                token = self._peek()
+                if token and token[0] == "string":
+                    segments.append(re.sub(r"\\(.)", r"\1", token[1][1:-1]))
+                elif token and token[0] == "number":
+                    segments.append(int(token[1]))
+                else:
+                    self._error()
+                self._position += 1
+                self._expect("punct", "]")
+            else:
+                break
+
+        def resolve(doc, params):
+            current = doc
+            for segment in segments:
+                if isinstance(segment, int) and isinstance(current, list) and segment < len(current):
+                    current = current[segment]
+                elif isinstance(current, dict) and segment in current:
+                    current = current[segment]
+                else:
+                    return _UNDEFINED
+            return current
+        return resolve
+
+    def _object(self):
+        members = []
+        while not self._accept("punct", "}"):
+            if members:
+                self._expect("punct", ",")
+            key = self._accept("string") or self._expect("name")
+            key = key[1:-1] if key[0] in "'\"" else key
+            self._expect("punct", ":")
+            members.append((key, self._expression()))
+
+        def build(doc, params):
+            result = {}
+            for key, expression in members:
+                value = expression(doc, params)
+                if value is not _UNDEFINED:
+                    result[key] = value
+            return result
+        return build
+
+    def execute(self, documents, parameters=None) -> list:
+        params = {parameter["name"]: parameter["value"] for parameter in parameters or []}
+        rows = [doc for doc in documents if self.where is None or self.where(doc, params) is True]
+        for expression, descending in reversed(self.order_by):
+            rows.sort(key=lambda doc: _type_rank(expression(doc, params)), reverse=descending)
+
+        if self.aggregate:
+            results = [self._aggregate(rows, params)]
+        elif self.select is None:
+            results = [copy.deepcopy(doc) for doc in rows]
+        elif self.value:
+            results = [copy.deepcopy(value) for value in (self.select[0][1](doc, params) for doc in rows) if value is not _UNDEFINED]
+        else:
+            results = []
+            for doc in rows:
+                row = {}
+                for alias, expression, _ in self.select:
+                    value = expression(doc, params)
+                    if value is not _UNDEFINED:
+                        row[alias] = copy.deepcopy(value)
+                results.append(row)
+
+        if self.distinct:
+            seen, unique = set(), []
+            for result in results:
+                key = json.dumps(result, sort_keys=True, default=str)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(result)
+            results = unique
+        if self.offset is not None:
+            results = results[self.offset:self.offset + self.limit]
+        if self.top is not None:
+            results = results[:self.top]
+        return results
+
+    def _aggregate(self, rows, params):
+        row = {}
+        for alias, _, aggregate in self.select:
+            if aggregate is None:
+                self._error(alias)
+            name, argument = aggregate
+            values = [value for value in (argument(doc, params) for doc in rows) if value is not _UNDEFINED]
+            numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+            if name == "COUNT":
+                row[alias] = len(values)
+            elif name == "SUM":
+                row[alias] = sum(numbers)
+            elif name == "AVG" and numbers:
+                row[alias] = sum(numbers) / len(numbers)
+            elif name in ("MIN", "MAX") and values:
+                row[alias] = (min if name == "MIN" else max)(values, key=_type_rank)
+        return row[self.select[0][0]] if self.value else row
+
+def synthetic_claims(count: int) -> list:
+    """Deterministic claim documents shaped like challenge 1's crash reports (CL001, CL002, ...)."""
+    policies = ("LIAB-AUTO-001", "COMP-AUTO-001", "COMM-AUTO-001", "HIGH-VALUE-001", "MOTO-001")
+    vehicles = ("2019 Toyota Camry", "2021 Honda Civic", "2018 Ford F-150", "2022 Tesla Model 3", "2020 Yamaha MT-07")
+    documents = []
+    for number in range(1, count + 1):
+        rng = seeded_rng("claim", number)
+        claim_id = f"CL{number:03d}"
+        documents.append({
+            "id": claim_id,
+            "claim_id": claim_id,
+            "structured_claim_info": {
+                "claimant_id": claim_id,
+                "policyholder_name": f"Policyholder {number}",
+                "policy_number": policies[(number - 1) % len(policies)],
+                "vehicle_year_make_model": rng.choice(vehicles),
+                "incident_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "incident_location": f"{rng.randint(1, 999)} Main Street",
+                "incident_description": rng.choice(("Rear-ended at a traffic light", "Side collision in a parking lot", "Hit a guardrail on the highway")),
+                "damage_description": rng.choice(("Rear bumper and trunk damage", "Driver side door dented", "Front bumper and headlight broken")),
+                "police_report_number": f"PR-{rng.randint(10000, 99999)}",
+                "claim_request": f"Repair estimate of ${rng.randint(800, 15000)}",
+            },
+            "image_descriptions": [{
+                "crash_number": f"crash{number}",
+                "image_file": f"crash{number}.jpg",
+                "description": "Synthetic crash photo description generated by the local backend.",
+            }],
+        })
+    return documents
+
+class LocalCosmosStore:
+    """
+    In-memory Cosmos DB accounts behind the local clients. LOCAL_COSMOS_DATA points to a JSON file
+    with a list of documents (served by every container) or {"database/container": {"partition_key",
+    "items"}}, as written by `export-cosmos`; without it every container serves synthetic claims.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._containers = {}
+        self._shared_items = None
+        self._seeded = {}
+        data_path = os.environ.get("LOCAL_COSMOS_DATA")
+        if data_path:
+            with open(data_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = synthetic_claims(int(os.environ.get("LOCAL_COSMOS_SYNTHETIC_CLAIMS", "5")))
+        if isinstance(data, list):
+            self._shared_items = data
+        else:
+            for name, container in data.items():
+                if isinstance(container, list):
+                    container = {"items": container}
+                self._seeded[name] = (container.get("partition_key") or DEFAULT_PARTITION_KEY, container.get("items") or [])
+
+    def container(self, database: str, name: str, create: bool = True, partition_key: str = None):
+        with self._lock:
+            state = self._containers.get((database, name))
+            if state is None:
+                if not create:
+                    raise LocalBackendError(404, f"Resource Not Found. Container '{database}/{name}' does not exist.")
+                seeded_key, items = self._seeded.get(f"{database}/{name}", (None, self._shared_items or []))
+                state = {"partition_key": partition_key or seeded_key or DEFAULT_PARTITION_KEY, "items": {}}
+                self._containers[(database, name)] = state
+                for item in items:
+                    self._write(state, copy.deepcopy(item))
+            return state
+
+    def partition_key_value(self, state: dict, document: dict):
+        value = document
+        for segment in [segment for segment in state["partition_key"].split("/") if segment]:
+            value = value.get(segment) if isinstance(value, dict) else None
+        return value
+
+    def _write(self, state: dict, document: dict, ts: int = None) -> dict:
+        if "id" not in document:
+            raise LocalBackendError(400, "The input content is invalid because the required property 'id' is missing.")
+        document["_ts"] = ts or document.get("_ts") or int(time.time())
+        content = {key: value for key, value in document.items() if key != "_etag"}
+        document["_etag"] = f'"{hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]}"'
+        state["items"][(json.dumps(self.partition_key_value(state, document)), document["id"])] = document
+        return copy.deepcopy(document)
+
+    def read_item(self, state: dict, item: str, partition_key, initial_headers: dict = None) -> dict:
+        with self._lock:
+            document = state["items"].get((json.dumps(partition_key), item))
+            if document is None:
+                raise LocalBackendError(404, "Entity with the specified id does not exist in the system.")
+            if (initial_headers or {}).get("If-None-Match") == document["_etag"]:
+                raise LocalBackendError(304, "Not Modified")
+            return copy.deepcopy(document)
+
+    def upsert_item(self, state: dict, body: dict, create_only: bool = False) -> dict:
+        with self._lock:
+            key = (json.dumps(self.partition_key_value(state, body)), body.get("id"))
+            if create_only and key in state["items"]:
+                raise LocalBackendError(409, "Entity with the specified id already exists in the system.")
+            return self._write(state, copy.deepcopy(body), ts=int(time.time()))
+
+    def delete_item(self, state: dict, item: str, partition_key):
+        with self._lock:
+            if state["items"].pop((json.dumps(partition_key), item), None) is None:
+                raise LocalBackendError(404, "Entity with the specified id does not exist in the system.")
+
+    def query(self, state: dict, query: str, parameters=None, partition_key=None) -> list:
+        compiled = CosmosQuery(query)
+        with self._lock:
+            documents = list(state["items"].values())
+        if partition_key is not None:
+            documents = [doc for doc in documents if self.partition_key_value(state, doc) == partition_key]
+        return compiled.execute(documents, parameters)
+
+_cosmos_store = None
+
+def get_cosmos_store() -> LocalCosmosStore:
+    global _cosmos_store
+    with _agent_store_lock:
+        if _cosmos_store is None:
+            _cosmos_store = LocalCosmosStore()
+        return _cosmos_store
+
+def _partition_key_path(partition_key) -> str:
+    if partition_key is None or isinstance(partition_key, str):
+        return partition_key
+    if isinstance(partition_key, dict) and partition_key.get("paths"):
+        return partition_key["paths"][0]
+    return getattr(partition_key, "path", None)
+
+class LocalItemPaged:
+    """Query results like azure.core ItemPaged: iterate items, or pages via by_page(continuation_token)."""
+
+    def __init__(self, fetch, page_size: int = None):
+        self._fetch = fetch
+        self._results = None
+        self.page_size = page_size or 100
+
+    def results(self) -> list:
+        if self._results is None:
+            self._results = self._fetch()
+        return self._results
+
+    def _page(self, token):
+        """Items of the page starting at token, and the next token."""
+        try:
+            start = int(token or 0)
+        except ValueError:
+            raise LocalBackendError(400, f"Invalid continuation token '{token}'")
+        results = self.results()
+        end = min(start + self.page_size, len(results))
+        return results[start:end], (str(end) if end < len(results) else None)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token: str = None):
+        return _LocalPageIterator(self, continuation_token)
+
+class _LocalPageIterator:
+    def __init__(self, paged: LocalItemPaged, token: str):
+        self._paged = paged
+        self._started = False
+        self.continuation_token = token
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._started and self.continuation_token is None:
+            raise StopIteration
+        self._started = True
+        time.sleep(cosmos_latency().sample(_call_rng))
+        items, self.continuation_token = self._paged._page(self.continuation_token)
+        return iter(items)
+
+class _AsyncItems:
+    def __init__(self, items):
+        self._items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class LocalAsyncItemPaged(LocalItemPaged):
+    """Async counterpart of LocalItemPaged (azure.core AsyncItemPaged)."""
+
+    async def _items(self):
+        async for page in self.by_page():
+            async for item in page:
+                yield item
+
+    def __aiter__(self):
+        return self._items()
+
+    def by_page(self, continuation_token: str = None):
+        return _LocalAsyncPageIterator(self, continuation_token)
+
+class _LocalAsyncPageIterator(_LocalPageIterator):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._started and self.continuation_token is None:
+            raise StopAsyncIteration
+        self._started = True
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        items, self.continuation_token = self._paged._page(self.continuation_token)
+        return _AsyncItems(items)
+
+class LocalContainerProxy:
+    """Stand-in for azure.cosmos ContainerProxy over a LocalCosmosStore container."""
+
+    _paged_class = LocalItemPaged
+
+    def __init__(self, store: LocalCosmosStore, database: str, container: str):
+        self._store = store
+        self.database_name = database
+        self.id = container
+
+    def _state(self):
+        return self._store.container(self.database_name, self.id)
+
+    def _sleep(self):
+        time.sleep(cosmos_latency().sample(_call_rng))
+
+    def _properties(self):
+        return {"id": self.id, "partitionKey": {"paths": [self._state()["partition_key"]], "kind": "Hash"},
+                "indexingPolicy": {"indexingMode": "consistent", "automatic": True}}
+
+    def read(self, **kwargs):
+        self._sleep()
+        return self._properties()
+
+    def read_item(self, item, partition_key, initial_headers: dict = None, **kwargs):
+        self._sleep()
+        return self._store.read_item(self._state(), item, partition_key, initial_headers)
+
+    def query_items(self, query, parameters=None, partition_key=None, enable_cross_partition_query=None, max_item_count=None, **kwargs):
+        state = self._state()
+        return self._paged_class(lambda: self._store.query(state, query, parameters, partition_key), max_item_count)
+
+    def read_all_items(self, max_item_count=None, **kwargs):
+        return self.query_items("SELECT * FROM c", max_item_count=max_item_count)
+
+    def upsert_item(self, body: dict, **kwargs):
+        self._sleep()
+        return self._store.upsert_item(self._state(), body)
+
+    def create_item(self, body: dict, **kwargs):
+        self._sleep()
+        return self._store.upsert_item(self._state(), body, create_only=True)
+
+    def replace_item(self, item, body: dict, **kwargs):
+        self._sleep()
+        return self._store.upsert_item(self._state(), body)
+
+    def delete_item(self, item, partition_key, **kwargs):
+        self._sleep()
+        self._store.delete_item(self._state(), item, partition_key)
+
+class AsyncLocalContainerProxy(LocalContainerProxy):
+    """Async stand-in for azure.cosmos.aio ContainerProxy; query_items returns an async pager."""
+
+    _paged_class = LocalAsyncItemPaged
+
+    async def read(self, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        return self._properties()
+
+    async def read_item(self, item, partition_key, initial_headers: dict = None, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        return self._store.read_item(self._state(), item, partition_key, initial_headers)
+
+    async def upsert_item(self, body: dict, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        return self._store.upsert_item(self._state(), body)
+
+    async def create_item(self, body: dict, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        return self._store.upsert_item(self._state(), body, create_only=True)
+
+    async def replace_item(self, item, body: dict, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        return self._store.upsert_item(self._state(), body)
+
+    async def delete_item(self, item, partition_key, **kwargs):
+        await asyncio.sleep(cosmos_latency().sample(_call_rng))
+        self._store.delete_item(self._state(), item, partition_key)
+
+class LocalDatabaseProxy:
+    """Stand-in for azure.cosmos DatabaseProxy."""
+
+    _container_class = LocalContainerProxy
+
+    def __init__(self, store: LocalCosmosStore, database: str):
+        self._store = store
+        self.id = database
+
+    def get_container_client(self, container):
+        return self._container_class(self._store, self.id, getattr(container, "id", container))
+
+    def create_container(self, id: str, partition_key=None, **kwargs):
+        if (self.id, id) in self._store._containers:
+            raise LocalBackendError(409, f"Container '{self.id}/{id}' already exists.")
+        return self.create_container_if_not_exists(id, partition_key)
+
+    def create_container_if_not_exists(self, id: str, partition_key=None, **kwargs):
+        self._store.container(self.id, id, partition_key=_partition_key_path(partition_key))
+        return self.get_container_client(id)
+
+class AsyncLocalDatabaseProxy(LocalDatabaseProxy):
+    _container_class = AsyncLocalContainerProxy
+
+    async def create_container(self, id: str, partition_key=None, **kwargs):
+        return LocalDatabaseProxy.create_container(self, id, partition_key)
+
+    async def create_container_if_not_exists(self, id: str, partition_key=None, **kwargs):
+        return LocalDatabaseProxy.create_container_if_not_exists(self, id, partition_key)
+
+class LocalCosmosClient:
+    """Stand-in for azure.cosmos CosmosClient; every endpoint shares the process-wide LocalCosmosStore."""
+
+    _database_class = LocalDatabaseProxy
+
+    def __init__(self, url: str = None, credential=None, **kwargs):
+        self.url = url or LOCAL_COSMOS_ENDPOINT
+        self._store = get_cosmos_store()
+
+    def get_database_client(self, database):
+        return self._database_class(self._store, getattr(database, "id", database))
+
+    def create_database_if_not_exists(self, id: str, **kwargs):
+        return self.get_database_client(id)
+
+    def create_database(self, id: str, **kwargs):
+        return self.get_database_client(id)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class AsyncLocalCosmosClient(LocalCosmosClient):
+    """Stand-in for azure.cosmos.aio CosmosClient."""
+
+    _database_class = AsyncLocalDatabaseProxy
+
+    async def create_database_if_not_exists(self, id: str, **kwargs):
+        return self.get_database_client(id)
+
+    async def create_database(self, id: str, **kwargs):
+        return self.get_database_client(id)
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+# Installation
+
+_installed = None
+
+def _swap(module_name: str, attribute: str, make_replacement, import_module: bool = True) -> bool:
+    """
+    Replace module.attribute, and every reference to it already imported by other modules
+    (e.g. `from azure.cosmos import CosmosClient`), with make_replacement(original).
+    """
+    if import_module:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            return False
+    module = sys.modules.get(module_name)
+    original = getattr(module, attribute, None)
+    if original is None:
+        return False
+    replacement = make_replacement(original)
+    for loaded in list(sys.modules.values()):
+        namespace = getattr(loaded, "__dict__", None)
+        # The defining module keeps the original, so the SDK's own references stay intact
+        if not isinstance(namespace, dict) or getattr(loaded, "__name__", None) == getattr(original, "__module__", None):
+            continue
+        for name, value in list(namespace.items()):
+            if value is original:
+                setattr(loaded, name, replacement)
+    setattr(module, attribute, replacement)
+    return True
+
+def _subclass(mixin):
+    """Mixin placed before the real class, so isinstance checks (e.g. Semantic Kernel's pydantic models) still pass."""
+    return lambda original: type(original.__name__, (mixin, original) if isinstance(original, type) else (mixin,), {})
+
+def install(mode: str = None):
+    """
+    Swap the Azure SDK clients for the local stand-ins (fake, replay) or wrap them for recording
+    (record). Call it before the clients are created. Returns the active mode, None if disabled.
+    """
+    global _installed
+    mode = mode or backend_mode()
+    if mode is None or mode == _installed:
+        return mode
+    if _installed:
+        raise RuntimeError(f"Local backend is already installed in '{_installed}' mode")
+    if mode not in MODES:
+        raise ValueError(f"Local backend mode must be one of {', '.join(MODES)}, got '{mode}'")
+    _installed = mode
+
+    if mode == "record":
+        _swap("azure.ai.projects", "AIProjectClient", _subclass(_RecordingProjectClient))
+        _swap("azure.ai.projects.aio", "AIProjectClient", _subclass(_AsyncRecordingProjectClient))
+        print(f"🎙️ Local backend recording agent runs to {fixtures_path()}")
+        return mode
+
+    for variable, value in (("AI_FOUNDRY_PROJECT_ENDPOINT", LOCAL_PROJECT_ENDPOINT), ("COSMOS_ENDPOINT", LOCAL_COSMOS_ENDPOINT), ("COSMOS_KEY", "local-backend-key")):
+        if not os.environ.get(variable):
+            os.environ[variable] = value
+    _swap("azure.ai.projects", "AIProjectClient", _subclass(_LocalProjectClient))
+    _swap("azure.ai.projects.aio", "AIProjectClient", _subclass(_AsyncLocalProjectClient))
+    for credential in ("DefaultAzureCredential", "AzureCliCredential", "ManagedIdentityCredential"):
+        _swap("azure.identity", credential, lambda original: LocalCredential)
+        _swap("azure.identity.aio", credential, lambda original: AsyncLocalCredential)
+    _swap("azure.cosmos", "CosmosClient", lambda original: LocalCosmosClient)
+    _swap("azure.cosmos.aio", "CosmosClient", lambda original: AsyncLocalCosmosClient)
+    # Importing azure-ai-evaluation is slow; only the evaluator, which imports it first, needs the converter
+    _swap("azure.ai.evaluation", "AIAgentConverter", lambda original: LocalAgentConverter, import_module=False)
+
+    store = get_agent_store()
+    print(f"🧪 Local backend '{mode}': offline agents ({len(store.replies.fixtures)} recorded replies, "
+          f"run latency {store.replies.latency.spec}) and in-memory Cosmos DB")
+    return mode
+
+def export_cosmos(database: str, container: str, output_path: str) -> int:
+    """Dump a real Cosmos DB container into a LOCAL_COSMOS_DATA file. Returns the number of documents."""
+    from azure.cosmos import CosmosClient
+
+    client = CosmosClient(os.environ["COSMOS_ENDPOINT"], os.environ["COSMOS_KEY"])
+    proxy = client.get_database_client(database).get_container_client(container)
+    partition_key = proxy.read().get("partitionKey", {}).get("paths", [DEFAULT_PARTITION_KEY])[0]
+    items = list(proxy.query_items(query="SELECT * FROM c", enable_cross_partition_query=True))
+
+    data = {}
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    data[f"{database}/{container}"] = {"partition_key": partition_key, "items": items}
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return len(items)
+
+if __name__ == "__main__":
+    # python local_backend.py export-cosmos <database> <container> <output.json> | python local_backend.py fixtures
+    if sys.argv[1:2] == ["export-cosmos"] and len(sys.argv) == 5:
+        from dotenv import load_dotenv
+        load_dotenv()
+        count = export_cosmos(*sys.argv[2:5])
+        print(f"✅ Exported {count} documents from {sys.argv[2]}/{sys.argv[3]} to {sys.argv[4]}")
+    elif sys.argv[1:2] == ["fixtures"]:
+        fixtures = FixtureStore(fixtures_path())
+        print(f"📼 {len(fixtures)} recorded replies in {fixtures.path}")
+        for name in fixtures.agent_names():
+            print(f"  - {name}")
+    else:
+        print("Usage: python local_backend.py export-cosmos <database> <container> <output.json> | fixtures")
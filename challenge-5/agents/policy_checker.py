@@ -1,33 +1,324 @@
+import time
+# Start of the module import, reported as IMPORT_SECONDS
+_IMPORT_STARTED = time.perf_counter()
 import os
+import re
+import asyncio
+import inspect
 from typing import Annotated
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
-from azure.ai.agents.models import AzureAISearchQueryType, AzureAISearchTool, ListSortOrder, MessageRole
 from semantic_kernel.functions import kernel_function
-from semantic_kernel.agents import AzureAIAgent
 from dotenv import load_dotenv
+# Re-exported: the semantic cache and the local policy index share these embedders
+from embeddings import AzureOpenAIEmbedder, HashingEmbedder
+
+# The Azure SDKs are imported on first use: importing this module must stay cheap and never touch the network
 
 load_dotenv()
 
+# Run states after which no more output will arrive
+TERMINAL_RUN_STATUSES = ("completed", "failed", "cancelled", "expired", "incomplete")
+
+async def _resolve(value):
+    """Await value if the pluggable callable that produced it was async."""
+    return await value if inspect.isawaitable(value) else value
+
+async def search_index_version(index_name: str = "insurance-documents-index"):
+    """
+    Version token of the Azure AI Search policy index: its ETag plus document count and
+    storage size, which all change when the index is recreated or re-ingested.
+    """
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents.indexes.aio import SearchIndexClient
+    
+    async with SearchIndexClient(os.environ["SEARCH_SERVICE_ENDPOINT"], AzureKeyCredential(os.environ["SEARCH_ADMIN_KEY"])) as client:
+        index = await client.get_index(index_name)
+        stats = await client.get_index_statistics(index_name)
+    return f"{index.e_tag}:{stats.get('document_count')}:{stats.get('storage_size')}"
+
+# Policy-type keywords; two queries only share a cached answer if they name the same types
+POLICY_TYPE_KEYWORDS = {
+    "COMMERCIAL": r"\bcommercial\b",
+    "COMPREHENSIVE": r"\bcomprehensive\b",
+    "HIGH_VALUE": r"\bhigh[\s-]*value\b",
+    "LIABILITY": r"\bliability\b",
+    "MOTORCYCLE": r"\bmotor\s*(?:cycle|bike)s?\b",
+}
+
+def query_identifiers(query: str) -> frozenset:
+    """
+    Identifiers that must match exactly for two policy queries to share an answer: every
+    token containing a digit (policy numbers such as LIAB-AUTO-001, claim IDs such as CL001,
+    amounts and years) and the policy types named in the query.
+    """
+    tokens = re.findall(r"[A-Za-z0-9]+(?:[-_.,][A-Za-z0-9]+)*", query)
+    identifiers = {token.replace(",", "").upper() for token in tokens if any(ch.isdigit() for ch in token)}
+    identifiers.update(name for name, pattern in POLICY_TYPE_KEYWORDS.items() if re.search(pattern, query, re.IGNORECASE))
+    return frozenset(identifiers)
+
+class SemanticCache:
+    """
+    Opt-in in-memory semantic cache of policy answers. Queries are embedded with a pluggable
+    embed(texts) -> vectors function (sync or async) and answered from the nearest cached
+    query that names exactly the same identifiers (see query_identifiers) when its cosine
+    similarity reaches the threshold - similarity alone cannot tell COMP-AUTO-001 from
+    LIAB-AUTO-001. Entries expire after the TTL, and the whole cache is dropped when
+    version_provider() reports a rebuilt policy index.
+    """
+    
+    def __init__(self, embed, threshold: float = None, ttl_seconds: float = None, max_entries: int = None, version_provider=None, version_check_seconds: float = None):
+        self.embed = embed
+        self.threshold = threshold if threshold is not None else float(os.environ.get("POLICY_CACHE_THRESHOLD", "0.92"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.environ.get("POLICY_CACHE_TTL_SECONDS", "3600"))
+        self.max_entries = max_entries or int(os.environ.get("POLICY_CACHE_MAX_ENTRIES", "512"))
+        self.version_provider = version_provider
+        self.version_check_seconds = version_check_seconds if version_check_seconds is not None else float(os.environ.get("POLICY_CACHE_VERSION_CHECK_SECONDS", "60"))
+        self.version = None
+        self._version_checked_at = 0.0
+        # Parallel lists; row i of the matrix is the unit-length embedding of _entries[i]
+        self._entries = []
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @classmethod
+    def from_env(cls):
+        """Cache backed by Azure OpenAI embeddings when POLICY_CACHE_ENABLED is set, else None."""
+        if os.environ.get("POLICY_CACHE_ENABLED", "0").lower() not in ("1", "true", "yes"):
+            return None
+        if not os.environ.get("AZURE_OPENAI_ENDPOINT") or not os.environ.get("AZURE_OPENAI_KEY"):
+            return None
+        version_provider = None
+        if os.environ.get("SEARCH_SERVICE_ENDPOINT") and os.environ.get("SEARCH_ADMIN_KEY"):
+            version_provider = search_index_version
+        return cls(AzureOpenAIEmbedder(), version_provider=version_provider)
+    
+    def invalidate(self):
+        """Drop every cached answer, e.g. after the policy index was rebuilt."""
+        self._entries = []
+        self._matrix = None
+        self.invalidations += 1
+    
+    async def _check_version(self):
+        if self.version_provider is None or time.monotonic() - self._version_checked_at < self.version_check_seconds:
+            return
+        self._version_checked_at = time.monotonic()
+        try:
+            version = await _resolve(self.version_provider())
+        except Exception as e:
+            # Keep serving; the TTL still bounds staleness
+            print(f"⚠️ Could not read the policy index version: {str(e)}")
+            return
+        if self.version is not None and version != self.version:
+            print("♻️ Policy index changed, clearing the policy answer cache")
+            self.invalidate()
+        self.version = version
+    
+    async def _embed(self, query: str):
+        import numpy as np
+        vector = np.asarray((await _resolve(self.embed([query])))[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _evict_expired(self):
+        now = time.monotonic()
+        keep = [i for i, entry in enumerate(self._entries) if entry["expires_at"] > now]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep] if keep else None
+    
+    async def lookup(self, query: str):
+        """Return (cached answer or None, query embedding); pass the embedding on to store()."""
+        await self._check_version()
+        embedding = await self._embed(query)
+        self._evict_expired()
+        identifiers = query_identifiers(query)
+        candidates = [i for i, entry in enumerate(self._entries) if entry["identifiers"] == identifiers]
+        if candidates:
+            similarities = self._matrix[candidates] @ embedding
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                self.hits += 1
+                return self._entries[candidates[best]]["answer"], embedding
+        self.misses += 1
+        return None, embedding
+    
+    async def store(self, query: str, answer: str, embedding=None):
+        """Cache an answer for a query."""
+        import numpy as np
+        if embedding is None:
+            embedding = await self._embed(query)
+        if len(self._entries) >= self.max_entries:
+            # Oldest entries go first
+            self._entries = self._entries[1:]
+            self._matrix = self._matrix[1:]
+        self._entries.append({"query": query, "identifiers": query_identifiers(query), "answer": answer, "expires_at": time.monotonic() + self.ttl_seconds})
+        row = embedding.reshape(1, -1)
+        self._matrix = row if self._matrix is None or not len(self._matrix) else np.vstack([self._matrix, row])
+    
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "index_version": self.version,
+        }
+
+class ThreadPool:
+    """
+    Warm pool of empty agent threads. acquire() hands out a pre-created thread so a query
+    does not pay for thread creation; release() deletes the thread in the background (or
+    returns it to the pool while it has uses left) and tops the pool back up. max_uses defaults
+    to 1, a fresh thread per query; reusing a thread (max_uses > 1) keeps earlier queries in the
+    agent's context.
+    """
+    
+    def __init__(self, agents_client, size: int = None, max_uses: int = None):
+        self.agents_client = agents_client
+        self.size = size if size is not None else int(os.environ.get("POLICY_CHECK_THREAD_POOL_SIZE", "4"))
+        self.max_uses = max(1, max_uses or int(os.environ.get("POLICY_CHECK_THREAD_MAX_USES", "1")))
+        self._idle = []
+        self._uses = {}
+        self._refilling = 0
+        self._tasks = set()
+        self.created = 0
+        self.deleted = 0
+    
+    def _spawn(self, coroutine):
+        """Run a background task, keeping a reference until it finishes."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _create(self):
+        thread = await self.agents_client.threads.create()
+        self.created += 1
+        self._uses[thread.id] = 0
+        return thread
+    
+    async def _refill_one(self):
+        try:
+            self._idle.append(await self._create())
+        except Exception as e:
+            print(f"⚠️ Could not pre-create a policy checker thread: {str(e)}")
+        finally:
+            self._refilling -= 1
+    
+    def fill(self):
+        """Start creating threads in the background until the pool is full."""
+        missing = self.size - len(self._idle) - self._refilling
+        for _ in range(max(missing, 0)):
+            self._refilling += 1
+            self._spawn(self._refill_one())
+    
+    async def acquire(self):
+        """Take a warm thread, or create one if the pool is empty."""
+        thread = self._idle.pop() if self._idle else await self._create()
+        self.fill()
+        return thread
+    
+    async def _delete(self, thread_id: str):
+        try:
+            await self.agents_client.threads.delete(thread_id)
+            self.deleted += 1
+        except Exception as e:
+            print(f"⚠️ Could not delete policy checker thread {thread_id}: {str(e)}")
+    
+    def release(self, thread, reusable: bool = True):
+        """Return a used thread: back to the pool while it has uses left, otherwise delete it asynchronously."""
+        uses = self._uses.get(thread.id, 0) + 1
+        if reusable and uses < self.max_uses and len(self._idle) < self.size:
+            self._uses[thread.id] = uses
+            self._idle.append(thread)
+            return
+        self._uses.pop(thread.id, None)
+        self._spawn(self._delete(thread.id))
+    
+    def abandon(self) -> list:
+        """Forget the idle threads without deleting them and return their IDs, when this pool's client can no longer be used."""
+        idle, self._idle = self._idle, []
+        self._uses = {}
+        self._tasks = set()
+        return [thread.id for thread in idle]
+    
+    def delete_later(self, thread_ids):
+        """Delete threads another pool left behind, in the background."""
+        for thread_id in thread_ids:
+            self._spawn(self._delete(thread_id))
+    
+    async def close(self):
+        """Delete the idle threads and wait for pending creations and deletions."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._delete(thread.id) for thread in idle))
+        self._uses = {}
+
 class PolicyCheckerWrapper:
-    """Wrapper to make Azure AI Agent Service agent work with Semantic Kernel orchestration"""
+    """
+    Wrapper to make Azure AI Agent Service agent work with Semantic Kernel orchestration.
+    Runs are awaited on the async client, so a slow policy search never blocks the event loop.
+    """
     
-    def __init__(self):
+    def __init__(self, semantic_cache: SemanticCache = None):
+        """semantic_cache defaults to SemanticCache.from_env(), i.e. none unless POLICY_CACHE_ENABLED is set and Azure OpenAI embeddings are configured."""
         self.project_client = None
+        self.credential = None
         self.agent = None
-        self.setup_agent()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else SemanticCache.from_env()
+        self.thread_pool = None
+        # Pooled threads created on a previous event loop, deleted through the next pool's client
+        self._orphaned_threads = []
+        self._loop = None
+        self._setup_lock = None
+        self.use_streaming = os.environ.get("POLICY_CHECK_STREAMING", "1").lower() not in ("0", "false", "no")
+        self.deadline_seconds = float(os.environ.get("POLICY_CHECK_DEADLINE_SECONDS", "120"))
+        self.poll_initial_seconds = float(os.environ.get("POLICY_CHECK_POLL_INITIAL_SECONDS", "0.5"))
+        self.poll_max_seconds = float(os.environ.get("POLICY_CHECK_POLL_MAX_SECONDS", "5"))
+        self.poll_backoff = float(os.environ.get("POLICY_CHECK_POLL_BACKOFF", "1.5"))
+    
+    async def _ensure_agent(self):
+        """Create the async client (once per event loop) and the agent (once per process)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Async clients are bound to the loop that created them
+            if self.thread_pool is not None:
+                self._orphaned_threads.extend(self.thread_pool.abandon())
+            self.project_client = None
+            self.credential = None
+            self.thread_pool = None
+            self._setup_lock = asyncio.Lock()
+            self._loop = loop
+        async with self._setup_lock:
+            if self.project_client is None or self.agent is None:
+                await self.setup_agent()
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPool(self.project_client.agents)
+                self.thread_pool.delete_later(self._orphaned_threads)
+                self._orphaned_threads = []
+                self.thread_pool.fill()
     
-    def setup_agent(self):
+    async def setup_agent(self):
         """Initialize the Azure AI Agent Service policy checker"""
         # Load environment variables
         project_endpoint = os.environ.get("AI_FOUNDRY_PROJECT_ENDPOINT")
         model_deployment_name = "gpt-4.1-mini"
         sc_connection_id = os.environ.get("AZURE_AI_CONNECTION_ID")
         
-        self.project_client = AIProjectClient(
-            endpoint=project_endpoint,
-            credential=DefaultAzureCredential(exclude_interactive_browser_credential=False),
-        )
+        from azure.identity.aio import DefaultAzureCredential
+        from azure.ai.projects.aio import AIProjectClient
+        from azure.ai.agents.models import AzureAISearchQueryType, AzureAISearchTool
+        
+        if self.project_client is None:
+            self.credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
+            self.project_client = AIProjectClient(
+                endpoint=project_endpoint,
+                credential=self.credential,
+            )
+        
+        if self.agent is not None:
+            return
         
         # Initialize the Azure AI Search tool
         ai_search = AzureAISearchTool(
@@ -39,7 +330,7 @@ class PolicyCheckerWrapper:
         )
         
         # Create the agent
-        self.agent = self.project_client.agents.create_agent(
+        self.agent = await self.project_client.agents.create_agent(
             model=model_deployment_name,
             name="policy-checker-wrapper",
             instructions="""
@@ -73,43 +364,187 @@ class PolicyCheckerWrapper:
             tool_resources=ai_search.resources,
         )
     
-    @kernel_function(description="Check insurance policy coverage and validate claims")
-    def check_policy_coverage(self, query: Annotated[str, "Query about policy coverage or claim validation"]) -> Annotated[str, "Policy coverage analysis result"]:
-        """Check policy coverage using the Azure AI Agent Service agent"""
-        
-        # Create a thread for communication with the agent
-        thread = self.project_client.agents.threads.create()
-        
-        # Send a message to the thread
-        message = self.project_client.agents.messages.create(
-            thread_id=thread.id,
-            role=MessageRole.USER,
-            content=query,
-        )
-        
-        # Create and process an agent run
-        run = self.project_client.agents.runs.create_and_process(
-            thread_id=thread.id, 
-            agent_id=self.agent.id
-        )
-        
-        if run.status == "failed":
-            return f"Policy check failed: {run.last_error}"
+    async def close(self):
+        """Delete pooled threads and close the async project client and credential."""
+        if self.thread_pool is not None:
+            await self.thread_pool.close()
+            self.thread_pool = None
+        client, credential = self.project_client, self.credential
+        self.project_client = None
+        self.credential = None
+        for resource in (client, credential):
+            if resource is not None:
+                try:
+                    await resource.close()
+                except Exception:
+                    pass
+    
+    async def _latest_agent_text(self, thread_id: str):
+        """Text of the agent's latest reply in the thread, or None. Only the newest message is fetched."""
+        from azure.ai.agents.models import ListSortOrder, MessageRole
         
-        # Get the agent's response
         messages = self.project_client.agents.messages.list(
-            thread_id=thread.id, 
-            order=ListSortOrder.ASCENDING
+            thread_id=thread_id, 
+            order=ListSortOrder.DESCENDING,
+            limit=1
         )
         
-        for message in messages:
+        async for message in messages:
             if message.role == MessageRole.AGENT:
                 if message.content and len(message.content) > 0:
                     content_item = message.content[0]
                     if content_item.get('type') == 'text' and 'text' in content_item:
                         return content_item['text']['value']
+        return None
+    
+    async def _stream_run(self, thread_id: str, runs: list):
+        """Start a streaming run and yield text deltas as the agent emits them."""
+        from azure.ai.agents.models import AgentStreamEvent, MessageDeltaChunk, ThreadRun
+        
+        status = None
+        async with await self.project_client.agents.runs.stream(thread_id=thread_id, agent_id=self.agent.id) as stream:
+            async for event_type, event_data, _ in stream:
+                if isinstance(event_data, MessageDeltaChunk):
+                    if event_data.text:
+                        yield event_data.text
+                elif isinstance(event_data, ThreadRun):
+                    if (thread_id, event_data.id) not in runs:
+                        runs.append((thread_id, event_data.id))
+                    status = event_data.status
+                    # Like _poll_run: every terminal state other than completed is an error
+                    if status in TERMINAL_RUN_STATUSES and status != "completed":
+                        raise RuntimeError(f"Policy check failed: {event_data.last_error or status}")
+                elif event_type == AgentStreamEvent.ERROR:
+                    raise RuntimeError(f"Policy check failed: {event_data}")
+                elif event_type == AgentStreamEvent.DONE:
+                    break
+        if status != "completed":
+            raise RuntimeError(f"Policy check failed: the run stream ended with the run {status or 'not started'}")
+    
+    async def _poll_run(self, thread_id: str, runs: list):
+        """Start a run and poll it with exponential backoff; yield the reply once it completes."""
+        run = await self.project_client.agents.runs.create(thread_id=thread_id, agent_id=self.agent.id)
+        runs.append((thread_id, run.id))
+        
+        delay = self.poll_initial_seconds
+        while run.status not in TERMINAL_RUN_STATUSES:
+            await asyncio.sleep(delay)
+            delay = min(delay * self.poll_backoff, self.poll_max_seconds)
+            run = await self.project_client.agents.runs.get(thread_id=thread_id, run_id=run.id)
         
-        return "No response received from policy checker"
+        if run.status != "completed":
+            raise RuntimeError(f"Policy check failed: {run.last_error or run.status}")
+        
+        text = await self._latest_agent_text(thread_id)
+        if text:
+            yield text
+    
+    async def stream_policy_coverage(self, query: str, runs: list = None):
+        """
+        Yield the policy checker's answer as it is generated. Falls back to a polled run when
+        streaming is disabled or unavailable. (thread_id, run_id) of started runs are appended to runs.
+        """
+        from azure.ai.agents.models import MessageRole
+        
+        await self._ensure_agent()
+        runs = runs if runs is not None else []
+        
+        # Take a pre-created thread for communication with the agent
+        thread = await self.thread_pool.acquire()
+        completed = False
+        try:
+            # Send a message to the thread
+            await self.project_client.agents.messages.create(
+                thread_id=thread.id,
+                role=MessageRole.USER,
+                content=query,
+            )
+            
+            if self.use_streaming:
+                try:
+                    async for text in self._stream_run(thread.id, runs):
+                        yield text
+                    completed = True
+                    return
+                except RuntimeError:
+                    raise
+                except Exception as e:
+                    # Only fall back if the streaming run never started; otherwise the run would be duplicated
+                    if runs:
+                        raise
+                    print(f"⚠️ Streaming unavailable, polling the run instead: {str(e)}")
+            
+            async for text in self._poll_run(thread.id, runs):
+                yield text
+            completed = True
+        finally:
+            # Threads of failed or cancelled runs are never reused
+            self.thread_pool.release(thread, reusable=completed)
+    
+    @kernel_function(description="Check insurance policy coverage and validate claims")
+    async def check_policy_coverage(self, query: Annotated[str, "Query about policy coverage or claim validation"]) -> Annotated[str, "Policy coverage analysis result"]:
+        """Check policy coverage using the Azure AI Agent Service agent, within the configured deadline"""
+        embedding = None
+        if self.semantic_cache is not None:
+            try:
+                cached, embedding = await self.semantic_cache.lookup(query)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                print(f"⚠️ Policy answer cache unavailable: {str(e)}")
+        
+        parts = []
+        runs = []
+        
+        async def collect():
+            async for text in self.stream_policy_coverage(query, runs):
+                parts.append(text)
+        
+        try:
+            await asyncio.wait_for(collect(), timeout=self.deadline_seconds)
+        except asyncio.TimeoutError:
+            # Stop the run server-side so it does not keep consuming tokens
+            for thread_id, run_id in runs:
+                try:
+                    await self.project_client.agents.runs.cancel(thread_id=thread_id, run_id=run_id)
+                except Exception:
+                    pass
+            if parts:
+                return "".join(parts) + f"\n\n⚠️ Policy check stopped after {self.deadline_seconds:g}s; this answer may be incomplete."
+            return f"Policy check timed out after {self.deadline_seconds:g}s"
+        except RuntimeError as e:
+            return str(e)
+        
+        if not parts:
+            return "No response received from policy checker"
+        
+        answer = "".join(parts)
+        # Only complete answers are cached
+        if self.semantic_cache is not None:
+            try:
+                await self.semantic_cache.store(query, answer, embedding)
+            except Exception as e:
+                print(f"⚠️ Could not cache the policy answer: {str(e)}")
+        return answer
+
+# Module-level wrapper, created on first access so importing this module stays cheap
+_policy_checker_plugin = None
+
+def get_policy_checker_plugin() -> PolicyCheckerWrapper:
+    """Return the process-wide PolicyCheckerWrapper, creating it on first use."""
+    global _policy_checker_plugin
+    if _policy_checker_plugin is None:
+        _policy_checker_plugin = PolicyCheckerWrapper()
+    return _policy_checker_plugin
+
+async def warmup():
+    """Authenticate, create the agent and pre-create pooled threads now instead of on the first query."""
+    await get_policy_checker_plugin()._ensure_agent()
+
+def __getattr__(name):
+    # Keeps `from policy_checker import policy_checker_plugin` working
+    if name == "policy_checker_plugin":
+        return get_policy_checker_plugin()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Create an instance of the wrapper
-policy_checker_plugin = PolicyCheckerWrapper()
\ No newline at end of file
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
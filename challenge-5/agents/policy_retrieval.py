@@ -0,0 +1,268 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import asyncio
+import hashlib
+import inspect
+from typing import Annotated, Dict, List
+from semantic_kernel.functions import kernel_function
+from dotenv import load_dotenv
+from embeddings import AzureOpenAIEmbedder, HashingEmbedder
+
+load_dotenv()
+
+# Policy markdown files indexed by challenge 1, chunked by the same TextChunker as its ingestion pipeline
+CHALLENGE_1_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "challenge-1")
+DEFAULT_POLICY_DIR = os.path.join(CHALLENGE_1_DIR, "data", "policies")
+if CHALLENGE_1_DIR not in sys.path:
+    sys.path.append(CHALLENGE_1_DIR)
+from ingestion import TextChunker
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy_index")
+
+_STOPWORDS = frozenset("a an and are as at be by for from has have if in is it its of on or that the this to was were will with".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, as used by the BM25 index."""
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in _STOPWORDS]
+
+def load_policy_chunks(policy_dir: str = DEFAULT_POLICY_DIR, chunker: TextChunker = None) -> List[Dict]:
+    """Chunk the policy markdown files into the same documents the search index holds."""
+    chunker = chunker or TextChunker()
+    documents = []
+    for file_name in sorted(os.listdir(policy_dir)):
+        if not file_name.endswith(".md"):
+            continue
+        with open(os.path.join(policy_dir, file_name), "r", encoding="utf-8") as f:
+            text_content = f.read()
+        metadata = {"file_name": file_name, "file_type": "markdown", "category": "policies"}
+        for chunk in chunker.chunk_text_for_search(text_content, metadata):
+            documents.append({
+                "title": f"{file_name} - Part {chunk['chunk_id'] + 1}",
+                "content": chunk["content"],
+                "category": "policies",
+                "file_name": file_name,
+                "chunk_id": chunk["chunk_id"],
+                "chunk_count": chunk["chunk_count"],
+            })
+    return documents
+
+async def _embed_texts(embed, texts: List[str]):
+    """Call a sync or async embed(texts) function."""
+    vectors = embed(texts)
+    return await vectors if inspect.isawaitable(vectors) else vectors
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index. Postings are NumPy arrays, so scoring a query is a few
+    vectorized adds per query term.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        import numpy as np
+
+        self.k1 = k1
+        self.b = b
+        self.count = len(documents)
+        postings = {}
+        lengths = np.zeros(self.count, dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_id)
+                postings[token][1].append(tf)
+
+        average_length = float(lengths.mean()) if self.count else 0.0
+        # Per-document length normalisation, precomputed
+        self._norm = k1 * (1 - b + b * lengths / (average_length or 1.0))
+        self._postings = {}
+        for token, (doc_ids, tfs) in postings.items():
+            idf = math.log(1 + (self.count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self._postings[token] = (np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32), idf)
+
+    def scores(self, query: str):
+        """BM25 score of every document for the query."""
+        import numpy as np
+
+        scores = np.zeros(self.count, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            doc_ids, tfs, idf = posting
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[doc_ids])
+        return scores
+
+class LocalPolicyIndex:
+    """
+    Local policy retrieval engine. Chunk embeddings are stored as a unit-length float32 matrix
+    in embeddings.npy and memory-mapped at load; a query is one matrix-vector product for
+    cosine similarity plus a BM25 pass, blended as alpha * cosine + (1 - alpha) * BM25
+    (each scaled to [0, 1]) with an argpartition top-k.
+    """
+
+    def __init__(self, chunks: List[Dict], embeddings, manifest: Dict, alpha: float = None):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.manifest = manifest
+        self.alpha = alpha if alpha is not None else float(os.environ.get("POLICY_RETRIEVAL_ALPHA", "0.5"))
+        self.bm25 = BM25Index([f"{chunk['title']} {chunk['content']}" for chunk in chunks])
+
+    @classmethod
+    async def build(cls, chunks: List[Dict], embed, index_dir: str = DEFAULT_INDEX_DIR, embedder_name: str = "custom", batch_size: int = 16):
+        """Embed the chunks, write the index files and return the loaded index."""
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            vectors.extend(await _embed_texts(embed, [chunk["content"] for chunk in batch]))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "embeddings.npy"), matrix)
+        with open(os.path.join(index_dir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        manifest = {
+            "embedder": embedder_name,
+            "dimensions": int(matrix.shape[1]) if len(matrix) else 0,
+            "count": len(chunks),
+            "version": hashlib.sha256(json.dumps(chunks, sort_keys=True).encode("utf-8")).hexdigest()[:16],
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(os.path.join(index_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        return cls.load(index_dir)
+
+    @classmethod
+    def load(cls, index_dir: str = DEFAULT_INDEX_DIR, alpha: float = None):
+        """Open an index written by build(); the embedding matrix is memory-mapped, not read."""
+        import numpy as np
+
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(index_dir, "chunks.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        return cls(chunks, embeddings, manifest, alpha)
+
+    def search_vector(self, query: str, query_vector, top_k: int = 3) -> List[Dict]:
+        """Hybrid top-k for a query whose embedding is already known."""
+        import numpy as np
+
+        if not self.chunks:
+            return []
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        cosine = np.clip(self.embeddings @ (vector / norm if norm else vector), 0, None)
+        bm25 = self.bm25.scores(query)
+
+        scores = self.alpha * cosine / (cosine.max() or 1.0) + (1 - self.alpha) * bm25 / (bm25.max() or 1.0)
+        top_k = max(1, min(top_k, len(scores)))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+
+        return [
+            {
+                **self.chunks[i],
+                "score": round(float(scores[i]), 4),
+                "vector_score": round(float(cosine[i]), 4),
+                "keyword_score": round(float(bm25[i]), 4),
+            }
+            for i in ranked
+        ]
+
+    async def search(self, query: str, embed, top_k: int = 3) -> List[Dict]:
+        """Embed the query with the index's embedder and return the hybrid top-k chunks."""
+        query_vector = (await _embed_texts(embed, [query]))[0]
+        return self.search_vector(query, query_vector, top_k)
+
+def embedder_for(manifest: Dict):
+    """The embedding function an index was built with, from its manifest."""
+    embedder = manifest.get("embedder", "")
+    if embedder.startswith("hashing-"):
+        return HashingEmbedder(int(embedder.split("-", 1)[1]))
+    return AzureOpenAIEmbedder(deployment=embedder.split(":", 1)[1] if embedder.startswith("azure-openai:") else None)
+
+def default_embedder():
+    """(embed, name): Azure OpenAI when configured, else the offline hashing embedder."""
+    if os.environ.get("AZURE_OPENAI_ENDPOINT") and os.environ.get("AZURE_OPENAI_KEY"):
+        embedder = AzureOpenAIEmbedder()
+        return embedder, f"azure-openai:{embedder.deployment}"
+    return HashingEmbedder(512), "hashing-512"
+
+class LocalPolicySearchPlugin:
+    """
+    Semantic Kernel plugin that serves policy chunks from the local index, so agents can
+    search policies without the AzureAISearchTool round trip.
+    """
+
+    def __init__(self, index: LocalPolicyIndex = None, embed=None, index_dir: str = None):
+        self.index_dir = index_dir or os.environ.get("POLICY_INDEX_DIR", DEFAULT_INDEX_DIR)
+        self.index = index
+        self.embed = embed
+
+    def _get_index(self) -> LocalPolicyIndex:
+        if self.index is None:
+            self.index = LocalPolicyIndex.load(self.index_dir)
+        if self.embed is None:
+            self.embed = embedder_for(self.index.manifest)
+        return self.index
+
+    @kernel_function(description="Search the insurance policy documents for coverage, limits, deductibles and exclusions")
+    async def search_policies(
+        self,
+        query: Annotated[str, "What to look up, e.g. a policy number, policy type or coverage question"],
+        top_k: Annotated[int, "Number of policy excerpts to return (default: 3)"] = 3
+    ) -> Annotated[str, "Matching policy excerpts as JSON"]:
+        """Hybrid vector + keyword search over the local policy chunks."""
+        try:
+            index = self._get_index()
+            results = await index.search(query, self.embed, top_k)
+
+            if not results:
+                return f"🔍 No policy documents found for: {query}"
+
+            return json.dumps({
+                "query": query,
+                "results": [
+                    {"title": result["title"], "file_name": result["file_name"], "score": result["score"], "content": result["content"]}
+                    for result in results
+                ]
+            }, ensure_ascii=False)
+
+        except FileNotFoundError:
+            return f"❌ Local policy index not found in {self.index_dir}. Build it with: python policy_retrieval.py build"
+        except Exception as e:
+            return f"❌ Error searching policy documents: {str(e)}"
+
+if __name__ == "__main__":
+    # python policy_retrieval.py build | python policy_retrieval.py search "<query>"
+    index_dir = os.environ.get("POLICY_INDEX_DIR", DEFAULT_INDEX_DIR)
+    if sys.argv[1:2] == ["build"]:
+        embed, name = default_embedder()
+        chunks = load_policy_chunks(os.environ.get("POLICY_DIR", DEFAULT_POLICY_DIR))
+        print(f"🔧 Embedding {len(chunks)} policy chunks with {name}...")
+        index = asyncio.run(LocalPolicyIndex.build(chunks, embed, index_dir, name))
+        print(f"✅ Local policy index written to {index_dir} ({index.manifest['count']} chunks, {index.manifest['dimensions']} dimensions)")
+    elif sys.argv[1:2] == ["search"] and len(sys.argv) > 2:
+        index = LocalPolicyIndex.load(index_dir)
+        embed = embedder_for(index.manifest)
+        query_vector = asyncio.run(_embed_texts(embed, [sys.argv[2]]))[0]
+        started = time.perf_counter()
+        results = index.search_vector(sys.argv[2], query_vector)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for i, result in enumerate(results, 1):
+            print(f"{i}. {result['title']} (Score: {result['score']:.4f})")
+        print(f"⏱️ Retrieval took {elapsed_ms:.3f} ms (excluding query embedding)")
+    else:
+        print("Usage: python policy_retrieval.py build | search \"<query>\"")
@@ -0,0 +1,42 @@
+"""
+Importing the agent plugins must stay cheap: no clients, no credentials and no network I/O
+until a plugin is first used. Run with: python -m pytest challenge-5/agents
+"""
+import importlib
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("semantic_kernel")
+pytest.importorskip("dotenv")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+def _no_network(*args, **kwargs):
+    raise AssertionError(f"network I/O during import: {args!r}")
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fail any connection attempt or DNS lookup made while the fixture is active."""
+    monkeypatch.setattr(socket.socket, "connect", _no_network)
+    monkeypatch.setattr(socket.socket, "connect_ex", _no_network)
+    monkeypatch.setattr(socket, "create_connection", _no_network)
+    monkeypatch.setattr(socket, "getaddrinfo", _no_network)
+    # Import both modules fresh, and drop them afterwards so other tests get unpatched copies
+    for name in ("tools", "policy_checker"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield
+    for name in ("tools", "policy_checker"):
+        sys.modules.pop(name, None)
+
+@pytest.mark.parametrize("module_name", ["tools", "policy_checker"])
+def test_import_does_no_network_io(offline, monkeypatch, module_name):
+    monkeypatch.setenv("COSMOS_ENDPOINT", "https://example.documents.azure.com:443/")
+    monkeypatch.setenv("COSMOS_KEY", "a2V5")
+    monkeypatch.setenv("AI_FOUNDRY_PROJECT_ENDPOINT", "https://example.services.ai.azure.com/api/projects/p")
+    module = importlib.import_module(module_name)
+    # The plugins are only built on first access
+    assert module.__dict__.get("_cosmos_plugin") is None
+    assert module.__dict__.get("_policy_checker_plugin") is None
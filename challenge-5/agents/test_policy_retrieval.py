@@ -0,0 +1,138 @@
+"""
+Local policy index: build and reload, hybrid ranking and the search plugin, with the offline
+hashing embedder. Run with: python -m pytest challenge-5/agents
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("semantic_kernel")
+pytest.importorskip("dotenv")
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from embeddings import HashingEmbedder
+from policy_retrieval import BM25Index, LocalPolicyIndex, LocalPolicySearchPlugin, embedder_for, load_policy_chunks
+
+CHUNKS = [
+    {"title": "comprehensive_auto_policy.md - Part 1", "content": "Comprehensive coverage pays for theft, fire and hail damage to the vehicle."},
+    {"title": "comprehensive_auto_policy.md - Part 2", "content": "The collision deductible is $500 per claim for the insured vehicle."},
+    {"title": "liability_only_policy.md - Part 1", "content": "Liability coverage pays for bodily injury and property damage to others."},
+    {"title": "motorcycle_policy.md - Part 1", "content": "Motorcycle riders are covered for accessories and custom parts up to $3,000."},
+    {"title": "high_value_vehicle_policy.md - Part 1", "content": "Agreed value coverage for high value and classic vehicles, with no depreciation."},
+]
+for number, chunk in enumerate(CHUNKS):
+    chunk.update(file_name=chunk["title"].split(" - ")[0], category="policies", chunk_id=number, chunk_count=len(CHUNKS))
+
+EMBED = HashingEmbedder(64)
+
+@pytest.fixture
+def index_dir(tmp_path):
+    asyncio.run(LocalPolicyIndex.build(CHUNKS, EMBED, str(tmp_path), "hashing-64", batch_size=2))
+    return str(tmp_path)
+
+def test_build_writes_a_memory_mapped_index(index_dir):
+    index = LocalPolicyIndex.load(index_dir)
+    assert isinstance(index.embeddings, np.memmap)
+    assert index.embeddings.mode == "r"
+    assert index.embeddings.shape == (len(CHUNKS), 64)
+    assert np.allclose(np.linalg.norm(index.embeddings, axis=1), 1.0, atol=1e-5)
+    assert index.manifest["embedder"] == "hashing-64"
+    assert index.manifest["count"] == len(CHUNKS)
+    assert index.manifest["dimensions"] == 64
+    assert index.chunks == CHUNKS
+    # The version only changes with the chunks
+    rebuilt = asyncio.run(LocalPolicyIndex.build(CHUNKS, EMBED, str(Path(index_dir) / "again"), "hashing-64"))
+    assert rebuilt.manifest["version"] == index.manifest["version"]
+    changed = asyncio.run(LocalPolicyIndex.build(CHUNKS[:-1], EMBED, str(Path(index_dir) / "changed"), "hashing-64"))
+    assert changed.manifest["version"] != index.manifest["version"]
+
+def test_search_vector_ranks_by_blended_score(index_dir):
+    index = LocalPolicyIndex.load(index_dir, alpha=0.5)
+    query = "hail damage coverage"
+    results = index.search_vector(query, EMBED([query])[0], top_k=3)
+    assert len(results) == 3
+    assert results[0]["title"] == "comprehensive_auto_policy.md - Part 1"
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+    everything = index.search_vector(query, EMBED([query])[0], top_k=len(CHUNKS))
+    top_cosine = max(result["vector_score"] for result in everything)
+    top_bm25 = max(result["keyword_score"] for result in everything)
+    for result in everything:
+        expected = 0.5 * result["vector_score"] / top_cosine + 0.5 * result["keyword_score"] / top_bm25
+        assert result["score"] == pytest.approx(expected, abs=1e-3)
+
+def test_top_k_is_capped_at_the_number_of_chunks(index_dir):
+    index = LocalPolicyIndex.load(index_dir)
+    assert len(index.search_vector("deductible", EMBED(["deductible"])[0], top_k=50)) == len(CHUNKS)
+    assert len(index.search_vector("deductible", EMBED(["deductible"])[0], top_k=0)) == 1
+
+@pytest.mark.parametrize("alpha, component", [(1.0, "vector_score"), (0.0, "keyword_score")])
+def test_alpha_selects_one_signal(index_dir, alpha, component):
+    index = LocalPolicyIndex.load(index_dir, alpha=alpha)
+    query = "collision deductible per claim"
+    results = index.search_vector(query, EMBED([query])[0], top_k=len(CHUNKS))
+    top = max(result[component] for result in results)
+    for result in results:
+        assert result["score"] == pytest.approx(result[component] / top, abs=1e-3)
+    assert results[0]["title"] == "comprehensive_auto_policy.md - Part 2"
+
+def test_alpha_defaults_to_the_environment(index_dir, monkeypatch):
+    monkeypatch.setenv("POLICY_RETRIEVAL_ALPHA", "0.25")
+    assert LocalPolicyIndex.load(index_dir).alpha == 0.25
+    assert LocalPolicyIndex.load(index_dir, alpha=0.0).alpha == 0.0
+
+def test_search_embeds_the_query(index_dir):
+    index = LocalPolicyIndex.load(index_dir)
+    query = "motorcycle accessories"
+    assert asyncio.run(index.search(query, EMBED, top_k=2)) == index.search_vector(query, EMBED([query])[0], top_k=2)
+
+def test_bm25_scores():
+    bm25 = BM25Index([
+        "hail damage to the roof",
+        "hail hail hail",
+        "windshield glass repair",
+        "hail damage repair after a hail storm across the whole county and several neighbouring towns",
+    ])
+    scores = bm25.scores("hail")
+    assert scores[2] == 0
+    # Term frequency saturates but still helps, and longer documents are normalised down
+    assert scores[1] > scores[0] > scores[3] > 0
+    # Rarer terms carry more weight
+    assert bm25.scores("windshield")[2] > bm25.scores("repair")[2]
+    # Stopwords and unknown terms score nothing
+    assert not bm25.scores("the and of").any()
+    assert not bm25.scores("tornado").any()
+
+def test_embedder_for_rebuilds_the_hashing_embedder(index_dir):
+    embed = embedder_for(LocalPolicyIndex.load(index_dir).manifest)
+    assert isinstance(embed, HashingEmbedder)
+    assert embed.dimensions == 64
+
+def test_load_policy_chunks_reads_markdown_only(tmp_path):
+    (tmp_path / "b_policy.md").write_text("# B\n\nCollision coverage applies.", encoding="utf-8")
+    (tmp_path / "a_policy.md").write_text("# A\n\nTheft is covered.", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("not a policy", encoding="utf-8")
+    chunks = load_policy_chunks(str(tmp_path))
+    assert [chunk["file_name"] for chunk in chunks] == ["a_policy.md", "b_policy.md"]
+    assert chunks[0]["title"] == "a_policy.md - Part 1"
+    assert chunks[0]["category"] == "policies"
+
+def test_plugin_searches_the_index(index_dir):
+    plugin = LocalPolicySearchPlugin(index_dir=index_dir)
+    response = json.loads(asyncio.run(plugin.search_policies("classic vehicle agreed value", top_k=2)))
+    assert response["query"] == "classic vehicle agreed value"
+    assert len(response["results"]) == 2
+    assert response["results"][0]["file_name"] == "high_value_vehicle_policy.md"
+    assert isinstance(plugin.embed, HashingEmbedder)
+
+def test_plugin_reports_a_missing_index(tmp_path):
+    plugin = LocalPolicySearchPlugin(index_dir=str(tmp_path / "missing"))
+    response = asyncio.run(plugin.search_policies("deductible"))
+    assert response.startswith("❌ Local policy index not found")
+    assert "python policy_retrieval.py build" in response
@@ -1,44 +1,969 @@
+import time
+# Start of the module import, reported as IMPORT_SECONDS
+_IMPORT_STARTED = time.perf_counter()
 import os
 import json
+import atexit
+import asyncio
+import base64
+import bisect
+import difflib
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import Annotated
 from semantic_kernel.functions import kernel_function
 
+class CosmosClientPool:
+    """
+    Process-wide cache of Cosmos DB clients and container handles.
+    Clients are created lazily once per (endpoint, key) and reuse their HTTP
+    connection pool; container handles are cached per (endpoint, key, database, container).
+    """
+
+    def __init__(self, pool_maxsize: int = None):
+        self.pool_maxsize = pool_maxsize or int(os.environ.get("COSMOS_POOL_MAXSIZE", "20"))
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._containers = {}
+
+    def _create_client(self, endpoint: str, key: str):
+        """Create a Cosmos DB client backed by a pooled HTTP session."""
+        try:
+            from azure.cosmos import CosmosClient
+        except ImportError:
+            raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+
+        try:
+            import requests
+            from azure.core.pipeline.transport import RequestsTransport
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_maxsize, pool_maxsize=self.pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            transport = RequestsTransport(session=session, session_owner=True)
+        except ImportError:
+            # Fall back to the SDK's default transport, which still keeps connections alive
+            transport = None
+
+        try:
+            if transport is not None:
+                return CosmosClient(endpoint, key, transport=transport)
+            return CosmosClient(endpoint, key)
+        except Exception as e:
+            raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+
+    def get_client(self, endpoint: str, key: str):
+        """Return the shared client for this endpoint, creating it on first use."""
+        client = self._clients.get((endpoint, key))
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get((endpoint, key))
+            if client is None:
+                client = self._create_client(endpoint, key)
+                self._clients[(endpoint, key)] = client
+            return client
+
+    def get_container(self, endpoint: str, key: str, database_name: str, container_name: str):
+        """Return the cached container handle for (endpoint, key, database, container)."""
+        # The key is part of the cache key so a handle never outlives the client it was made from
+        cache_key = (endpoint, key, database_name, container_name)
+        container = self._containers.get(cache_key)
+        if container is not None:
+            return container
+        client = self.get_client(endpoint, key)
+        with self._lock:
+            container = self._containers.get(cache_key)
+            if container is None:
+                database = client.get_database_client(database_name)
+                container = database.get_container_client(container_name)
+                self._containers[cache_key] = container
+            return container
+
+    def close(self):
+        """Close every pooled client and drop all cached handles."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._containers.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+# Shared by every CosmosDBPlugin instance in this process
+cosmos_client_pool = CosmosClientPool()
+
+def close_cosmos_clients():
+    """Shutdown hook: close the shared Cosmos DB clients."""
+    cosmos_client_pool.close()
+
+atexit.register(close_cosmos_clients)
+
+def _is_not_found(e: Exception) -> bool:
+    """True if a Cosmos DB exception means the item does not exist."""
+    return getattr(e, "status_code", None) == 404 or "NotFound" in str(e)
+
+class ClaimIndex:
+    """
+    In-process claim_id -> (document id, partition key value) lookup.
+    Warmed from a projection query and refreshed incrementally on the _ts watermark,
+    so get_document_by_claim_id can do a single-partition point read instead of a
+    cross-partition query. Deleted documents are dropped when a point read returns 404.
+    Once warm it doubles as the claim-ID catalog for "did you mean" suggestions. A miss is
+    never authoritative (the claim may be newer than the last refresh), so it still goes
+    to Cosmos DB - single-partition when the container is partitioned on /claim_id.
+    """
+
+    def __init__(self, refresh_interval: float = None, miss_refresh_interval: float = None):
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get("COSMOS_CLAIM_INDEX_REFRESH_SECONDS", "300"))
+        if miss_refresh_interval is None:
+            miss_refresh_interval = float(os.environ.get("COSMOS_CLAIM_INDEX_MISS_REFRESH_SECONDS", "15"))
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self.partition_key_path = None
+        self._entries = {}
+        self._sorted_claim_ids = None
+        self._watermark = 0
+        self._refreshed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def set_partition_key_paths(self, paths):
+        """Record the container's partition key path (from container.read())."""
+        self.partition_key_path = paths[0] if paths else "/id"
+
+    def _partition_key_segments(self):
+        return [segment for segment in (self.partition_key_path or "/id").split("/") if segment]
+
+    def is_warm(self) -> bool:
+        """True once the index has been loaded from Cosmos DB at least once."""
+        return self._refreshed_at is not None
+
+    def try_begin_refresh(self, max_age: float = None) -> bool:
+        """Claim the next refresh if the index is older than max_age (default refresh_interval) and none is running."""
+        if max_age is None:
+            max_age = self.refresh_interval
+        with self._lock:
+            if self._refreshing:
+                return False
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+                return False
+            self._refreshing = True
+            return True
+
+    def abort_refresh(self):
+        """Release a refresh claimed with try_begin_refresh() that failed."""
+        with self._lock:
+            self._refreshing = False
+
+    def projection_query(self):
+        """Return (query, parameters) selecting only the fields the index needs."""
+        pk_expression = "c" + "".join(f'["{segment}"]' for segment in self._partition_key_segments())
+        query = f"SELECT c.id, c.claim_id, {pk_expression} AS pk, c._ts FROM c"
+        parameters = []
+        if self._watermark:
+            # >= so documents written in the same second as the last refresh are not missed
+            query += " WHERE c._ts >= @watermark"
+            parameters.append({"name": "@watermark", "value": self._watermark})
+        return query, parameters
+
+    def apply(self, rows):
+        """Merge projection rows into the index and complete the refresh."""
+        with self._lock:
+            for row in rows:
+                claim_id = row.get("claim_id")
+                if claim_id is not None and row.get("pk") is not None:
+                    self._entries[claim_id] = (row["id"], row["pk"])
+                    self._sorted_claim_ids = None
+                self._watermark = max(self._watermark, row.get("_ts") or 0)
+            self._refreshed_at = time.monotonic()
+            self._refreshing = False
+
+    def claim_partition(self, claim_id: str):
+        """The partition key value holding claim_id when the container is partitioned on /claim_id, else None."""
+        return claim_id if self.partition_key_path == "/claim_id" else None
+
+    def partition_key_of(self, document):
+        """Extract the partition key value from a document, or None if the path is not known yet."""
+        if self.partition_key_path is None:
+            return None
+        pk = document
+        for segment in self._partition_key_segments():
+            pk = pk.get(segment) if isinstance(pk, dict) else None
+        return pk
+
+    def record(self, document):
+        """Index a document fetched through the query fallback."""
+        claim_id = document.get("claim_id")
+        pk = self.partition_key_of(document)
+        if claim_id is not None and pk is not None:
+            with self._lock:
+                self._entries[claim_id] = (document["id"], pk)
+                self._sorted_claim_ids = None
+
+    def lookup(self, claim_id: str):
+        """Return (document id, partition key) for claim_id, or None."""
+        return self._entries.get(claim_id)
+
+    def discard(self, claim_id: str):
+        with self._lock:
+            if self._entries.pop(claim_id, None) is not None:
+                self._sorted_claim_ids = None
+
+    def claim_ids(self):
+        """All known claim IDs, sorted."""
+        with self._lock:
+            if self._sorted_claim_ids is None:
+                self._sorted_claim_ids = sorted(self._entries, key=str)
+            return self._sorted_claim_ids
+
+    def suggest(self, claim_id: str, limit: int = 10):
+        """Nearest known claim IDs: fuzzy matches first, then sorted neighbours."""
+        claim_ids = self.claim_ids()
+        folded = {}
+        for known in claim_ids:
+            folded.setdefault(str(known).casefold(), known)
+        close = [folded[match] for match in difflib.get_close_matches(str(claim_id).casefold(), list(folded), n=limit, cutoff=0.6)]
+        position = bisect.bisect_left([str(known) for known in claim_ids], str(claim_id))
+        start = max(0, min(position - limit // 2, len(claim_ids) - limit))
+        neighbours = claim_ids[start:start + limit]
+        return (close + [known for known in neighbours if known not in close])[:limit]
+
+class DocumentCache:
+    """
+    Bounded TTL + LRU cache of Cosmos DB documents with request coalescing.
+    Concurrent lookups of the same key share a single backend call, whether the
+    callers are threads (get_or_load) or coroutines (get_or_load_async). Expired
+    entries are revalidated with a conditional read on their _etag when possible.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None):
+        if max_entries is None:
+            max_entries = int(os.environ.get("COSMOS_CACHE_MAX_ENTRIES", "256"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("COSMOS_CACHE_TTL_SECONDS", "60"))
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        """Return (document, stale_document) for key; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        document, expires_at = entry
+        if time.monotonic() < expires_at:
+            self._entries.move_to_end(key)
+            return document, None
+        return None, document
+
+    def _store(self, key, document):
+        with self._lock:
+            if document is None:
+                self._entries.pop(key, None)
+                return
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = (document, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, key, stale, loader, revalidate):
+        if stale is not None and revalidate is not None:
+            self.revalidations += 1
+            return revalidate(stale)
+        return loader()
+
+    def get_or_load(self, key, loader, revalidate=None):
+        """Return the cached document for key, calling loader() (or revalidate(stale)) at most once concurrently."""
+        with self._lock:
+            document, stale = self._lookup(key)
+            if document is not None:
+                self.hits += 1
+                return document
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if pending is not None:
+            return pending.result()
+        try:
+            document = self._load(key, stale, loader, revalidate)
+            self._store(key, document)
+            future.set_result(document)
+            return document
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_load_async(self, key, loader, revalidate=None):
+        """
+        Coroutine counterpart of get_or_load(); loader and revalidate return awaitables. The load
+        runs in a task owned by the cache and every caller awaits it through asyncio.shield, so
+        a caller that is cancelled (deadline, dropped request) never cancels the others.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            document, stale = self._lookup(key)
+            if document is not None:
+                self.hits += 1
+                return document
+            task = self._async_inflight.get(key)
+            if task is None or task.get_loop() is not loop:
+                self.misses += 1
+                task = self._async_inflight[key] = loop.create_task(self._load_async(key, stale, loader, revalidate))
+                task.add_done_callback(lambda done: self._finish_async_load(key, done))
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, stale, loader, revalidate):
+        document = await self._load(key, stale, loader, revalidate)
+        self._store(key, document)
+        return document
+
+    def _finish_async_load(self, key, task):
+        with self._lock:
+            if self._async_inflight.get(key) is task:
+                del self._async_inflight[key]
+        if not task.cancelled():
+            task.exception()  # avoid "exception never retrieved" when every caller was cancelled
+
+    def invalidate(self, key=None):
+        """Drop one key, or the whole cache when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "revalidations": self.revalidations,
+        }
+
+_shared_state = {}
+_shared_state_lock = threading.Lock()
+
+def _get_shared(factory, endpoint: str, database_name: str, container_name: str):
+    """Return the process-wide factory() instance for (endpoint, database, container)."""
+    cache_key = (factory, endpoint, database_name, container_name)
+    with _shared_state_lock:
+        instance = _shared_state.get(cache_key)
+        if instance is None:
+            instance = _shared_state[cache_key] = factory()
+        return instance
+
+def get_claim_index(endpoint: str, database_name: str, container_name: str) -> ClaimIndex:
+    """Return the process-wide ClaimIndex for (endpoint, database, container)."""
+    return _get_shared(ClaimIndex, endpoint, database_name, container_name)
+
+def get_document_cache(endpoint: str, database_name: str, container_name: str) -> DocumentCache:
+    """Return the process-wide DocumentCache for (endpoint, database, container)."""
+    return _get_shared(DocumentCache, endpoint, database_name, container_name)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Cosmos DB system properties; they carry no meaning for the agents
+SYSTEM_FIELDS = ("_rid", "_self", "_etag", "_attachments", "_ts")
+
+_FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+class FieldProjection:
+    """
+    A whitelist of (optionally dotted) field paths. It is pushed into the SQL SELECT
+    list so Cosmos DB only returns those fields, and applied client-side to documents
+    that come from point reads or the cache, with the same result shape.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.tree = {}
+        for path in self.fields:
+            if not _FIELD_PATH.match(path):
+                raise ValueError(f"Invalid projection field '{path}'")
+            node = self.tree
+            *parents, leaf = path.split(".")
+            for name in parents:
+                child = node.setdefault(name, {})
+                if child is True:
+                    # The whole parent is already selected
+                    break
+                node = child
+            else:
+                node[leaf] = True
+
+    @classmethod
+    def parse(cls, spec: str):
+        """Build a projection from a comma-separated field list; '*' means no projection."""
+        fields = [field.strip() for field in spec.split(",") if field.strip()]
+        if not fields or fields == ["*"]:
+            return None
+        return cls(fields)
+
+    def select_list(self, alias: str = "c") -> str:
+        """The SELECT list, e.g. 'c.id, {"policy_number": c.info.policy_number} AS info'."""
+        columns = []
+        for name, subtree in self.tree.items():
+            if subtree is True:
+                columns.append(f"{alias}.{name}")
+            else:
+                columns.append(f"{self._object_expr(subtree, f'{alias}.{name}')} AS {name}")
+        return ", ".join(columns)
+
+    def _object_expr(self, tree, ref: str) -> str:
+        members = []
+        for name, subtree in tree.items():
+            value = f"{ref}.{name}" if subtree is True else self._object_expr(subtree, f"{ref}.{name}")
+            members.append(f'"{name}": {value}')
+        return "{" + ", ".join(members) + "}"
+
+    def apply(self, document):
+        """Project a full document the way the SELECT list would."""
+        return self._apply(self.tree, document)
+
+    def _apply(self, tree, document):
+        result = {}
+        for name, subtree in tree.items():
+            value = document.get(name) if isinstance(document, dict) else None
+            if subtree is True:
+                # Cosmos DB omits undefined properties
+                if isinstance(document, dict) and name in document:
+                    result[name] = value
+            else:
+                result[name] = self._apply(subtree, value)
+        return result
+
+def strip_system_fields(document):
+    """Drop the Cosmos DB system properties from a top-level document."""
+    if not isinstance(document, dict):
+        return document
+    return {key: value for key, value in document.items() if key not in SYSTEM_FIELDS}
+
+class ResponseSerializer:
+    """
+    Serializes tool responses for the agents and keeps byte/token counts per function.
+    The compact format has no indentation or spaces and uses orjson when it is installed;
+    COSMOS_OUTPUT_FORMAT=pretty restores the indent=2 layout.
+    """
+
+    def __init__(self, compact: bool = None):
+        if compact is None:
+            compact = os.environ.get("COSMOS_OUTPUT_FORMAT", "compact").lower() != "pretty"
+        self.compact = compact
+        self.log_sizes = os.environ.get("COSMOS_LOG_OUTPUT_SIZE", "").lower() in ("1", "true", "yes")
+        self._encoder = None
+        self._encoder_loaded = False
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def dumps(self, obj, nested: bool = False) -> str:
+        """Serialize obj; nested values are indented to sit inside a response list in pretty mode."""
+        if self.compact:
+            if orjson is not None:
+                try:
+                    return orjson.dumps(obj).decode("utf-8")
+                except TypeError:
+                    # e.g. integers beyond 64 bits; the json module handles those
+                    pass
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        text = json.dumps(obj, indent=2, ensure_ascii=False)
+        return text.replace("\n", "\n    ") if nested else text
+
+    def iter_list_response(self, header: dict, list_key: str, chunks, next_cursor: str = None):
+        """Yield a {header..., count, list_key: [...], next_cursor} object from pre-serialized items."""
+        if self.compact:
+            yield "{"
+            for key, value in header.items():
+                yield f"{self.dumps(key)}:{self.dumps(value)},"
+            yield f'"count":{len(chunks)},"{list_key}":['
+            yield ",".join(chunks)
+            yield "]"
+            if next_cursor:
+                yield f',"next_cursor":{self.dumps(next_cursor)}'
+            yield "}"
+            return
+        yield "{\n"
+        for key, value in header.items():
+            yield f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n"
+        yield f'  "count": {len(chunks)},\n'
+        yield f'  "{list_key}": ['
+        for position, chunk in enumerate(chunks):
+            yield ("," if position else "") + "\n    " + chunk
+        yield "\n  ]"
+        if next_cursor:
+            yield f',\n  "next_cursor": {json.dumps(next_cursor)}'
+        yield "\n}"
+
+    def count_tokens(self, text: str) -> int:
+        """Token count with tiktoken's o200k_base encoding when available, else ~4 characters per token."""
+        if not self._encoder_loaded:
+            try:
+                import tiktoken
+                self._encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                self._encoder = None
+            self._encoder_loaded = True
+        if self._encoder is None:
+            return (len(text) + 3) // 4
+        return len(self._encoder.encode(text))
+
+    def record(self, function_name: str, text: str) -> str:
+        """Count the bytes and tokens of a response and return it unchanged."""
+        size = len(text.encode("utf-8"))
+        tokens = self.count_tokens(text)
+        with self._lock:
+            stats = self._stats.setdefault(function_name, {"calls": 0, "bytes": 0, "tokens": 0})
+            stats["calls"] += 1
+            stats["bytes"] += size
+            stats["tokens"] += tokens
+        if self.log_sizes:
+            print(f"📏 {function_name}: {size} bytes, {tokens} tokens")
+        return text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "format": "compact" if self.compact else "pretty",
+                "functions": {name: dict(counts) for name, counts in self._stats.items()}
+            }
+
+response_serializer = ResponseSerializer()
+
+class ResultPage:
+    """
+    One budgeted page of query results. Items are serialized as they are offered,
+    so the page stops at max_items or max_bytes without materializing the rest of
+    the result set, and iter_json() streams the response one chunk at a time.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, serializer: ResponseSerializer = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.serializer = serializer or response_serializer
+        self.chunks = []
+        self.size = 0
+        self.resume = None
+        # Set once an item was turned away, i.e. more results exist after resume
+        self.truncated = False
+
+    def offer(self, item, resume) -> bool:
+        """Add an item unless the page is full; resume is the position just after it."""
+        if len(self.chunks) >= self.max_items:
+            self.truncated = True
+            return False
+        chunk = self.serializer.dumps(item, nested=True)
+        size = len(chunk.encode("utf-8"))
+        # Always keep at least one item so paging makes progress
+        if self.chunks and self.size + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self.chunks.append(chunk)
+        self.size += size
+        self.resume = resume
+        return True
+
+    def iter_json(self, header: dict, list_key: str, next_cursor: str = None):
+        """Yield the response JSON one chunk at a time."""
+        return self.serializer.iter_list_response(header, list_key, self.chunks, next_cursor)
+
 class CosmosDBPlugin:
     """
     A production-ready Cosmos DB plugin that connects to real Azure Cosmos DB.
     This plugin retrieves actual JSON documents from your database.
     """
     
-    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer"):
+    # Fields each tool returns ('*' = every non-system field); override per tool
+    # with COSMOS_FIELDS_<TOOL NAME>, e.g. COSMOS_FIELDS_SEARCH_BY_FIELD="id,claim_id"
+    DEFAULT_PROJECTIONS = {
+        "get_document_by_claim_id": "*",
+        "get_document_by_id": "*",
+        "list_recent_documents": "id,claim_id,structured_claim_info.policyholder_name,structured_claim_info.policy_number,structured_claim_info.incident_date,structured_claim_info.incident_location",
+        "search_by_field": "id,claim_id,structured_claim_info,image_descriptions",
+    }
+    
+    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer", client_pool: CosmosClientPool = None, document_cache: DocumentCache = None, serializer: ResponseSerializer = None, projections: dict = None):
         """
         Initialize the Cosmos DB plugin with connection details.
         For production, use environment variables or Azure Key Vault for credentials.
+        Clients and the document cache are shared process-wide unless dedicated ones are passed in.
+        projections maps tool names to comma-separated field lists and takes precedence over the environment.
         """
         self.endpoint = endpoint or os.environ.get("COSMOS_ENDPOINT")
         self.key = key or os.environ.get("COSMOS_KEY") 
         self.database_name = "insurance_claims"
         self.container_name = "crash_reports"
+        self.client_pool = client_pool or cosmos_client_pool
+        self.document_cache = document_cache or get_document_cache(self.endpoint, self.database_name, self.container_name)
+        self.max_page_size = int(os.environ.get("COSMOS_MAX_PAGE_SIZE", "100"))
+        self.max_result_bytes = int(os.environ.get("COSMOS_MAX_RESULT_BYTES", "65536"))
+        self.serializer = serializer or response_serializer
+        self.projections = {}
+        for name, spec in self.DEFAULT_PROJECTIONS.items():
+            spec = (projections or {}).get(name) or os.environ.get(f"COSMOS_FIELDS_{name.upper()}", spec)
+            self.projections[name] = FieldProjection.parse(spec)
     
     def _get_cosmos_client(self):
-        """Create and return a Cosmos DB client."""
+        """Return the pooled Cosmos DB client."""
+        if not self.endpoint or not self.key:
+            raise Exception("Cosmos DB endpoint and key must be configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables.")
+        
+        return self.client_pool.get_client(self.endpoint, self.key)
+    
+    def _get_container(self):
+        """Return the cached container handle for this plugin's database and container."""
         if not self.endpoint or not self.key:
             raise Exception("Cosmos DB endpoint and key must be configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables.")
         
+        return self.client_pool.get_container(self.endpoint, self.key, self.database_name, self.container_name)
+    
+    def _get_claim_index(self) -> ClaimIndex:
+        return get_claim_index(self.endpoint, self.database_name, self.container_name)
+    
+    def _refresh_claim_index(self, container, index: ClaimIndex, max_age: float = None):
+        """Warm or incrementally refresh the claim index if it is due."""
+        if not index.try_begin_refresh(max_age):
+            return
+        applied = False
         try:
-            from azure.cosmos import CosmosClient
-            return CosmosClient(self.endpoint, self.key)
-        except ImportError:
-            raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+            if index.partition_key_path is None:
+                index.set_partition_key_paths(container.read().get("partitionKey", {}).get("paths", []))
+            query, parameters = index.projection_query()
+            rows = list(container.query_items(
+                query=query,
+                parameters=parameters,
+                enable_cross_partition_query=True
+            ))
+            index.apply(rows)
+            applied = True
+        except Exception:
+            # The index is only an optimisation - lookups fall back to the query
+            pass
+        finally:
+            # Release the refresh slot on any exit, including interrupts and cancellation
+            if not applied:
+                index.abort_refresh()
+    
+    def _point_read_claim(self, container, claim_id: str):
+        """Read a claim with a single-partition point read; None if the index has no entry."""
+        index = self._get_claim_index()
+        self._refresh_claim_index(container, index)
+        location = index.lookup(claim_id)
+        if location is None:
+            return None
+        try:
+            return container.read_item(item=location[0], partition_key=location[1])
         except Exception as e:
-            raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+            if _is_not_found(e):
+                index.discard(claim_id)
+                return None
+            raise
+    
+    def _fetch_claim_document(self, container, claim_id: str):
+        """Load a claim document: point read via the claim index, else a query by claim_id."""
+        index = self._get_claim_index()
+        document = self._point_read_claim(container, claim_id)
+        if document is not None:
+            return document
+        
+        # Index miss: the claim may be newer than the last refresh, so ask Cosmos DB.
+        # Scope the query to one partition when the partition key is the claim_id.
+        query = "SELECT * FROM c WHERE c.claim_id = @claim_id"
+        parameters = [{"name": "@claim_id", "value": claim_id}]
+        partition_key = index.claim_partition(claim_id)
+        scope = {"partition_key": partition_key} if partition_key is not None else {"enable_cross_partition_query": True}
+        
+        items = list(container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=1,  # We expect only one document with this claim_id
+            **scope
+        ))
+        if not items:
+            return None
+        
+        self._get_claim_index().record(items[0])
+        return items[0]
+    
+    def _fetch_document_by_id(self, container, document_id: str, partition_key: str = None):
+        """Load a document by ID: direct read with the partition key, else a cross-partition query."""
+        if partition_key:
+            try:
+                return container.read_item(item=document_id, partition_key=partition_key)
+            except Exception as e:
+                if _is_not_found(e):
+                    return None
+                raise
+        
+        query = "SELECT * FROM c WHERE c.id = @document_id"
+        parameters = [{"name": "@document_id", "value": document_id}]
+        
+        items = list(container.query_items(
+            query=query,
+            parameters=parameters,
+            enable_cross_partition_query=True,
+            max_item_count=1
+        ))
+        return items[0] if items else None
+    
+    def _available_claim_ids(self, container, claim_id: str):
+        """Claim IDs to suggest after a miss, from the local catalog when it is warm."""
+        index = self._get_claim_index()
+        if index.is_warm():
+            # A rate-limited incremental refresh keeps the suggestions current
+            self._refresh_claim_index(container, index, index.miss_refresh_interval)
+            return index.suggest(claim_id)
+        
+        # Try to find what claim IDs actually exist
+        all_claims_query = "SELECT c.claim_id FROM c"
+        all_items = list(container.query_items(
+            query=all_claims_query,
+            enable_cross_partition_query=True,
+            max_item_count=10
+        ))
+        return [item.get('claim_id', 'N/A') for item in all_items]
+    
+    def _revalidate_document(self, container, document, reload, partition_key: str = None):
+        """Conditional read on the cached _etag: the cached document if unchanged, the new one otherwise, None if deleted."""
+        etag = document.get("_etag")
+        if partition_key is None:
+            partition_key = self._get_claim_index().partition_key_of(document)
+        if not etag or partition_key is None or "id" not in document:
+            return reload()
+        try:
+            fresh = container.read_item(item=document["id"], partition_key=partition_key, initial_headers={"If-None-Match": etag})
+        except Exception as e:
+            if getattr(e, "status_code", None) == 304:
+                return document
+            if _is_not_found(e):
+                return None
+            raise
+        return fresh or document
+    
+    def warmup(self):
+        """Open the pooled client and load the claim index now instead of on the first tool call."""
+        container = self._get_container()
+        self._refresh_claim_index(container, self._get_claim_index())
+    
+    def get_cache_stats(self) -> dict:
+        """Hit, miss, eviction and coalescing counters of the shared document cache."""
+        return self.document_cache.stats()
+    
+    def get_output_stats(self) -> dict:
+        """Calls, bytes and tokens returned to the agents, per tool."""
+        return self.serializer.stats()
+    
+    def _respond(self, function_name: str, text: str) -> str:
+        """Record the size of a tool response and return it."""
+        return self.serializer.record(function_name, text)
+    
+    def _select_list(self, function_name: str) -> str:
+        """SELECT list for a tool: its projected fields, or * when it returns whole documents."""
+        projection = self.projections.get(function_name)
+        return projection.select_list() if projection else "*"
+    
+    def _shape(self, document, function_name: str):
+        """Apply a tool's projection to a full document, or just drop the system fields."""
+        projection = self.projections.get(function_name)
+        return projection.apply(document) if projection else strip_system_fields(document)
+    
+    def _format_connection_test(self, items) -> str:
+        """Build the test_connection response from the sampled items."""
+        if not items:
+            return f"✅ Connection successful but no documents found in container '{self.container_name}'"
+        
+        claim_ids = [item.get('claim_id', 'N/A') for item in items]
+        result = {
+            "connection_status": "SUCCESS",
+            "database": self.database_name,
+            "container": self.container_name,
+            "documents_found": len(items),
+            "available_claim_ids": claim_ids
+        }
+        
+        return self.serializer.dumps(result)
+    
+    def _format_document(self, document, function_name: str) -> str:
+        """Serialize a single document for the agent, shaped by the tool's projection."""
+        return self.serializer.dumps(self._shape(document, function_name))
+    
+    def _format_claim_not_found(self, claim_id: str, available_ids) -> str:
+        """Build the response for a claim_id that has no document."""
+        return f"❌ No document found with claim_id '{claim_id}' in container '{self.container_name}'.\n\nAvailable claim IDs: {available_ids}\n\nPlease verify the claim ID exists in the database."
+    
+    def _format_claim_error(self, claim_id: str, e: Exception) -> str:
+        """Map an exception raised by a claim_id lookup to an agent-facing message."""
+        error_msg = str(e)
+        if "endpoint and key must be configured" in error_msg:
+            return f"❌ Cosmos DB not configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables. Error: {error_msg}"
+        elif "Unauthorized" in error_msg or "401" in error_msg:
+            return f"❌ Authentication failed. Please check your Cosmos DB credentials. Error: {error_msg}"
+        elif "Forbidden" in error_msg or "403" in error_msg:
+            return f"❌ Access denied. Please check your Cosmos DB permissions. Error: {error_msg}"
+        elif "azure-cosmos package not installed" in error_msg:
+            return f"❌ Missing dependency. Please run: pip install azure-cosmos"
+        else:
+            return f"❌ Error retrieving document by claim_id '{claim_id}': {error_msg}"
+    
+    def _format_document_not_found(self, document_id: str) -> str:
+        """Build the response for a document ID that does not exist."""
+        return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
+    
+    def _format_document_error(self, document_id: str, e: Exception) -> str:
+        """Map an exception raised by a document ID lookup to an agent-facing message."""
+        error_msg = str(e)
+        if "NotFound" in error_msg or "404" in error_msg:
+            return self._format_document_not_found(document_id)
+        elif "Unauthorized" in error_msg or "401" in error_msg:
+            return f"❌ Authentication failed. Please check your Cosmos DB credentials."
+        elif "Forbidden" in error_msg or "403" in error_msg:
+            return f"❌ Access denied. Please check your Cosmos DB permissions."
+        else:
+            return f"❌ Error retrieving document: {error_msg}"
+    
+    def _format_query_results(self, sql_query: str, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the query_documents response."""
+        if not page.chunks:
+            return f"🔍 No documents found matching query: {sql_query}"
+        
+        # Return results as formatted JSON
+        return "".join(page.iter_json({"query": sql_query}, "results", next_cursor))
+    
+    def _format_query_error(self, sql_query: str, e: Exception) -> str:
+        """Map an exception raised by a custom query to an agent-facing message."""
+        error_msg = str(e)
+        if "Syntax error" in error_msg:
+            return f"❌ SQL syntax error in query: {sql_query}\nError: {error_msg}"
+        else:
+            return f"❌ Error executing query: {error_msg}"
+    
+    def _format_container_info(self, container_props, count_items) -> str:
+        """Build the get_container_info response."""
+        document_count = count_items[0] if count_items else "Unknown"
+        
+        info = {
+            "database": self.database_name,
+            "container": self.container_name,
+            "partition_key": container_props.get("partitionKey", {}).get("paths", ["Unknown"]),
+            "approximate_document_count": document_count,
+            "indexing_policy": container_props.get("indexingPolicy", {}).get("indexingMode", "Unknown")
+        }
+        
+        return self.serializer.dumps(info)
+    
+    def _format_recent_documents(self, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the list_recent_documents response."""
+        if not page.chunks:
+            return "📭 No documents found in the container"
+        
+        return "".join(page.iter_json({"container": self.container_name}, "documents", next_cursor))
+    
+    def _format_search_results(self, field_name: str, field_value: str, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the search_by_field response."""
+        if not page.chunks:
+            return f"🔍 No documents found where {field_name} = '{field_value}'"
+        
+        return "".join(page.iter_json({"search_criteria": f"{field_name} = '{field_value}'"}, "documents", next_cursor))
+    
+    def _new_page(self, page_size: int) -> ResultPage:
+        """A result page clamped to the plugin's item and byte budgets."""
+        return ResultPage(max(1, min(page_size, self.max_page_size)), self.max_result_bytes, self.serializer)
+    
+    def _query_fingerprint(self, query: str, parameters) -> str:
+        return hashlib.sha1(json.dumps([query, parameters], sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    
+    def _encode_cursor(self, query: str, parameters, page: ResultPage):
+        """Opaque cursor for the position after the page's last item, or None when there is nothing more."""
+        if not page.truncated:
+            return None
+        token, offset = page.resume
+        payload = {"q": self._query_fingerprint(query, parameters), "t": token, "o": offset, "n": page.max_items}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+    
+    def _decode_cursor(self, query: str, parameters, cursor: str):
+        """Return (continuation token, offset in page, page size) for a cursor from _encode_cursor()."""
+        if not cursor:
+            return None, 0, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except Exception:
+            raise ValueError("Invalid cursor. Pass the next_cursor value exactly as returned.")
+        if payload.get("q") != self._query_fingerprint(query, parameters):
+            raise ValueError("Cursor does not belong to this query. Repeat the original query to continue paging.")
+        return payload.get("t"), payload.get("o", 0), payload.get("n")
+    
+    def _iter_query(self, container, query: str, parameters, cursor: str, page_size: int):
+        """
+        Yield (item, resume) pairs one Cosmos DB page at a time, starting at the cursor.
+        resume is (continuation token, offset) of the position just after the item.
+        """
+        token, skip, cursor_page_size = self._decode_cursor(query, parameters, cursor)
+        # Offsets inside a page are only valid for the page size the cursor was created with
+        page_size = cursor_page_size or page_size
+        pages = container.query_items(
+            query=query,
+            parameters=parameters,
+            enable_cross_partition_query=True,
+            max_item_count=page_size
+        ).by_page(token)
+        
+        for page in pages:
+            items = list(page)
+            next_token = pages.continuation_token
+            for offset in range(skip, len(items)):
+                resume = (next_token, 0) if offset + 1 == len(items) else (token, offset + 1)
+                yield items[offset], resume
+            if not next_token:
+                return
+            token, skip = next_token, 0
+    
+    def _read_page(self, container, query: str, parameters, cursor: str, page_size: int, projected: bool = False):
+        """Fill one ResultPage from the query and return it with its next cursor."""
+        page = self._new_page(page_size)
+        for item, resume in self._iter_query(container, query, parameters, cursor, page.max_items):
+            if not projected:
+                item = strip_system_fields(item)
+            if not page.offer(item, resume):
+                break
+        return page, self._encode_cursor(query, parameters, page)
     
     @kernel_function(description="Test Cosmos DB connection and list available claims")
     def test_connection(self) -> Annotated[str, "Connection test result and available claims"]:
         """Test the Cosmos DB connection and show what claims are available."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Test with a simple query to get all claim IDs
             query = "SELECT c.claim_id, c.id FROM c"
@@ -48,19 +973,7 @@ class CosmosDBPlugin:
                 max_item_count=10  # Limit to first 10 for testing
             ))
             
-            if not items:
-                return f"✅ Connection successful but no documents found in container '{self.container_name}'"
-            
-            claim_ids = [item.get('claim_id', 'N/A') for item in items]
-            result = {
-                "connection_status": "SUCCESS",
-                "database": self.database_name,
-                "container": self.container_name,
-                "documents_found": len(items),
-                "available_claim_ids": claim_ids
-            }
-            
-            return json.dumps(result, indent=2)
+            return self._respond("test_connection", self._format_connection_test(items))
             
         except Exception as e:
             return f"❌ Connection test failed: {str(e)}"
@@ -70,51 +983,23 @@ class CosmosDBPlugin:
         self, 
         claim_id: Annotated[str, "The claim_id to retrieve (not the partition key)"]
     ) -> Annotated[str, "JSON document from Cosmos DB"]:
-        """Retrieve a document by its claim_id using a cross-partition query."""
+        """Retrieve a document by its claim_id through the shared cache, point read or cross-partition query."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
-            # Use SQL query to find document by claim_id across all partitions
-            query = "SELECT * FROM c WHERE c.claim_id = @claim_id"
-            parameters = [{"name": "@claim_id", "value": claim_id}]
+            document = self.document_cache.get_or_load(
+                ("claim_id", claim_id),
+                lambda: self._fetch_claim_document(container, claim_id),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_claim_document(container, claim_id))
+            )
             
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True,
-                max_item_count=1  # We expect only one document with this claim_id
-            ))
+            if document is None:
+                return self._format_claim_not_found(claim_id, self._available_claim_ids(container, claim_id))
             
-            if not items:
-                # Try to find what claim IDs actually exist
-                all_claims_query = "SELECT c.claim_id FROM c"
-                all_items = list(container.query_items(
-                    query=all_claims_query,
-                    enable_cross_partition_query=True,
-                    max_item_count=10
-                ))
-                available_ids = [item.get('claim_id', 'N/A') for item in all_items]
-                
-                return f"❌ No document found with claim_id '{claim_id}' in container '{self.container_name}'.\n\nAvailable claim IDs: {available_ids}\n\nPlease verify the claim ID exists in the database."
-            
-            # Return the first (and should be only) matching document
-            document = items[0]
-            return json.dumps(document, indent=2, ensure_ascii=False)
+            return self._respond("get_document_by_claim_id", self._format_document(document, "get_document_by_claim_id"))
             
         except Exception as e:
-            error_msg = str(e)
-            if "endpoint and key must be configured" in error_msg:
-                return f"❌ Cosmos DB not configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables. Error: {error_msg}"
-            elif "Unauthorized" in error_msg or "401" in error_msg:
-                return f"❌ Authentication failed. Please check your Cosmos DB credentials. Error: {error_msg}"
-            elif "Forbidden" in error_msg or "403" in error_msg:
-                return f"❌ Access denied. Please check your Cosmos DB permissions. Error: {error_msg}"
-            elif "azure-cosmos package not installed" in error_msg:
-                return f"❌ Missing dependency. Please run: pip install azure-cosmos"
-            else:
-                return f"❌ Error retrieving document by claim_id '{claim_id}': {error_msg}"
+            return self._format_claim_error(claim_id, e)
     
     @kernel_function(description="Retrieve a JSON document by partition key and document ID from Cosmos DB")
     def get_document_by_id(
@@ -122,87 +1007,47 @@ class CosmosDBPlugin:
         document_id: Annotated[str, "The document ID to retrieve"],
         partition_key: Annotated[str, "The partition key value (optional, will use cross-partition query if not provided)"] = None
     ) -> Annotated[str, "JSON document from Cosmos DB"]:
-        """Retrieve a specific document by its ID and optionally partition key from Cosmos DB."""
+        """Retrieve a specific document by its ID and optionally partition key, through the shared cache."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
-            
-            if partition_key:
-                # Direct read using partition key - most efficient
-                item = container.read_item(item=document_id, partition_key=partition_key)
-                return json.dumps(item, indent=2, ensure_ascii=False)
-            else:
-                # Cross-partition query when partition key is unknown
-                query = "SELECT * FROM c WHERE c.id = @document_id"
-                parameters = [{"name": "@document_id", "value": document_id}]
-                
-                items = list(container.query_items(
-                    query=query,
-                    parameters=parameters,
-                    enable_cross_partition_query=True,
-                    max_item_count=1
-                ))
-                
-                if not items:
-                    return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
-                
-                return json.dumps(items[0], indent=2, ensure_ascii=False)
+            container = self._get_container()
+            
+            document = self.document_cache.get_or_load(
+                ("id", document_id, partition_key),
+                lambda: self._fetch_document_by_id(container, document_id, partition_key),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_document_by_id(container, document_id, partition_key), partition_key)
+            )
+            
+            if document is None:
+                return self._format_document_not_found(document_id)
+            
+            return self._respond("get_document_by_id", self._format_document(document, "get_document_by_id"))
             
         except Exception as e:
-            error_msg = str(e)
-            if "NotFound" in error_msg or "404" in error_msg:
-                return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
-            elif "Unauthorized" in error_msg or "401" in error_msg:
-                return f"❌ Authentication failed. Please check your Cosmos DB credentials."
-            elif "Forbidden" in error_msg or "403" in error_msg:
-                return f"❌ Access denied. Please check your Cosmos DB permissions."
-            else:
-                return f"❌ Error retrieving document: {error_msg}"
+            return self._format_document_error(document_id, e)
     
-    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB")
+    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB. Results are paged; pass next_cursor back to get more")
     def query_documents(
         self, 
-        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"]
+        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"],
+        page_size: Annotated[int, "Maximum number of results to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same query, to continue paging"] = None
     ) -> Annotated[str, "Query results as JSON"]:
-        """Execute a custom SQL query against the Cosmos DB container."""
+        """Execute a custom SQL query against the Cosmos DB container, one page at a time."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
-            
-            # Execute the query
-            items = list(container.query_items(
-                query=sql_query,
-                enable_cross_partition_query=True  # Enable if your query spans partitions
-            ))
+            container = self._get_container()
             
-            if not items:
-                return f"🔍 No documents found matching query: {sql_query}"
+            page, next_cursor = self._read_page(container, sql_query, None, cursor, page_size)
             
-            # Return results as formatted JSON
-            result = {
-                "query": sql_query,
-                "count": len(items),
-                "results": items
-            }
-            
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            return self._respond("query_documents", self._format_query_results(sql_query, page, next_cursor))
             
         except Exception as e:
-            error_msg = str(e)
-            if "Syntax error" in error_msg:
-                return f"❌ SQL syntax error in query: {sql_query}\nError: {error_msg}"
-            else:
-                return f"❌ Error executing query: {error_msg}"
+            return self._format_query_error(sql_query, e)
     
     @kernel_function(description="Get container information and statistics")
     def get_container_info(self) -> Annotated[str, "Container information and statistics"]:
         """Get information about the Cosmos DB container."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Get container properties
             container_props = container.read()
@@ -213,92 +1058,470 @@ class CosmosDBPlugin:
                 query=count_query,
                 enable_cross_partition_query=True
             ))
-            document_count = count_items[0] if count_items else "Unknown"
-            
-            info = {
-                "database": self.database_name,
-                "container": self.container_name,
-                "partition_key": container_props.get("partitionKey", {}).get("paths", ["Unknown"]),
-                "approximate_document_count": document_count,
-                "indexing_policy": container_props.get("indexingPolicy", {}).get("indexingMode", "Unknown")
-            }
             
-            return json.dumps(info, indent=2)
+            return self._respond("get_container_info", self._format_container_info(container_props, count_items))
             
         except Exception as e:
             return f"❌ Error getting container info: {str(e)}"
     
-    @kernel_function(description="List recent documents (up to 100) from Cosmos DB")
+    @kernel_function(description="List recent claims (summary fields, up to 100 per page) from Cosmos DB. Pass next_cursor back to get more")
     def list_recent_documents(
         self, 
-        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10
+        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10,
+        cursor: Annotated[str, "next_cursor from a previous call, to continue paging"] = None
     ) -> Annotated[str, "List of recent documents"]:
-        """List recent documents from the container."""
+        """List recent documents from the container, one page at a time."""
         try:
-            # Ensure limit is within bounds
-            limit = max(1, min(limit, 100))
+            container = self._get_container()
             
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            # Query for documents (ordered by _ts if available); the page size bounds each response
+            select_list = self._select_list("list_recent_documents")
+            query = f"SELECT {select_list} FROM c ORDER BY c._ts DESC"
             
-            # Query for documents (ordered by _ts if available)
-            query = f"SELECT TOP {limit} * FROM c ORDER BY c._ts DESC"
+            page, next_cursor = self._read_page(container, query, None, cursor, limit, projected=select_list != "*")
             
-            items = list(container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            
-            if not items:
-                return "📭 No documents found in the container"
-            
-            result = {
-                "container": self.container_name,
-                "count": len(items),
-                "documents": items
-            }
-            
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            return self._respond("list_recent_documents", self._format_recent_documents(page, next_cursor))
             
         except Exception as e:
             return f"❌ Error listing documents: {str(e)}"
     
-    @kernel_function(description="Search documents by field value")
+    @kernel_function(description="Search documents by field value. Results are paged; pass next_cursor back to get more")
     def search_by_field(
         self, 
         field_name: Annotated[str, "The field name to search in (e.g., 'name', 'category', 'status')"],
-        field_value: Annotated[str, "The value to search for"]
+        field_value: Annotated[str, "The value to search for"],
+        page_size: Annotated[int, "Maximum number of documents to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same search, to continue paging"] = None
     ) -> Annotated[str, "Documents matching the search criteria"]:
-        """Search for documents where a specific field matches a value."""
+        """Search for documents where a specific field matches a value, one page at a time."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Use parameterized query for better security and performance
-            query = f"SELECT * FROM c WHERE c.{field_name} = @field_value"
+            select_list = self._select_list("search_by_field")
+            query = f"SELECT {select_list} FROM c WHERE c.{field_name} = @field_value"
             parameters = [{"name": "@field_value", "value": field_value}]
             
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
+            page, next_cursor = self._read_page(container, query, parameters, cursor, page_size, projected=select_list != "*")
+            
+            return self._respond("search_by_field", self._format_search_results(field_name, field_value, page, next_cursor))
+            
+        except Exception as e:
+            return f"❌ Error searching documents: {str(e)}"
+
+# Close tasks scheduled by close_on_loop, referenced until they finish
+_pending_closes = set()
+
+def close_on_loop(resources, loop):
+    """
+    Close async clients left behind by an event loop change without blocking the caller: on
+    their own loop while it still runs (e.g. in another thread), else best effort on this one.
+    """
+    resources = [resource for resource in resources if resource is not None]
+    if not resources:
+        return
+
+    async def close_all():
+        for resource in resources:
+            try:
+                await resource.close()
+            except Exception:
+                pass
+
+    if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+        asyncio.run_coroutine_threadsafe(close_all(), loop)
+        return
+    task = asyncio.ensure_future(close_all())
+    _pending_closes.add(task)
+    task.add_done_callback(_pending_closes.discard)
+
+class AsyncCosmosClientPool:
+    """
+    Process-wide cache of async Cosmos DB clients (azure.cosmos.aio) and container handles.
+    Async clients are bound to the event loop that created them, so the cache is
+    reset (and the old clients closed) when it is first used from a different loop.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._containers = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        """Close and drop the clients that belong to a previous event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            close_on_loop(self._clients.values(), self._loop)
+            self._clients = {}
+            self._containers = {}
+            self._loop = loop
+
+    def get_client(self, endpoint: str, key: str):
+        """Return the shared async client for this endpoint, creating it on first use."""
+        self._bind_loop()
+        client = self._clients.get((endpoint, key))
+        if client is None:
+            try:
+                from azure.cosmos.aio import CosmosClient
+            except ImportError:
+                raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+            try:
+                client = CosmosClient(endpoint, key)
+            except Exception as e:
+                raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+            self._clients[(endpoint, key)] = client
+        return client
+
+    def get_container(self, endpoint: str, key: str, database_name: str, container_name: str):
+        """Return the cached async container handle for (endpoint, key, database, container)."""
+        client = self.get_client(endpoint, key)
+        cache_key = (endpoint, key, database_name, container_name)
+        container = self._containers.get(cache_key)
+        if container is None:
+            container = client.get_database_client(database_name).get_container_client(container_name)
+            self._containers[cache_key] = container
+        return container
+
+    async def close(self):
+        """Close every pooled async client and drop all cached handles."""
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._containers = {}
+        self._loop = None
+        for client in clients:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+# Shared by every AsyncCosmosDBPlugin instance in this process
+async_cosmos_client_pool = AsyncCosmosClientPool()
+
+async def close_async_cosmos_clients():
+    """Shutdown hook: close the shared async Cosmos DB clients. Await it before the event loop stops."""
+    await async_cosmos_client_pool.close()
+
+class AsyncCosmosDBPlugin(CosmosDBPlugin):
+    """
+    Non-blocking variant of CosmosDBPlugin for agents running on asyncio.
+    Kernel functions are coroutines backed by azure.cosmos.aio and return exactly
+    the same strings as the synchronous plugin.
+    """
+    
+    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer", client_pool: AsyncCosmosClientPool = None, document_cache: DocumentCache = None, serializer: ResponseSerializer = None, projections: dict = None):
+        super().__init__(endpoint, key, database_name, container_name, document_cache=document_cache, serializer=serializer, projections=projections)
+        self.client_pool = client_pool or async_cosmos_client_pool
+    
+    async def _collect(self, pager):
+        """Drain an async item pager into a list."""
+        return [item async for item in pager]
+    
+    async def _iter_query(self, container, query: str, parameters, cursor: str, page_size: int):
+        """Async counterpart of CosmosDBPlugin._iter_query()."""
+        token, skip, cursor_page_size = self._decode_cursor(query, parameters, cursor)
+        page_size = cursor_page_size or page_size
+        pages = container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=page_size
+        ).by_page(token)
+        
+        async for page in pages:
+            items = await self._collect(page)
+            next_token = pages.continuation_token
+            for offset in range(skip, len(items)):
+                resume = (next_token, 0) if offset + 1 == len(items) else (token, offset + 1)
+                yield items[offset], resume
+            if not next_token:
+                return
+            token, skip = next_token, 0
+    
+    async def _read_page(self, container, query: str, parameters, cursor: str, page_size: int, projected: bool = False):
+        """Fill one ResultPage from the query and return it with its next cursor."""
+        page = self._new_page(page_size)
+        results = self._iter_query(container, query, parameters, cursor, page.max_items)
+        try:
+            async for item, resume in results:
+                if not projected:
+                    item = strip_system_fields(item)
+                if not page.offer(item, resume):
+                    break
+        finally:
+            await results.aclose()
+        return page, self._encode_cursor(query, parameters, page)
+    
+    async def warmup(self):
+        """Open the pooled async client and load the claim index now instead of on the first tool call."""
+        container = self._get_container()
+        await self._refresh_claim_index(container, self._get_claim_index())
+    
+    async def _refresh_claim_index(self, container, index: ClaimIndex, max_age: float = None):
+        """Warm or incrementally refresh the claim index if it is due."""
+        if not index.try_begin_refresh(max_age):
+            return
+        applied = False
+        try:
+            if index.partition_key_path is None:
+                container_props = await container.read()
+                index.set_partition_key_paths(container_props.get("partitionKey", {}).get("paths", []))
+            query, parameters = index.projection_query()
+            index.apply(await self._collect(container.query_items(query=query, parameters=parameters)))
+            applied = True
+        except Exception:
+            pass
+        finally:
+            # CancelledError is not an Exception: without this the index would stay "refreshing" forever
+            if not applied:
+                index.abort_refresh()
+    
+    async def _point_read_claim(self, container, claim_id: str):
+        """Read a claim with a single-partition point read; None if the index has no entry."""
+        index = self._get_claim_index()
+        await self._refresh_claim_index(container, index)
+        location = index.lookup(claim_id)
+        if location is None:
+            return None
+        try:
+            return await container.read_item(item=location[0], partition_key=location[1])
+        except Exception as e:
+            if _is_not_found(e):
+                index.discard(claim_id)
+                return None
+            raise
+    
+    async def _fetch_claim_document(self, container, claim_id: str):
+        """Load a claim document: point read via the claim index, else a query by claim_id."""
+        index = self._get_claim_index()
+        document = await self._point_read_claim(container, claim_id)
+        if document is not None:
+            return document
+        
+        # Index miss is not authoritative - query, single-partition when possible
+        partition_key = index.claim_partition(claim_id)
+        items = await self._collect(container.query_items(
+            query="SELECT * FROM c WHERE c.claim_id = @claim_id",
+            parameters=[{"name": "@claim_id", "value": claim_id}],
+            max_item_count=1,
+            **({"partition_key": partition_key} if partition_key is not None else {})
+        ))
+        if not items:
+            return None
+        
+        self._get_claim_index().record(items[0])
+        return items[0]
+    
+    async def _fetch_document_by_id(self, container, document_id: str, partition_key: str = None):
+        """Load a document by ID: direct read with the partition key, else a cross-partition query."""
+        if partition_key:
+            try:
+                return await container.read_item(item=document_id, partition_key=partition_key)
+            except Exception as e:
+                if _is_not_found(e):
+                    return None
+                raise
+        
+        items = await self._collect(container.query_items(
+            query="SELECT * FROM c WHERE c.id = @document_id",
+            parameters=[{"name": "@document_id", "value": document_id}],
+            max_item_count=1
+        ))
+        return items[0] if items else None
+    
+    async def _available_claim_ids(self, container, claim_id: str):
+        """Claim IDs to suggest after a miss, from the local catalog when it is warm."""
+        index = self._get_claim_index()
+        if index.is_warm():
+            await self._refresh_claim_index(container, index, index.miss_refresh_interval)
+            return index.suggest(claim_id)
+        
+        all_items = await self._collect(container.query_items(
+            query="SELECT c.claim_id FROM c",
+            max_item_count=10
+        ))
+        return [item.get('claim_id', 'N/A') for item in all_items]
+    
+    async def _revalidate_document(self, container, document, reload, partition_key: str = None):
+        """Conditional read on the cached _etag: the cached document if unchanged, the new one otherwise, None if deleted."""
+        etag = document.get("_etag")
+        if partition_key is None:
+            partition_key = self._get_claim_index().partition_key_of(document)
+        if not etag or partition_key is None or "id" not in document:
+            return await reload()
+        try:
+            fresh = await container.read_item(item=document["id"], partition_key=partition_key, initial_headers={"If-None-Match": etag})
+        except Exception as e:
+            if getattr(e, "status_code", None) == 304:
+                return document
+            if _is_not_found(e):
+                return None
+            raise
+        return fresh or document
+    
+    @kernel_function(description="Test Cosmos DB connection and list available claims")
+    async def test_connection(self) -> Annotated[str, "Connection test result and available claims"]:
+        """Test the Cosmos DB connection and show what claims are available."""
+        try:
+            container = self._get_container()
+            
+            items = await self._collect(container.query_items(
+                query="SELECT c.claim_id, c.id FROM c",
+                max_item_count=10
             ))
             
-            if not items:
-                return f"🔍 No documents found where {field_name} = '{field_value}'"
+            return self._respond("test_connection", self._format_connection_test(items))
             
-            result = {
-                "search_criteria": f"{field_name} = '{field_value}'",
-                "count": len(items),
-                "documents": items
-            }
+        except Exception as e:
+            return f"❌ Connection test failed: {str(e)}"
+    
+    @kernel_function(description="Retrieve a document by claim_id from Cosmos DB using cross-partition query")
+    async def get_document_by_claim_id(
+        self, 
+        claim_id: Annotated[str, "The claim_id to retrieve (not the partition key)"]
+    ) -> Annotated[str, "JSON document from Cosmos DB"]:
+        """Retrieve a document by its claim_id through the shared cache, point read or cross-partition query."""
+        try:
+            container = self._get_container()
+            
+            document = await self.document_cache.get_or_load_async(
+                ("claim_id", claim_id),
+                lambda: self._fetch_claim_document(container, claim_id),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_claim_document(container, claim_id))
+            )
+            
+            if document is None:
+                return self._format_claim_not_found(claim_id, await self._available_claim_ids(container, claim_id))
+            
+            return self._respond("get_document_by_claim_id", self._format_document(document, "get_document_by_claim_id"))
+            
+        except Exception as e:
+            return self._format_claim_error(claim_id, e)
+    
+    @kernel_function(description="Retrieve a JSON document by partition key and document ID from Cosmos DB")
+    async def get_document_by_id(
+        self, 
+        document_id: Annotated[str, "The document ID to retrieve"],
+        partition_key: Annotated[str, "The partition key value (optional, will use cross-partition query if not provided)"] = None
+    ) -> Annotated[str, "JSON document from Cosmos DB"]:
+        """Retrieve a specific document by its ID and optionally partition key, through the shared cache."""
+        try:
+            container = self._get_container()
+            
+            document = await self.document_cache.get_or_load_async(
+                ("id", document_id, partition_key),
+                lambda: self._fetch_document_by_id(container, document_id, partition_key),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_document_by_id(container, document_id, partition_key), partition_key)
+            )
+            
+            if document is None:
+                return self._format_document_not_found(document_id)
+            
+            return self._respond("get_document_by_id", self._format_document(document, "get_document_by_id"))
             
-            return json.dumps(result, indent=2, ensure_ascii=False)
+        except Exception as e:
+            return self._format_document_error(document_id, e)
+    
+    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB. Results are paged; pass next_cursor back to get more")
+    async def query_documents(
+        self, 
+        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"],
+        page_size: Annotated[int, "Maximum number of results to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same query, to continue paging"] = None
+    ) -> Annotated[str, "Query results as JSON"]:
+        """Execute a custom SQL query against the Cosmos DB container, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            page, next_cursor = await self._read_page(container, sql_query, None, cursor, page_size)
+            
+            return self._respond("query_documents", self._format_query_results(sql_query, page, next_cursor))
+            
+        except Exception as e:
+            return self._format_query_error(sql_query, e)
+    
+    @kernel_function(description="Get container information and statistics")
+    async def get_container_info(self) -> Annotated[str, "Container information and statistics"]:
+        """Get information about the Cosmos DB container."""
+        try:
+            container = self._get_container()
+            
+            container_props = await container.read()
+            count_items = await self._collect(container.query_items(query="SELECT VALUE COUNT(1) FROM c"))
+            
+            return self._respond("get_container_info", self._format_container_info(container_props, count_items))
+            
+        except Exception as e:
+            return f"❌ Error getting container info: {str(e)}"
+    
+    @kernel_function(description="List recent claims (summary fields, up to 100 per page) from Cosmos DB. Pass next_cursor back to get more")
+    async def list_recent_documents(
+        self, 
+        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10,
+        cursor: Annotated[str, "next_cursor from a previous call, to continue paging"] = None
+    ) -> Annotated[str, "List of recent documents"]:
+        """List recent documents from the container, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            select_list = self._select_list("list_recent_documents")
+            page, next_cursor = await self._read_page(
+                container,
+                f"SELECT {select_list} FROM c ORDER BY c._ts DESC",
+                None,
+                cursor,
+                limit,
+                projected=select_list != "*"
+            )
+            
+            return self._respond("list_recent_documents", self._format_recent_documents(page, next_cursor))
+            
+        except Exception as e:
+            return f"❌ Error listing documents: {str(e)}"
+    
+    @kernel_function(description="Search documents by field value. Results are paged; pass next_cursor back to get more")
+    async def search_by_field(
+        self, 
+        field_name: Annotated[str, "The field name to search in (e.g., 'name', 'category', 'status')"],
+        field_value: Annotated[str, "The value to search for"],
+        page_size: Annotated[int, "Maximum number of documents to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same search, to continue paging"] = None
+    ) -> Annotated[str, "Documents matching the search criteria"]:
+        """Search for documents where a specific field matches a value, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            select_list = self._select_list("search_by_field")
+            page, next_cursor = await self._read_page(
+                container,
+                f"SELECT {select_list} FROM c WHERE c.{field_name} = @field_value",
+                [{"name": "@field_value", "value": field_value}],
+                cursor,
+                page_size,
+                projected=select_list != "*"
+            )
+            
+            return self._respond("search_by_field", self._format_search_results(field_name, field_value, page, next_cursor))
             
         except Exception as e:
             return f"❌ Error searching documents: {str(e)}"
 
-# Create an instance of the real Cosmos DB plugin
-cosmos_plugin = CosmosDBPlugin()
\ No newline at end of file
+# Module-level plugin, created on first access so importing this module stays cheap
+_cosmos_plugin = None
+
+def get_cosmos_plugin() -> CosmosDBPlugin:
+    """Return the process-wide CosmosDBPlugin, creating it on first use."""
+    global _cosmos_plugin
+    if _cosmos_plugin is None:
+        _cosmos_plugin = CosmosDBPlugin()
+    return _cosmos_plugin
+
+def warmup():
+    """Connect to Cosmos DB and load the claim index now instead of on the first tool call."""
+    get_cosmos_plugin().warmup()
+
+def __getattr__(name):
+    # Keeps `from tools import cosmos_plugin` working
+    if name == "cosmos_plugin":
+        return get_cosmos_plugin()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
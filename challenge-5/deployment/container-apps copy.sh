@@ -31,6 +31,9 @@ az containerapp env create \
   --location $LOCATION
 
 # Create Container App with environment variables
+# The image runs in service mode (ORCHESTRATION_MODE=service): claims are submitted over HTTP on port 8000.
+# One replica stays warm so the agents are not recreated per request; jobs live in that replica's memory,
+# so raise --max-replicas only with session affinity for GET /claims/{job_id}.
 echo "🚀 Creating Container App..."
 az containerapp create \
   --name $CONTAINER_APP_NAME \
@@ -41,7 +44,9 @@ az containerapp create \
   --registry-username $ACR_NAME \
   --registry-password $(az acr credential show --name $ACR_NAME --query passwords[0].value --output tsv) \
   --cpu 1.0 --memory 2.0Gi \
-  --min-replicas 0 --max-replicas 1 \
+  --ingress external --target-port 8000 \
+  --min-replicas 1 --max-replicas 1 \
+  --scale-rule-name http-claims --scale-rule-type http --scale-rule-http-concurrency 10 \
   --env-vars \
     AI_FOUNDRY_PROJECT_ENDPOINT="YOUR_AI_FOUNDRY_PROJECT_ENDPOINT" \
     MODEL_DEPLOYMENT_NAME="YOUR_MODEL_DEPLOYMENT_NAME" \
@@ -51,9 +56,7 @@ az containerapp create \
     AZURE_AI_SEARCH_INDEX_NAME="YOUR_SEARCH_INDEX_NAME" \
     SEARCH_SERVICE_NAME="YOUR_SEARCH_SERVICE_NAME" \
     SEARCH_SERVICE_ENDPOINT="YOUR_SEARCH_SERVICE_ENDPOINT" \
-    SEARCH_ADMIN_KEY="YOUR_SEARCH_ADMIN_KEY" \
-    CLAIM_ID="CL001" \
-    POLICY_NUMBER="LIAB-AUTO-001"
+    SEARCH_ADMIN_KEY="YOUR_SEARCH_ADMIN_KEY"
 
 # Enable managed identity
 echo "🔐 Enabling managed identity..."
@@ -81,5 +84,12 @@ az role assignment create \
 echo "✅ Container App '$CONTAINER_APP_NAME' created successfully!"
 echo "🔗 Image: $ACR_LOGIN_SERVER/$IMAGE_NAME"
 echo "🔑 Managed Identity: $PRINCIPAL_ID"
-echo "To update with different claim/policy parameters, use:"
-echo "az containerapp update --name $CONTAINER_APP_NAME --resource-group $RESOURCE_GROUP --set-env-vars CLAIM_ID=your-claim-id POLICY_NUMBER=your-policy-number"
\ No newline at end of file
+
+APP_FQDN=$(az containerapp show \
+  --name $CONTAINER_APP_NAME \
+  --resource-group $RESOURCE_GROUP \
+  --query properties.configuration.ingress.fqdn --output tsv)
+echo "🌐 URL: https://$APP_FQDN"
+echo "To analyze a claim, use:"
+echo "curl -X POST https://$APP_FQDN/claims -H 'Content-Type: application/json' -d '{\"claim_id\": \"CL001\", \"policy_number\": \"LIAB-AUTO-001\"}'"
+echo "Long-running claims return 202 with a job ID; poll it with: curl https://$APP_FQDN/claims/<job_id>"
\ No newline at end of file
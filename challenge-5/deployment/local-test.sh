@@ -80,10 +80,11 @@ echo "  -e AZURE_AI_SEARCH_INDEX_NAME=\"YOUR_SEARCH_INDEX\" \\"
 echo "  -e SEARCH_SERVICE_NAME=\"YOUR_SEARCH_SERVICE\" \\"
 echo "  -e SEARCH_SERVICE_ENDPOINT=\"YOUR_SEARCH_ENDPOINT\" \\"
 echo "  -e SEARCH_ADMIN_KEY=\"YOUR_SEARCH_KEY\" \\"
-echo "  -e CLAIM_ID=\"CL001\" \\"
-echo "  -e POLICY_NUMBER=\"LIAB-AUTO-001\" \\"
 echo "  insurance-orchestrator"
 echo ""
 echo "Replace all YOUR_* values with the actual values from your .env file"
 echo ""
+echo "Then submit a claim with:"
+echo "curl -X POST http://localhost:8080/claims -H 'Content-Type: application/json' -d '{\"claim_id\": \"CL001\", \"policy_number\": \"LIAB-AUTO-001\"}'"
+echo ""
 echo "🎯 After successful local testing, update container-apps.sh with your credentials and deploy to Azure!"
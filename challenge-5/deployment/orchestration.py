@@ -3,6 +3,17 @@ import os
 import time
 import asyncio
 import json
+import atexit
+import base64
+import bisect
+import csv
+import difflib
+import hashlib
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import Dict, Any
 from datetime import timedelta
 from azure.identity.aio import DefaultAzureCredential
@@ -23,42 +34,962 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)  
 
+# LOCAL_BACKEND=fake|replay|record swaps the Azure clients for the offline stand-ins in agents/local_backend.py.
+# Checked after the .env file is loaded so it can be set there, and install() only fills in unset endpoints
+if os.environ.get("LOCAL_BACKEND"):
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+    import local_backend
+    local_backend.install()
+
+class CosmosClientPool:
+    """
+    Process-wide cache of Cosmos DB clients and container handles.
+    Clients are created lazily once per (endpoint, key) and reuse their HTTP
+    connection pool; container handles are cached per (endpoint, key, database, container).
+    """
+
+    def __init__(self, pool_maxsize: int = None):
+        self.pool_maxsize = pool_maxsize or int(os.environ.get("COSMOS_POOL_MAXSIZE", "20"))
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._containers = {}
+
+    def _create_client(self, endpoint: str, key: str):
+        """Create a Cosmos DB client backed by a pooled HTTP session."""
+        try:
+            from azure.cosmos import CosmosClient
+        except ImportError:
+            raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+
+        try:
+            import requests
+            from azure.core.pipeline.transport import RequestsTransport
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_maxsize, pool_maxsize=self.pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            transport = RequestsTransport(session=session, session_owner=True)
+        except ImportError:
+            # Fall back to the SDK's default transport, which still keeps connections alive
+            transport = None
+
+        try:
+            if transport is not None:
+                return CosmosClient(endpoint, key, transport=transport)
+            return CosmosClient(endpoint, key)
+        except Exception as e:
+            raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+
+    def get_client(self, endpoint: str, key: str):
+        """Return the shared client for this endpoint, creating it on first use."""
+        client = self._clients.get((endpoint, key))
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get((endpoint, key))
+            if client is None:
+                client = self._create_client(endpoint, key)
+                self._clients[(endpoint, key)] = client
+            return client
+
+    def get_container(self, endpoint: str, key: str, database_name: str, container_name: str):
+        """Return the cached container handle for (endpoint, key, database, container)."""
+        # The key is part of the cache key so a handle never outlives the client it was made from
+        cache_key = (endpoint, key, database_name, container_name)
+        container = self._containers.get(cache_key)
+        if container is not None:
+            return container
+        client = self.get_client(endpoint, key)
+        with self._lock:
+            container = self._containers.get(cache_key)
+            if container is None:
+                database = client.get_database_client(database_name)
+                container = database.get_container_client(container_name)
+                self._containers[cache_key] = container
+            return container
+
+    def close(self):
+        """Close every pooled client and drop all cached handles."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._containers.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+# Shared by every CosmosDBPlugin instance in this process
+cosmos_client_pool = CosmosClientPool()
+
+def close_cosmos_clients():
+    """Shutdown hook: close the shared Cosmos DB clients."""
+    cosmos_client_pool.close()
+
+atexit.register(close_cosmos_clients)
+
+def _is_not_found(e: Exception) -> bool:
+    """True if a Cosmos DB exception means the item does not exist."""
+    return getattr(e, "status_code", None) == 404 or "NotFound" in str(e)
+
+class ClaimIndex:
+    """
+    In-process claim_id -> (document id, partition key value) lookup.
+    Warmed from a projection query and refreshed incrementally on the _ts watermark,
+    so get_document_by_claim_id can do a single-partition point read instead of a
+    cross-partition query. Deleted documents are dropped when a point read returns 404.
+    Once warm it doubles as the claim-ID catalog for "did you mean" suggestions. A miss is
+    never authoritative (the claim may be newer than the last refresh), so it still goes
+    to Cosmos DB - single-partition when the container is partitioned on /claim_id.
+    """
+
+    def __init__(self, refresh_interval: float = None, miss_refresh_interval: float = None):
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get("COSMOS_CLAIM_INDEX_REFRESH_SECONDS", "300"))
+        if miss_refresh_interval is None:
+            miss_refresh_interval = float(os.environ.get("COSMOS_CLAIM_INDEX_MISS_REFRESH_SECONDS", "15"))
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self.partition_key_path = None
+        self._entries = {}
+        self._sorted_claim_ids = None
+        self._watermark = 0
+        self._refreshed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def set_partition_key_paths(self, paths):
+        """Record the container's partition key path (from container.read())."""
+        self.partition_key_path = paths[0] if paths else "/id"
+
+    def _partition_key_segments(self):
+        return [segment for segment in (self.partition_key_path or "/id").split("/") if segment]
+
+    def is_warm(self) -> bool:
+        """True once the index has been loaded from Cosmos DB at least once."""
+        return self._refreshed_at is not None
+
+    def try_begin_refresh(self, max_age: float = None) -> bool:
+        """Claim the next refresh if the index is older than max_age (default refresh_interval) and none is running."""
+        if max_age is None:
+            max_age = self.refresh_interval
+        with self._lock:
+            if self._refreshing:
+                return False
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+                return False
+            self._refreshing = True
+            return True
+
+    def abort_refresh(self):
+        """Release a refresh claimed with try_begin_refresh() that failed."""
+        with self._lock:
+            self._refreshing = False
+
+    def projection_query(self):
+        """Return (query, parameters) selecting only the fields the index needs."""
+        pk_expression = "c" + "".join(f'["{segment}"]' for segment in self._partition_key_segments())
+        query = f"SELECT c.id, c.claim_id, {pk_expression} AS pk, c._ts FROM c"
+        parameters = []
+        if self._watermark:
+            # >= so documents written in the same second as the last refresh are not missed
+            query += " WHERE c._ts >= @watermark"
+            parameters.append({"name": "@watermark", "value": self._watermark})
+        return query, parameters
+
+    def apply(self, rows):
+        """Merge projection rows into the index and complete the refresh."""
+        with self._lock:
+            for row in rows:
+                claim_id = row.get("claim_id")
+                if claim_id is not None and row.get("pk") is not None:
+                    self._entries[claim_id] = (row["id"], row["pk"])
+                    self._sorted_claim_ids = None
+                self._watermark = max(self._watermark, row.get("_ts") or 0)
+            self._refreshed_at = time.monotonic()
+            self._refreshing = False
+
+    def claim_partition(self, claim_id: str):
+        """The partition key value holding claim_id when the container is partitioned on /claim_id, else None."""
+        return claim_id if self.partition_key_path == "/claim_id" else None
+
+    def partition_key_of(self, document):
+        """Extract the partition key value from a document, or None if the path is not known yet."""
+        if self.partition_key_path is None:
+            return None
+        pk = document
+        for segment in self._partition_key_segments():
+            pk = pk.get(segment) if isinstance(pk, dict) else None
+        return pk
+
+    def record(self, document):
+        """Index a document fetched through the query fallback."""
+        claim_id = document.get("claim_id")
+        pk = self.partition_key_of(document)
+        if claim_id is not None and pk is not None:
+            with self._lock:
+                self._entries[claim_id] = (document["id"], pk)
+                self._sorted_claim_ids = None
+
+    def lookup(self, claim_id: str):
+        """Return (document id, partition key) for claim_id, or None."""
+        return self._entries.get(claim_id)
+
+    def discard(self, claim_id: str):
+        with self._lock:
+            if self._entries.pop(claim_id, None) is not None:
+                self._sorted_claim_ids = None
+
+    def claim_ids(self):
+        """All known claim IDs, sorted."""
+        with self._lock:
+            if self._sorted_claim_ids is None:
+                self._sorted_claim_ids = sorted(self._entries, key=str)
+            return self._sorted_claim_ids
+
+    def suggest(self, claim_id: str, limit: int = 10):
+        """Nearest known claim IDs: fuzzy matches first, then sorted neighbours."""
+        claim_ids = self.claim_ids()
+        folded = {}
+        for known in claim_ids:
+            folded.setdefault(str(known).casefold(), known)
+        close = [folded[match] for match in difflib.get_close_matches(str(claim_id).casefold(), list(folded), n=limit, cutoff=0.6)]
+        position = bisect.bisect_left([str(known) for known in claim_ids], str(claim_id))
+        start = max(0, min(position - limit // 2, len(claim_ids) - limit))
+        neighbours = claim_ids[start:start + limit]
+        return (close + [known for known in neighbours if known not in close])[:limit]
+
+class DocumentCache:
+    """
+    Bounded TTL + LRU cache of Cosmos DB documents with request coalescing.
+    Concurrent lookups of the same key share a single backend call, whether the
+    callers are threads (get_or_load) or coroutines (get_or_load_async). Expired
+    entries are revalidated with a conditional read on their _etag when possible.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None):
+        if max_entries is None:
+            max_entries = int(os.environ.get("COSMOS_CACHE_MAX_ENTRIES", "256"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("COSMOS_CACHE_TTL_SECONDS", "60"))
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        """Return (document, stale_document) for key; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        document, expires_at = entry
+        if time.monotonic() < expires_at:
+            self._entries.move_to_end(key)
+            return document, None
+        return None, document
+
+    def _store(self, key, document):
+        with self._lock:
+            if document is None:
+                self._entries.pop(key, None)
+                return
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = (document, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, key, stale, loader, revalidate):
+        if stale is not None and revalidate is not None:
+            self.revalidations += 1
+            return revalidate(stale)
+        return loader()
+
+    def get_or_load(self, key, loader, revalidate=None):
+        """Return the cached document for key, calling loader() (or revalidate(stale)) at most once concurrently."""
+        with self._lock:
+            document, stale = self._lookup(key)
+            if document is not None:
+                self.hits += 1
+                return document
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if pending is not None:
+            return pending.result()
+        try:
+            document = self._load(key, stale, loader, revalidate)
+            self._store(key, document)
+            future.set_result(document)
+            return document
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_load_async(self, key, loader, revalidate=None):
+        """
+        Coroutine counterpart of get_or_load(); loader and revalidate return awaitables. The load
+        runs in a task owned by the cache and every caller awaits it through asyncio.shield, so
+        a caller that is cancelled (deadline, dropped request) never cancels the others.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            document, stale = self._lookup(key)
+            if document is not None:
+                self.hits += 1
+                return document
+            task = self._async_inflight.get(key)
+            if task is None or task.get_loop() is not loop:
+                self.misses += 1
+                task = self._async_inflight[key] = loop.create_task(self._load_async(key, stale, loader, revalidate))
+                task.add_done_callback(lambda done: self._finish_async_load(key, done))
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, stale, loader, revalidate):
+        document = await self._load(key, stale, loader, revalidate)
+        self._store(key, document)
+        return document
+
+    def _finish_async_load(self, key, task):
+        with self._lock:
+            if self._async_inflight.get(key) is task:
+                del self._async_inflight[key]
+        if not task.cancelled():
+            task.exception()  # avoid "exception never retrieved" when every caller was cancelled
+
+    def invalidate(self, key=None):
+        """Drop one key, or the whole cache when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "revalidations": self.revalidations,
+        }
+
+_shared_state = {}
+_shared_state_lock = threading.Lock()
+
+def _get_shared(factory, endpoint: str, database_name: str, container_name: str):
+    """Return the process-wide factory() instance for (endpoint, database, container)."""
+    cache_key = (factory, endpoint, database_name, container_name)
+    with _shared_state_lock:
+        instance = _shared_state.get(cache_key)
+        if instance is None:
+            instance = _shared_state[cache_key] = factory()
+        return instance
+
+def get_claim_index(endpoint: str, database_name: str, container_name: str) -> ClaimIndex:
+    """Return the process-wide ClaimIndex for (endpoint, database, container)."""
+    return _get_shared(ClaimIndex, endpoint, database_name, container_name)
+
+def get_document_cache(endpoint: str, database_name: str, container_name: str) -> DocumentCache:
+    """Return the process-wide DocumentCache for (endpoint, database, container)."""
+    return _get_shared(DocumentCache, endpoint, database_name, container_name)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Cosmos DB system properties; they carry no meaning for the agents
+SYSTEM_FIELDS = ("_rid", "_self", "_etag", "_attachments", "_ts")
+
+_FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+class FieldProjection:
+    """
+    A whitelist of (optionally dotted) field paths. It is pushed into the SQL SELECT
+    list so Cosmos DB only returns those fields, and applied client-side to documents
+    that come from point reads or the cache, with the same result shape.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.tree = {}
+        for path in self.fields:
+            if not _FIELD_PATH.match(path):
+                raise ValueError(f"Invalid projection field '{path}'")
+            node = self.tree
+            *parents, leaf = path.split(".")
+            for name in parents:
+                child = node.setdefault(name, {})
+                if child is True:
+                    # The whole parent is already selected
+                    break
+                node = child
+            else:
+                node[leaf] = True
+
+    @classmethod
+    def parse(cls, spec: str):
+        """Build a projection from a comma-separated field list; '*' means no projection."""
+        fields = [field.strip() for field in spec.split(",") if field.strip()]
+        if not fields or fields == ["*"]:
+            return None
+        return cls(fields)
+
+    def select_list(self, alias: str = "c") -> str:
+        """The SELECT list, e.g. 'c.id, {"policy_number": c.info.policy_number} AS info'."""
+        columns = []
+        for name, subtree in self.tree.items():
+            if subtree is True:
+                columns.append(f"{alias}.{name}")
+            else:
+                columns.append(f"{self._object_expr(subtree, f'{alias}.{name}')} AS {name}")
+        return ", ".join(columns)
+
+    def _object_expr(self, tree, ref: str) -> str:
+        members = []
+        for name, subtree in tree.items():
+            value = f"{ref}.{name}" if subtree is True else self._object_expr(subtree, f"{ref}.{name}")
+            members.append(f'"{name}": {value}')
+        return "{" + ", ".join(members) + "}"
+
+    def apply(self, document):
+        """Project a full document the way the SELECT list would."""
+        return self._apply(self.tree, document)
+
+    def _apply(self, tree, document):
+        result = {}
+        for name, subtree in tree.items():
+            value = document.get(name) if isinstance(document, dict) else None
+            if subtree is True:
+                # Cosmos DB omits undefined properties
+                if isinstance(document, dict) and name in document:
+                    result[name] = value
+            else:
+                result[name] = self._apply(subtree, value)
+        return result
+
+def strip_system_fields(document):
+    """Drop the Cosmos DB system properties from a top-level document."""
+    if not isinstance(document, dict):
+        return document
+    return {key: value for key, value in document.items() if key not in SYSTEM_FIELDS}
+
+class ResponseSerializer:
+    """
+    Serializes tool responses for the agents and keeps byte/token counts per function.
+    The compact format has no indentation or spaces and uses orjson when it is installed;
+    COSMOS_OUTPUT_FORMAT=pretty restores the indent=2 layout.
+    """
+
+    def __init__(self, compact: bool = None):
+        if compact is None:
+            compact = os.environ.get("COSMOS_OUTPUT_FORMAT", "compact").lower() != "pretty"
+        self.compact = compact
+        self.log_sizes = os.environ.get("COSMOS_LOG_OUTPUT_SIZE", "").lower() in ("1", "true", "yes")
+        self._encoder = None
+        self._encoder_loaded = False
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def dumps(self, obj, nested: bool = False) -> str:
+        """Serialize obj; nested values are indented to sit inside a response list in pretty mode."""
+        if self.compact:
+            if orjson is not None:
+                try:
+                    return orjson.dumps(obj).decode("utf-8")
+                except TypeError:
+                    # e.g. integers beyond 64 bits; the json module handles those
+                    pass
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        text = json.dumps(obj, indent=2, ensure_ascii=False)
+        return text.replace("\n", "\n    ") if nested else text
+
+    def iter_list_response(self, header: dict, list_key: str, chunks, next_cursor: str = None):
+        """Yield a {header..., count, list_key: [...], next_cursor} object from pre-serialized items."""
+        if self.compact:
+            yield "{"
+            for key, value in header.items():
+                yield f"{self.dumps(key)}:{self.dumps(value)},"
+            yield f'"count":{len(chunks)},"{list_key}":['
+            yield ",".join(chunks)
+            yield "]"
+            if next_cursor:
+                yield f',"next_cursor":{self.dumps(next_cursor)}'
+            yield "}"
+            return
+        yield "{\n"
+        for key, value in header.items():
+            yield f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n"
+        yield f'  "count": {len(chunks)},\n'
+        yield f'  "{list_key}": ['
+        for position, chunk in enumerate(chunks):
+            yield ("," if position else "") + "\n    " + chunk
+        yield "\n  ]"
+        if next_cursor:
+            yield f',\n  "next_cursor": {json.dumps(next_cursor)}'
+        yield "\n}"
+
+    def count_tokens(self, text: str) -> int:
+        """Token count with tiktoken's o200k_base encoding when available, else ~4 characters per token."""
+        if not self._encoder_loaded:
+            try:
+                import tiktoken
+                self._encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                self._encoder = None
+            self._encoder_loaded = True
+        if self._encoder is None:
+            return (len(text) + 3) // 4
+        return len(self._encoder.encode(text))
+
+    def record(self, function_name: str, text: str) -> str:
+        """Count the bytes and tokens of a response and return it unchanged."""
+        size = len(text.encode("utf-8"))
+        tokens = self.count_tokens(text)
+        with self._lock:
+            stats = self._stats.setdefault(function_name, {"calls": 0, "bytes": 0, "tokens": 0})
+            stats["calls"] += 1
+            stats["bytes"] += size
+            stats["tokens"] += tokens
+        if self.log_sizes:
+            print(f"📏 {function_name}: {size} bytes, {tokens} tokens")
+        return text
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "format": "compact" if self.compact else "pretty",
+                "functions": {name: dict(counts) for name, counts in self._stats.items()}
+            }
+
+response_serializer = ResponseSerializer()
+
+class ResultPage:
+    """
+    One budgeted page of query results. Items are serialized as they are offered,
+    so the page stops at max_items or max_bytes without materializing the rest of
+    the result set, and iter_json() streams the response one chunk at a time.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, serializer: ResponseSerializer = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.serializer = serializer or response_serializer
+        self.chunks = []
+        self.size = 0
+        self.resume = None
+        # Set once an item was turned away, i.e. more results exist after resume
+        self.truncated = False
+
+    def offer(self, item, resume) -> bool:
+        """Add an item unless the page is full; resume is the position just after it."""
+        if len(self.chunks) >= self.max_items:
+            self.truncated = True
+            return False
+        chunk = self.serializer.dumps(item, nested=True)
+        size = len(chunk.encode("utf-8"))
+        # Always keep at least one item so paging makes progress
+        if self.chunks and self.size + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self.chunks.append(chunk)
+        self.size += size
+        self.resume = resume
+        return True
+
+    def iter_json(self, header: dict, list_key: str, next_cursor: str = None):
+        """Yield the response JSON one chunk at a time."""
+        return self.serializer.iter_list_response(header, list_key, self.chunks, next_cursor)
+
 class CosmosDBPlugin:
     """
     A production-ready Cosmos DB plugin that connects to real Azure Cosmos DB.
     This plugin retrieves actual JSON documents from your database.
     """
     
-    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer"):
+    # Fields each tool returns ('*' = every non-system field); override per tool
+    # with COSMOS_FIELDS_<TOOL NAME>, e.g. COSMOS_FIELDS_SEARCH_BY_FIELD="id,claim_id"
+    DEFAULT_PROJECTIONS = {
+        "get_document_by_claim_id": "*",
+        "get_document_by_id": "*",
+        "list_recent_documents": "id,claim_id,structured_claim_info.policyholder_name,structured_claim_info.policy_number,structured_claim_info.incident_date,structured_claim_info.incident_location",
+        "search_by_field": "id,claim_id,structured_claim_info,image_descriptions",
+    }
+    
+    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer", client_pool: CosmosClientPool = None, document_cache: DocumentCache = None, serializer: ResponseSerializer = None, projections: dict = None):
         """
         Initialize the Cosmos DB plugin with connection details.
         For production, use environment variables or Azure Key Vault for credentials.
+        Clients and the document cache are shared process-wide unless dedicated ones are passed in.
+        projections maps tool names to comma-separated field lists and takes precedence over the environment.
         """
         self.endpoint = endpoint or os.environ.get("COSMOS_ENDPOINT")
         self.key = key or os.environ.get("COSMOS_KEY") 
         self.database_name = "insurance_claims"
         self.container_name = "crash_reports"
+        self.client_pool = client_pool or cosmos_client_pool
+        self.document_cache = document_cache or get_document_cache(self.endpoint, self.database_name, self.container_name)
+        self.max_page_size = int(os.environ.get("COSMOS_MAX_PAGE_SIZE", "100"))
+        self.max_result_bytes = int(os.environ.get("COSMOS_MAX_RESULT_BYTES", "65536"))
+        self.serializer = serializer or response_serializer
+        self.projections = {}
+        for name, spec in self.DEFAULT_PROJECTIONS.items():
+            spec = (projections or {}).get(name) or os.environ.get(f"COSMOS_FIELDS_{name.upper()}", spec)
+            self.projections[name] = FieldProjection.parse(spec)
     
     def _get_cosmos_client(self):
-        """Create and return a Cosmos DB client."""
+        """Return the pooled Cosmos DB client."""
         if not self.endpoint or not self.key:
             raise Exception("Cosmos DB endpoint and key must be configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables.")
         
+        return self.client_pool.get_client(self.endpoint, self.key)
+    
+    def _get_container(self):
+        """Return the cached container handle for this plugin's database and container."""
+        if not self.endpoint or not self.key:
+            raise Exception("Cosmos DB endpoint and key must be configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables.")
+        
+        return self.client_pool.get_container(self.endpoint, self.key, self.database_name, self.container_name)
+    
+    def _get_claim_index(self) -> ClaimIndex:
+        return get_claim_index(self.endpoint, self.database_name, self.container_name)
+    
+    def _refresh_claim_index(self, container, index: ClaimIndex, max_age: float = None):
+        """Warm or incrementally refresh the claim index if it is due."""
+        if not index.try_begin_refresh(max_age):
+            return
+        applied = False
         try:
-            from azure.cosmos import CosmosClient
-            return CosmosClient(self.endpoint, self.key)
-        except ImportError:
-            raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+            if index.partition_key_path is None:
+                index.set_partition_key_paths(container.read().get("partitionKey", {}).get("paths", []))
+            query, parameters = index.projection_query()
+            rows = list(container.query_items(
+                query=query,
+                parameters=parameters,
+                enable_cross_partition_query=True
+            ))
+            index.apply(rows)
+            applied = True
+        except Exception:
+            # The index is only an optimisation - lookups fall back to the query
+            pass
+        finally:
+            # Release the refresh slot on any exit, including interrupts and cancellation
+            if not applied:
+                index.abort_refresh()
+    
+    def _point_read_claim(self, container, claim_id: str):
+        """Read a claim with a single-partition point read; None if the index has no entry."""
+        index = self._get_claim_index()
+        self._refresh_claim_index(container, index)
+        location = index.lookup(claim_id)
+        if location is None:
+            return None
+        try:
+            return container.read_item(item=location[0], partition_key=location[1])
         except Exception as e:
-            raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+            if _is_not_found(e):
+                index.discard(claim_id)
+                return None
+            raise
+    
+    def _fetch_claim_document(self, container, claim_id: str):
+        """Load a claim document: point read via the claim index, else a query by claim_id."""
+        index = self._get_claim_index()
+        document = self._point_read_claim(container, claim_id)
+        if document is not None:
+            return document
+        
+        # Index miss: the claim may be newer than the last refresh, so ask Cosmos DB.
+        # Scope the query to one partition when the partition key is the claim_id.
+        query = "SELECT * FROM c WHERE c.claim_id = @claim_id"
+        parameters = [{"name": "@claim_id", "value": claim_id}]
+        partition_key = index.claim_partition(claim_id)
+        scope = {"partition_key": partition_key} if partition_key is not None else {"enable_cross_partition_query": True}
+        
+        items = list(container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=1,  # We expect only one document with this claim_id
+            **scope
+        ))
+        if not items:
+            return None
+        
+        self._get_claim_index().record(items[0])
+        return items[0]
+    
+    def _fetch_document_by_id(self, container, document_id: str, partition_key: str = None):
+        """Load a document by ID: direct read with the partition key, else a cross-partition query."""
+        if partition_key:
+            try:
+                return container.read_item(item=document_id, partition_key=partition_key)
+            except Exception as e:
+                if _is_not_found(e):
+                    return None
+                raise
+        
+        query = "SELECT * FROM c WHERE c.id = @document_id"
+        parameters = [{"name": "@document_id", "value": document_id}]
+        
+        items = list(container.query_items(
+            query=query,
+            parameters=parameters,
+            enable_cross_partition_query=True,
+            max_item_count=1
+        ))
+        return items[0] if items else None
+    
+    def _available_claim_ids(self, container, claim_id: str):
+        """Claim IDs to suggest after a miss, from the local catalog when it is warm."""
+        index = self._get_claim_index()
+        if index.is_warm():
+            # A rate-limited incremental refresh keeps the suggestions current
+            self._refresh_claim_index(container, index, index.miss_refresh_interval)
+            return index.suggest(claim_id)
+        
+        # Try to find what claim IDs actually exist
+        all_claims_query = "SELECT c.claim_id FROM c"
+        all_items = list(container.query_items(
+            query=all_claims_query,
+            enable_cross_partition_query=True,
+            max_item_count=10
+        ))
+        return [item.get('claim_id', 'N/A') for item in all_items]
+    
+    def _revalidate_document(self, container, document, reload, partition_key: str = None):
+        """Conditional read on the cached _etag: the cached document if unchanged, the new one otherwise, None if deleted."""
+        etag = document.get("_etag")
+        if partition_key is None:
+            partition_key = self._get_claim_index().partition_key_of(document)
+        if not etag or partition_key is None or "id" not in document:
+            return reload()
+        try:
+            fresh = container.read_item(item=document["id"], partition_key=partition_key, initial_headers={"If-None-Match": etag})
+        except Exception as e:
+            if getattr(e, "status_code", None) == 304:
+                return document
+            if _is_not_found(e):
+                return None
+            raise
+        return fresh or document
+    
+    def warmup(self):
+        """Open the pooled client and load the claim index now instead of on the first tool call."""
+        container = self._get_container()
+        self._refresh_claim_index(container, self._get_claim_index())
+    
+    def get_cache_stats(self) -> dict:
+        """Hit, miss, eviction and coalescing counters of the shared document cache."""
+        return self.document_cache.stats()
+    
+    def get_output_stats(self) -> dict:
+        """Calls, bytes and tokens returned to the agents, per tool."""
+        return self.serializer.stats()
+    
+    def _respond(self, function_name: str, text: str) -> str:
+        """Record the size of a tool response and return it."""
+        return self.serializer.record(function_name, text)
+    
+    def _select_list(self, function_name: str) -> str:
+        """SELECT list for a tool: its projected fields, or * when it returns whole documents."""
+        projection = self.projections.get(function_name)
+        return projection.select_list() if projection else "*"
+    
+    def _shape(self, document, function_name: str):
+        """Apply a tool's projection to a full document, or just drop the system fields."""
+        projection = self.projections.get(function_name)
+        return projection.apply(document) if projection else strip_system_fields(document)
+    
+    def _format_connection_test(self, items) -> str:
+        """Build the test_connection response from the sampled items."""
+        if not items:
+            return f"✅ Connection successful but no documents found in container '{self.container_name}'"
+        
+        claim_ids = [item.get('claim_id', 'N/A') for item in items]
+        result = {
+            "connection_status": "SUCCESS",
+            "database": self.database_name,
+            "container": self.container_name,
+            "documents_found": len(items),
+            "available_claim_ids": claim_ids
+        }
+        
+        return self.serializer.dumps(result)
+    
+    def _format_document(self, document, function_name: str) -> str:
+        """Serialize a single document for the agent, shaped by the tool's projection."""
+        return self.serializer.dumps(self._shape(document, function_name))
+    
+    def _format_claim_not_found(self, claim_id: str, available_ids) -> str:
+        """Build the response for a claim_id that has no document."""
+        return f"❌ No document found with claim_id '{claim_id}' in container '{self.container_name}'.\n\nAvailable claim IDs: {available_ids}\n\nPlease verify the claim ID exists in the database."
+    
+    def _format_claim_error(self, claim_id: str, e: Exception) -> str:
+        """Map an exception raised by a claim_id lookup to an agent-facing message."""
+        error_msg = str(e)
+        if "endpoint and key must be configured" in error_msg:
+            return f"❌ Cosmos DB not configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables. Error: {error_msg}"
+        elif "Unauthorized" in error_msg or "401" in error_msg:
+            return f"❌ Authentication failed. Please check your Cosmos DB credentials. Error: {error_msg}"
+        elif "Forbidden" in error_msg or "403" in error_msg:
+            return f"❌ Access denied. Please check your Cosmos DB permissions. Error: {error_msg}"
+        elif "azure-cosmos package not installed" in error_msg:
+            return f"❌ Missing dependency. Please run: pip install azure-cosmos"
+        else:
+            return f"❌ Error retrieving document by claim_id '{claim_id}': {error_msg}"
+    
+    def _format_document_not_found(self, document_id: str) -> str:
+        """Build the response for a document ID that does not exist."""
+        return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
+    
+    def _format_document_error(self, document_id: str, e: Exception) -> str:
+        """Map an exception raised by a document ID lookup to an agent-facing message."""
+        error_msg = str(e)
+        if "NotFound" in error_msg or "404" in error_msg:
+            return self._format_document_not_found(document_id)
+        elif "Unauthorized" in error_msg or "401" in error_msg:
+            return f"❌ Authentication failed. Please check your Cosmos DB credentials."
+        elif "Forbidden" in error_msg or "403" in error_msg:
+            return f"❌ Access denied. Please check your Cosmos DB permissions."
+        else:
+            return f"❌ Error retrieving document: {error_msg}"
+    
+    def _format_query_results(self, sql_query: str, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the query_documents response."""
+        if not page.chunks:
+            return f"🔍 No documents found matching query: {sql_query}"
+        
+        # Return results as formatted JSON
+        return "".join(page.iter_json({"query": sql_query}, "results", next_cursor))
+    
+    def _format_query_error(self, sql_query: str, e: Exception) -> str:
+        """Map an exception raised by a custom query to an agent-facing message."""
+        error_msg = str(e)
+        if "Syntax error" in error_msg:
+            return f"❌ SQL syntax error in query: {sql_query}\nError: {error_msg}"
+        else:
+            return f"❌ Error executing query: {error_msg}"
+    
+    def _format_container_info(self, container_props, count_items) -> str:
+        """Build the get_container_info response."""
+        document_count = count_items[0] if count_items else "Unknown"
+        
+        info = {
+            "database": self.database_name,
+            "container": self.container_name,
+            "partition_key": container_props.get("partitionKey", {}).get("paths", ["Unknown"]),
+            "approximate_document_count": document_count,
+            "indexing_policy": container_props.get("indexingPolicy", {}).get("indexingMode", "Unknown")
+        }
+        
+        return self.serializer.dumps(info)
+    
+    def _format_recent_documents(self, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the list_recent_documents response."""
+        if not page.chunks:
+            return "📭 No documents found in the container"
+        
+        return "".join(page.iter_json({"container": self.container_name}, "documents", next_cursor))
+    
+    def _format_search_results(self, field_name: str, field_value: str, page: ResultPage, next_cursor: str = None) -> str:
+        """Build the search_by_field response."""
+        if not page.chunks:
+            return f"🔍 No documents found where {field_name} = '{field_value}'"
+        
+        return "".join(page.iter_json({"search_criteria": f"{field_name} = '{field_value}'"}, "documents", next_cursor))
+    
+    def _new_page(self, page_size: int) -> ResultPage:
+        """A result page clamped to the plugin's item and byte budgets."""
+        return ResultPage(max(1, min(page_size, self.max_page_size)), self.max_result_bytes, self.serializer)
+    
+    def _query_fingerprint(self, query: str, parameters) -> str:
+        return hashlib.sha1(json.dumps([query, parameters], sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    
+    def _encode_cursor(self, query: str, parameters, page: ResultPage):
+        """Opaque cursor for the position after the page's last item, or None when there is nothing more."""
+        if not page.truncated:
+            return None
+        token, offset = page.resume
+        payload = {"q": self._query_fingerprint(query, parameters), "t": token, "o": offset, "n": page.max_items}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+    
+    def _decode_cursor(self, query: str, parameters, cursor: str):
+        """Return (continuation token, offset in page, page size) for a cursor from _encode_cursor()."""
+        if not cursor:
+            return None, 0, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except Exception:
+            raise ValueError("Invalid cursor. Pass the next_cursor value exactly as returned.")
+        if payload.get("q") != self._query_fingerprint(query, parameters):
+            raise ValueError("Cursor does not belong to this query. Repeat the original query to continue paging.")
+        return payload.get("t"), payload.get("o", 0), payload.get("n")
+    
+    def _iter_query(self, container, query: str, parameters, cursor: str, page_size: int):
+        """
+        Yield (item, resume) pairs one Cosmos DB page at a time, starting at the cursor.
+        resume is (continuation token, offset) of the position just after the item.
+        """
+        token, skip, cursor_page_size = self._decode_cursor(query, parameters, cursor)
+        # Offsets inside a page are only valid for the page size the cursor was created with
+        page_size = cursor_page_size or page_size
+        pages = container.query_items(
+            query=query,
+            parameters=parameters,
+            enable_cross_partition_query=True,
+            max_item_count=page_size
+        ).by_page(token)
+        
+        for page in pages:
+            items = list(page)
+            next_token = pages.continuation_token
+            for offset in range(skip, len(items)):
+                resume = (next_token, 0) if offset + 1 == len(items) else (token, offset + 1)
+                yield items[offset], resume
+            if not next_token:
+                return
+            token, skip = next_token, 0
+    
+    def _read_page(self, container, query: str, parameters, cursor: str, page_size: int, projected: bool = False):
+        """Fill one ResultPage from the query and return it with its next cursor."""
+        page = self._new_page(page_size)
+        for item, resume in self._iter_query(container, query, parameters, cursor, page.max_items):
+            if not projected:
+                item = strip_system_fields(item)
+            if not page.offer(item, resume):
+                break
+        return page, self._encode_cursor(query, parameters, page)
     
     @kernel_function(description="Test Cosmos DB connection and list available claims")
     def test_connection(self) -> Annotated[str, "Connection test result and available claims"]:
         """Test the Cosmos DB connection and show what claims are available."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Test with a simple query to get all claim IDs
             query = "SELECT c.claim_id, c.id FROM c"
@@ -68,19 +999,7 @@ class CosmosDBPlugin:
                 max_item_count=10  # Limit to first 10 for testing
             ))
             
-            if not items:
-                return f"✅ Connection successful but no documents found in container '{self.container_name}'"
-            
-            claim_ids = [item.get('claim_id', 'N/A') for item in items]
-            result = {
-                "connection_status": "SUCCESS",
-                "database": self.database_name,
-                "container": self.container_name,
-                "documents_found": len(items),
-                "available_claim_ids": claim_ids
-            }
-            
-            return json.dumps(result, indent=2)
+            return self._respond("test_connection", self._format_connection_test(items))
             
         except Exception as e:
             return f"❌ Connection test failed: {str(e)}"
@@ -90,51 +1009,23 @@ class CosmosDBPlugin:
         self, 
         claim_id: Annotated[str, "The claim_id to retrieve (not the partition key)"]
     ) -> Annotated[str, "JSON document from Cosmos DB"]:
-        """Retrieve a document by its claim_id using a cross-partition query."""
+        """Retrieve a document by its claim_id through the shared cache, point read or cross-partition query."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
-            # Use SQL query to find document by claim_id across all partitions
-            query = "SELECT * FROM c WHERE c.claim_id = @claim_id"
-            parameters = [{"name": "@claim_id", "value": claim_id}]
-            
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True,
-                max_item_count=1  # We expect only one document with this claim_id
-            ))
+            document = self.document_cache.get_or_load(
+                ("claim_id", claim_id),
+                lambda: self._fetch_claim_document(container, claim_id),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_claim_document(container, claim_id))
+            )
             
-            if not items:
-                # Try to find what claim IDs actually exist
-                all_claims_query = "SELECT c.claim_id FROM c"
-                all_items = list(container.query_items(
-                    query=all_claims_query,
-                    enable_cross_partition_query=True,
-                    max_item_count=10
-                ))
-                available_ids = [item.get('claim_id', 'N/A') for item in all_items]
-                
-                return f"❌ No document found with claim_id '{claim_id}' in container '{self.container_name}'.\n\nAvailable claim IDs: {available_ids}\n\nPlease verify the claim ID exists in the database."
+            if document is None:
+                return self._format_claim_not_found(claim_id, self._available_claim_ids(container, claim_id))
             
-            # Return the first (and should be only) matching document
-            document = items[0]
-            return json.dumps(document, indent=2, ensure_ascii=False)
+            return self._respond("get_document_by_claim_id", self._format_document(document, "get_document_by_claim_id"))
             
         except Exception as e:
-            error_msg = str(e)
-            if "endpoint and key must be configured" in error_msg:
-                return f"❌ Cosmos DB not configured. Please set COSMOS_ENDPOINT and COSMOS_KEY environment variables. Error: {error_msg}"
-            elif "Unauthorized" in error_msg or "401" in error_msg:
-                return f"❌ Authentication failed. Please check your Cosmos DB credentials. Error: {error_msg}"
-            elif "Forbidden" in error_msg or "403" in error_msg:
-                return f"❌ Access denied. Please check your Cosmos DB permissions. Error: {error_msg}"
-            elif "azure-cosmos package not installed" in error_msg:
-                return f"❌ Missing dependency. Please run: pip install azure-cosmos"
-            else:
-                return f"❌ Error retrieving document by claim_id '{claim_id}': {error_msg}"
+            return self._format_claim_error(claim_id, e)
     
     @kernel_function(description="Retrieve a JSON document by partition key and document ID from Cosmos DB")
     def get_document_by_id(
@@ -142,87 +1033,47 @@ class CosmosDBPlugin:
         document_id: Annotated[str, "The document ID to retrieve"],
         partition_key: Annotated[str, "The partition key value (optional, will use cross-partition query if not provided)"] = None
     ) -> Annotated[str, "JSON document from Cosmos DB"]:
-        """Retrieve a specific document by its ID and optionally partition key from Cosmos DB."""
+        """Retrieve a specific document by its ID and optionally partition key, through the shared cache."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
-            if partition_key:
-                # Direct read using partition key - most efficient
-                item = container.read_item(item=document_id, partition_key=partition_key)
-                return json.dumps(item, indent=2, ensure_ascii=False)
-            else:
-                # Cross-partition query when partition key is unknown
-                query = "SELECT * FROM c WHERE c.id = @document_id"
-                parameters = [{"name": "@document_id", "value": document_id}]
-                
-                items = list(container.query_items(
-                    query=query,
-                    parameters=parameters,
-                    enable_cross_partition_query=True,
-                    max_item_count=1
-                ))
-                
-                if not items:
-                    return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
-                
-                return json.dumps(items[0], indent=2, ensure_ascii=False)
+            document = self.document_cache.get_or_load(
+                ("id", document_id, partition_key),
+                lambda: self._fetch_document_by_id(container, document_id, partition_key),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_document_by_id(container, document_id, partition_key), partition_key)
+            )
+            
+            if document is None:
+                return self._format_document_not_found(document_id)
+            
+            return self._respond("get_document_by_id", self._format_document(document, "get_document_by_id"))
             
         except Exception as e:
-            error_msg = str(e)
-            if "NotFound" in error_msg or "404" in error_msg:
-                return f"❌ Document with ID '{document_id}' not found in container '{self.container_name}'"
-            elif "Unauthorized" in error_msg or "401" in error_msg:
-                return f"❌ Authentication failed. Please check your Cosmos DB credentials."
-            elif "Forbidden" in error_msg or "403" in error_msg:
-                return f"❌ Access denied. Please check your Cosmos DB permissions."
-            else:
-                return f"❌ Error retrieving document: {error_msg}"
+            return self._format_document_error(document_id, e)
     
-    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB")
+    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB. Results are paged; pass next_cursor back to get more")
     def query_documents(
         self, 
-        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"]
+        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"],
+        page_size: Annotated[int, "Maximum number of results to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same query, to continue paging"] = None
     ) -> Annotated[str, "Query results as JSON"]:
-        """Execute a custom SQL query against the Cosmos DB container."""
+        """Execute a custom SQL query against the Cosmos DB container, one page at a time."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
-            # Execute the query
-            items = list(container.query_items(
-                query=sql_query,
-                enable_cross_partition_query=True  # Enable if your query spans partitions
-            ))
+            page, next_cursor = self._read_page(container, sql_query, None, cursor, page_size)
             
-            if not items:
-                return f"🔍 No documents found matching query: {sql_query}"
-            
-            # Return results as formatted JSON
-            result = {
-                "query": sql_query,
-                "count": len(items),
-                "results": items
-            }
-            
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            return self._respond("query_documents", self._format_query_results(sql_query, page, next_cursor))
             
         except Exception as e:
-            error_msg = str(e)
-            if "Syntax error" in error_msg:
-                return f"❌ SQL syntax error in query: {sql_query}\nError: {error_msg}"
-            else:
-                return f"❌ Error executing query: {error_msg}"
+            return self._format_query_error(sql_query, e)
     
     @kernel_function(description="Get container information and statistics")
     def get_container_info(self) -> Annotated[str, "Container information and statistics"]:
         """Get information about the Cosmos DB container."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Get container properties
             container_props = container.read()
@@ -233,118 +1084,638 @@ class CosmosDBPlugin:
                 query=count_query,
                 enable_cross_partition_query=True
             ))
-            document_count = count_items[0] if count_items else "Unknown"
-            
-            info = {
-                "database": self.database_name,
-                "container": self.container_name,
-                "partition_key": container_props.get("partitionKey", {}).get("paths", ["Unknown"]),
-                "approximate_document_count": document_count,
-                "indexing_policy": container_props.get("indexingPolicy", {}).get("indexingMode", "Unknown")
-            }
             
-            return json.dumps(info, indent=2)
+            return self._respond("get_container_info", self._format_container_info(container_props, count_items))
             
         except Exception as e:
             return f"❌ Error getting container info: {str(e)}"
     
-    @kernel_function(description="List recent documents (up to 100) from Cosmos DB")
+    @kernel_function(description="List recent claims (summary fields, up to 100 per page) from Cosmos DB. Pass next_cursor back to get more")
     def list_recent_documents(
         self, 
-        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10
+        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10,
+        cursor: Annotated[str, "next_cursor from a previous call, to continue paging"] = None
     ) -> Annotated[str, "List of recent documents"]:
-        """List recent documents from the container."""
+        """List recent documents from the container, one page at a time."""
         try:
-            # Ensure limit is within bounds
-            limit = max(1, min(limit, 100))
-            
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
-            # Query for documents (ordered by _ts if available)
-            query = f"SELECT TOP {limit} * FROM c ORDER BY c._ts DESC"
+            # Query for documents (ordered by _ts if available); the page size bounds each response
+            select_list = self._select_list("list_recent_documents")
+            query = f"SELECT {select_list} FROM c ORDER BY c._ts DESC"
             
-            items = list(container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            
-            if not items:
-                return "📭 No documents found in the container"
-            
-            result = {
-                "container": self.container_name,
-                "count": len(items),
-                "documents": items
-            }
+            page, next_cursor = self._read_page(container, query, None, cursor, limit, projected=select_list != "*")
             
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            return self._respond("list_recent_documents", self._format_recent_documents(page, next_cursor))
             
         except Exception as e:
             return f"❌ Error listing documents: {str(e)}"
     
-    @kernel_function(description="Search documents by field value")
+    @kernel_function(description="Search documents by field value. Results are paged; pass next_cursor back to get more")
     def search_by_field(
         self, 
         field_name: Annotated[str, "The field name to search in (e.g., 'name', 'category', 'status')"],
-        field_value: Annotated[str, "The value to search for"]
+        field_value: Annotated[str, "The value to search for"],
+        page_size: Annotated[int, "Maximum number of documents to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same search, to continue paging"] = None
     ) -> Annotated[str, "Documents matching the search criteria"]:
-        """Search for documents where a specific field matches a value."""
+        """Search for documents where a specific field matches a value, one page at a time."""
         try:
-            client = self._get_cosmos_client()
-            database = client.get_database_client(self.database_name)
-            container = database.get_container_client(self.container_name)
+            container = self._get_container()
             
             # Use parameterized query for better security and performance
-            query = f"SELECT * FROM c WHERE c.{field_name} = @field_value"
+            select_list = self._select_list("search_by_field")
+            query = f"SELECT {select_list} FROM c WHERE c.{field_name} = @field_value"
             parameters = [{"name": "@field_value", "value": field_value}]
             
-            items = list(container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
+            page, next_cursor = self._read_page(container, query, parameters, cursor, page_size, projected=select_list != "*")
+            
+            return self._respond("search_by_field", self._format_search_results(field_name, field_value, page, next_cursor))
+            
+        except Exception as e:
+            return f"❌ Error searching documents: {str(e)}"
+
+# Close tasks scheduled by close_on_loop, referenced until they finish
+_pending_closes = set()
+
+def close_on_loop(resources, loop):
+    """
+    Close async clients left behind by an event loop change without blocking the caller: on
+    their own loop while it still runs (e.g. in another thread), else best effort on this one.
+    """
+    resources = [resource for resource in resources if resource is not None]
+    if not resources:
+        return
+
+    async def close_all():
+        for resource in resources:
+            try:
+                await resource.close()
+            except Exception:
+                pass
+
+    if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+        asyncio.run_coroutine_threadsafe(close_all(), loop)
+        return
+    task = asyncio.ensure_future(close_all())
+    _pending_closes.add(task)
+    task.add_done_callback(_pending_closes.discard)
+
+class AsyncCosmosClientPool:
+    """
+    Process-wide cache of async Cosmos DB clients (azure.cosmos.aio) and container handles.
+    Async clients are bound to the event loop that created them, so the cache is
+    reset (and the old clients closed) when it is first used from a different loop.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._containers = {}
+        self._loop = None
+
+    def _bind_loop(self):
+        """Close and drop the clients that belong to a previous event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            close_on_loop(self._clients.values(), self._loop)
+            self._clients = {}
+            self._containers = {}
+            self._loop = loop
+
+    def get_client(self, endpoint: str, key: str):
+        """Return the shared async client for this endpoint, creating it on first use."""
+        self._bind_loop()
+        client = self._clients.get((endpoint, key))
+        if client is None:
+            try:
+                from azure.cosmos.aio import CosmosClient
+            except ImportError:
+                raise ImportError("azure-cosmos package not installed. Run: pip install azure-cosmos")
+            try:
+                client = CosmosClient(endpoint, key)
+            except Exception as e:
+                raise Exception(f"Failed to create Cosmos DB client: {str(e)}")
+            self._clients[(endpoint, key)] = client
+        return client
+
+    def get_container(self, endpoint: str, key: str, database_name: str, container_name: str):
+        """Return the cached async container handle for (endpoint, key, database, container)."""
+        client = self.get_client(endpoint, key)
+        cache_key = (endpoint, key, database_name, container_name)
+        container = self._containers.get(cache_key)
+        if container is None:
+            container = client.get_database_client(database_name).get_container_client(container_name)
+            self._containers[cache_key] = container
+        return container
+
+    async def close(self):
+        """Close every pooled async client and drop all cached handles."""
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._containers = {}
+        self._loop = None
+        for client in clients:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+# Shared by every AsyncCosmosDBPlugin instance in this process
+async_cosmos_client_pool = AsyncCosmosClientPool()
+
+async def close_async_cosmos_clients():
+    """Shutdown hook: close the shared async Cosmos DB clients. Await it before the event loop stops."""
+    await async_cosmos_client_pool.close()
+
+class AsyncCosmosDBPlugin(CosmosDBPlugin):
+    """
+    Non-blocking variant of CosmosDBPlugin for agents running on asyncio.
+    Kernel functions are coroutines backed by azure.cosmos.aio and return exactly
+    the same strings as the synchronous plugin.
+    """
+    
+    def __init__(self, endpoint: str = None, key: str = None, database_name: str = "MyDatabase", container_name: str = "MyContainer", client_pool: AsyncCosmosClientPool = None, document_cache: DocumentCache = None, serializer: ResponseSerializer = None, projections: dict = None):
+        super().__init__(endpoint, key, database_name, container_name, document_cache=document_cache, serializer=serializer, projections=projections)
+        self.client_pool = client_pool or async_cosmos_client_pool
+    
+    async def _collect(self, pager):
+        """Drain an async item pager into a list."""
+        return [item async for item in pager]
+    
+    async def _iter_query(self, container, query: str, parameters, cursor: str, page_size: int):
+        """Async counterpart of CosmosDBPlugin._iter_query()."""
+        token, skip, cursor_page_size = self._decode_cursor(query, parameters, cursor)
+        page_size = cursor_page_size or page_size
+        pages = container.query_items(
+            query=query,
+            parameters=parameters,
+            max_item_count=page_size
+        ).by_page(token)
+        
+        async for page in pages:
+            items = await self._collect(page)
+            next_token = pages.continuation_token
+            for offset in range(skip, len(items)):
+                resume = (next_token, 0) if offset + 1 == len(items) else (token, offset + 1)
+                yield items[offset], resume
+            if not next_token:
+                return
+            token, skip = next_token, 0
+    
+    async def _read_page(self, container, query: str, parameters, cursor: str, page_size: int, projected: bool = False):
+        """Fill one ResultPage from the query and return it with its next cursor."""
+        page = self._new_page(page_size)
+        results = self._iter_query(container, query, parameters, cursor, page.max_items)
+        try:
+            async for item, resume in results:
+                if not projected:
+                    item = strip_system_fields(item)
+                if not page.offer(item, resume):
+                    break
+        finally:
+            await results.aclose()
+        return page, self._encode_cursor(query, parameters, page)
+    
+    async def warmup(self):
+        """Open the pooled async client and load the claim index now instead of on the first tool call."""
+        container = self._get_container()
+        await self._refresh_claim_index(container, self._get_claim_index())
+    
+    async def _refresh_claim_index(self, container, index: ClaimIndex, max_age: float = None):
+        """Warm or incrementally refresh the claim index if it is due."""
+        if not index.try_begin_refresh(max_age):
+            return
+        applied = False
+        try:
+            if index.partition_key_path is None:
+                container_props = await container.read()
+                index.set_partition_key_paths(container_props.get("partitionKey", {}).get("paths", []))
+            query, parameters = index.projection_query()
+            index.apply(await self._collect(container.query_items(query=query, parameters=parameters)))
+            applied = True
+        except Exception:
+            pass
+        finally:
+            # CancelledError is not an Exception: without this the index would stay "refreshing" forever
+            if not applied:
+                index.abort_refresh()
+    
+    async def _point_read_claim(self, container, claim_id: str):
+        """Read a claim with a single-partition point read; None if the index has no entry."""
+        index = self._get_claim_index()
+        await self._refresh_claim_index(container, index)
+        location = index.lookup(claim_id)
+        if location is None:
+            return None
+        try:
+            return await container.read_item(item=location[0], partition_key=location[1])
+        except Exception as e:
+            if _is_not_found(e):
+                index.discard(claim_id)
+                return None
+            raise
+    
+    async def _fetch_claim_document(self, container, claim_id: str):
+        """Load a claim document: point read via the claim index, else a query by claim_id."""
+        index = self._get_claim_index()
+        document = await self._point_read_claim(container, claim_id)
+        if document is not None:
+            return document
+        
+        # Index miss is not authoritative - query, single-partition when possible
+        partition_key = index.claim_partition(claim_id)
+        items = await self._collect(container.query_items(
+            query="SELECT * FROM c WHERE c.claim_id = @claim_id",
+            parameters=[{"name": "@claim_id", "value": claim_id}],
+            max_item_count=1,
+            **({"partition_key": partition_key} if partition_key is not None else {})
+        ))
+        if not items:
+            return None
+        
+        self._get_claim_index().record(items[0])
+        return items[0]
+    
+    async def _fetch_document_by_id(self, container, document_id: str, partition_key: str = None):
+        """Load a document by ID: direct read with the partition key, else a cross-partition query."""
+        if partition_key:
+            try:
+                return await container.read_item(item=document_id, partition_key=partition_key)
+            except Exception as e:
+                if _is_not_found(e):
+                    return None
+                raise
+        
+        items = await self._collect(container.query_items(
+            query="SELECT * FROM c WHERE c.id = @document_id",
+            parameters=[{"name": "@document_id", "value": document_id}],
+            max_item_count=1
+        ))
+        return items[0] if items else None
+    
+    async def _available_claim_ids(self, container, claim_id: str):
+        """Claim IDs to suggest after a miss, from the local catalog when it is warm."""
+        index = self._get_claim_index()
+        if index.is_warm():
+            await self._refresh_claim_index(container, index, index.miss_refresh_interval)
+            return index.suggest(claim_id)
+        
+        all_items = await self._collect(container.query_items(
+            query="SELECT c.claim_id FROM c",
+            max_item_count=10
+        ))
+        return [item.get('claim_id', 'N/A') for item in all_items]
+    
+    async def _revalidate_document(self, container, document, reload, partition_key: str = None):
+        """Conditional read on the cached _etag: the cached document if unchanged, the new one otherwise, None if deleted."""
+        etag = document.get("_etag")
+        if partition_key is None:
+            partition_key = self._get_claim_index().partition_key_of(document)
+        if not etag or partition_key is None or "id" not in document:
+            return await reload()
+        try:
+            fresh = await container.read_item(item=document["id"], partition_key=partition_key, initial_headers={"If-None-Match": etag})
+        except Exception as e:
+            if getattr(e, "status_code", None) == 304:
+                return document
+            if _is_not_found(e):
+                return None
+            raise
+        return fresh or document
+    
+    @kernel_function(description="Test Cosmos DB connection and list available claims")
+    async def test_connection(self) -> Annotated[str, "Connection test result and available claims"]:
+        """Test the Cosmos DB connection and show what claims are available."""
+        try:
+            container = self._get_container()
+            
+            items = await self._collect(container.query_items(
+                query="SELECT c.claim_id, c.id FROM c",
+                max_item_count=10
             ))
             
-            if not items:
-                return f"🔍 No documents found where {field_name} = '{field_value}'"
+            return self._respond("test_connection", self._format_connection_test(items))
             
-            result = {
-                "search_criteria": f"{field_name} = '{field_value}'",
-                "count": len(items),
-                "documents": items
-            }
+        except Exception as e:
+            return f"❌ Connection test failed: {str(e)}"
+    
+    @kernel_function(description="Retrieve a document by claim_id from Cosmos DB using cross-partition query")
+    async def get_document_by_claim_id(
+        self, 
+        claim_id: Annotated[str, "The claim_id to retrieve (not the partition key)"]
+    ) -> Annotated[str, "JSON document from Cosmos DB"]:
+        """Retrieve a document by its claim_id through the shared cache, point read or cross-partition query."""
+        try:
+            container = self._get_container()
+            
+            document = await self.document_cache.get_or_load_async(
+                ("claim_id", claim_id),
+                lambda: self._fetch_claim_document(container, claim_id),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_claim_document(container, claim_id))
+            )
             
-            return json.dumps(result, indent=2, ensure_ascii=False)
+            if document is None:
+                return self._format_claim_not_found(claim_id, await self._available_claim_ids(container, claim_id))
+            
+            return self._respond("get_document_by_claim_id", self._format_document(document, "get_document_by_claim_id"))
+            
+        except Exception as e:
+            return self._format_claim_error(claim_id, e)
+    
+    @kernel_function(description="Retrieve a JSON document by partition key and document ID from Cosmos DB")
+    async def get_document_by_id(
+        self, 
+        document_id: Annotated[str, "The document ID to retrieve"],
+        partition_key: Annotated[str, "The partition key value (optional, will use cross-partition query if not provided)"] = None
+    ) -> Annotated[str, "JSON document from Cosmos DB"]:
+        """Retrieve a specific document by its ID and optionally partition key, through the shared cache."""
+        try:
+            container = self._get_container()
+            
+            document = await self.document_cache.get_or_load_async(
+                ("id", document_id, partition_key),
+                lambda: self._fetch_document_by_id(container, document_id, partition_key),
+                lambda stale: self._revalidate_document(container, stale, lambda: self._fetch_document_by_id(container, document_id, partition_key), partition_key)
+            )
+            
+            if document is None:
+                return self._format_document_not_found(document_id)
+            
+            return self._respond("get_document_by_id", self._format_document(document, "get_document_by_id"))
+            
+        except Exception as e:
+            return self._format_document_error(document_id, e)
+    
+    @kernel_function(description="Query documents with a custom SQL query in Cosmos DB. Results are paged; pass next_cursor back to get more")
+    async def query_documents(
+        self, 
+        sql_query: Annotated[str, "SQL query to execute (e.g., 'SELECT * FROM c WHERE c.category = \"electronics\"')"],
+        page_size: Annotated[int, "Maximum number of results to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same query, to continue paging"] = None
+    ) -> Annotated[str, "Query results as JSON"]:
+        """Execute a custom SQL query against the Cosmos DB container, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            page, next_cursor = await self._read_page(container, sql_query, None, cursor, page_size)
+            
+            return self._respond("query_documents", self._format_query_results(sql_query, page, next_cursor))
+            
+        except Exception as e:
+            return self._format_query_error(sql_query, e)
+    
+    @kernel_function(description="Get container information and statistics")
+    async def get_container_info(self) -> Annotated[str, "Container information and statistics"]:
+        """Get information about the Cosmos DB container."""
+        try:
+            container = self._get_container()
+            
+            container_props = await container.read()
+            count_items = await self._collect(container.query_items(query="SELECT VALUE COUNT(1) FROM c"))
+            
+            return self._respond("get_container_info", self._format_container_info(container_props, count_items))
+            
+        except Exception as e:
+            return f"❌ Error getting container info: {str(e)}"
+    
+    @kernel_function(description="List recent claims (summary fields, up to 100 per page) from Cosmos DB. Pass next_cursor back to get more")
+    async def list_recent_documents(
+        self, 
+        limit: Annotated[int, "Maximum number of documents to return (default: 10, max: 100)"] = 10,
+        cursor: Annotated[str, "next_cursor from a previous call, to continue paging"] = None
+    ) -> Annotated[str, "List of recent documents"]:
+        """List recent documents from the container, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            select_list = self._select_list("list_recent_documents")
+            page, next_cursor = await self._read_page(
+                container,
+                f"SELECT {select_list} FROM c ORDER BY c._ts DESC",
+                None,
+                cursor,
+                limit,
+                projected=select_list != "*"
+            )
+            
+            return self._respond("list_recent_documents", self._format_recent_documents(page, next_cursor))
+            
+        except Exception as e:
+            return f"❌ Error listing documents: {str(e)}"
+    
+    @kernel_function(description="Search documents by field value. Results are paged; pass next_cursor back to get more")
+    async def search_by_field(
+        self, 
+        field_name: Annotated[str, "The field name to search in (e.g., 'name', 'category', 'status')"],
+        field_value: Annotated[str, "The value to search for"],
+        page_size: Annotated[int, "Maximum number of documents to return (default: 25, max: 100)"] = 25,
+        cursor: Annotated[str, "next_cursor from a previous call with the same search, to continue paging"] = None
+    ) -> Annotated[str, "Documents matching the search criteria"]:
+        """Search for documents where a specific field matches a value, one page at a time."""
+        try:
+            container = self._get_container()
+            
+            select_list = self._select_list("search_by_field")
+            page, next_cursor = await self._read_page(
+                container,
+                f"SELECT {select_list} FROM c WHERE c.{field_name} = @field_value",
+                [{"name": "@field_value", "value": field_value}],
+                cursor,
+                page_size,
+                projected=select_list != "*"
+            )
+            
+            return self._respond("search_by_field", self._format_search_results(field_name, field_value, page, next_cursor))
             
         except Exception as e:
             return f"❌ Error searching documents: {str(e)}"
 
+class AgentRegistry:
+    """
+    Process-wide registry of Azure AI Agent Service definitions and their AzureAIAgent wrappers.
+    Definitions are matched by name and a hash of their configuration (model, instructions,
+    description, tools) stored in the agent metadata, so create_agent only runs when an agent
+    is missing or its configuration changed. Definitions are also tagged with an owner (the
+    deployment, AGENT_REGISTRY_OWNER), and only this owner's definitions are reused or
+    garbage-collected, so deployments sharing a project never delete each other's agents.
+    The project client and the wrappers are bound to the event loop that created them and
+    are rebuilt when used from a different loop.
+    """
+
+    HASH_METADATA_KEY = "config_hash"
+    OWNER_METADATA_KEY = "registry_owner"
+
+    def __init__(self, endpoint: str = None, owner: str = None, keep_versions: int = None):
+        self.endpoint = endpoint or os.environ.get("AI_FOUNDRY_PROJECT_ENDPOINT")
+        self.owner = owner or os.environ.get("AGENT_REGISTRY_OWNER") or os.environ.get("CONTAINER_APP_NAME") or "insurance-orchestration"
+        # Stale versions kept by collect_garbage, newest first, so a rolling update's old revision keeps working
+        self.keep_versions = keep_versions if keep_versions is not None else int(os.environ.get("AGENT_REGISTRY_KEEP_VERSIONS", "1"))
+        self._credential = None
+        self._client = None
+        self._loop = None
+        self._lock = None
+        # name -> agent definitions in the project, newest first (plain data, survives loop changes)
+        self._definitions = None
+        # name -> ID of the definition currently in use by this process
+        self._current = {}
+        # (name, config hash) -> AzureAIAgent
+        self._agents = {}
+
+    def _bind_loop(self):
+        """Close and drop the client and wrappers that belong to a previous event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            close_on_loop([self._client, self._credential], self._loop)
+            self._credential = None
+            self._client = None
+            self._agents = {}
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    def get_client(self):
+        """Return the shared project client, creating it and its credential on first use."""
+        self._bind_loop()
+        if self._client is None:
+            self._credential = DefaultAzureCredential()
+            self._client = AzureAIAgent.create_client(credential=self._credential, endpoint=self.endpoint)
+        return self._client
+
+    @classmethod
+    def config_hash(cls, **config) -> str:
+        """Stable hash of an agent configuration."""
+        encoded = json.dumps(config, sort_keys=True, default=lambda value: value.as_dict() if hasattr(value, "as_dict") else str(value))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+    def _owns(self, definition) -> bool:
+        return (definition.metadata or {}).get(self.OWNER_METADATA_KEY) == self.owner
+
+    async def _load_definitions(self, client):
+        """List the project's agents once per process, grouped by name."""
+        if self._definitions is None:
+            definitions = {}
+            async for definition in client.agents.list_agents():
+                definitions.setdefault(definition.name, []).append(definition)
+            for versions in definitions.values():
+                versions.sort(key=lambda definition: definition.created_at, reverse=True)
+            self._definitions = definitions
+        return self._definitions
+
+    async def get_or_create(self, name: str, model: str, instructions: str, description: str = None, tools=None, tool_resources=None, headers: dict = None, plugins=None) -> AzureAIAgent:
+        """
+        Return the cached AzureAIAgent for this configuration. An existing definition with
+        the same name and config hash is reused; otherwise a new one is created.
+        """
+        client = self.get_client()
+        digest = self.config_hash(model=model, instructions=instructions, description=description, tools=tools, tool_resources=tool_resources)
+        agent = self._agents.get((name, digest))
+        if agent is not None:
+            return agent
+        
+        async with self._lock:
+            agent = self._agents.get((name, digest))
+            if agent is not None:
+                return agent
+            
+            definitions = await self._load_definitions(client)
+            definition = next(
+                (version for version in definitions.get(name, [])
+                 if self._owns(version) and (version.metadata or {}).get(self.HASH_METADATA_KEY) == digest),
+                None
+            )
+            if definition is None:
+                print(f"🆕 Creating agent definition {name} ({digest})...")
+                definition = await client.agents.create_agent(
+                    model=model,
+                    name=name,
+                    description=description,
+                    instructions=instructions,
+                    tools=tools,
+                    tool_resources=tool_resources,
+                    metadata={self.HASH_METADATA_KEY: digest, self.OWNER_METADATA_KEY: self.owner},
+                    headers=headers or {},
+                )
+                definitions.setdefault(name, []).insert(0, definition)
+            else:
+                print(f"♻️ Reusing agent definition {name} ({definition.id})")
+            
+            agent = AzureAIAgent(client=client, definition=definition, plugins=plugins)
+            self._agents[(name, digest)] = agent
+            self._current[name] = definition.id
+            return agent
+
+    async def collect_garbage(self, dry_run: bool = False):
+        """
+        Delete stale versions of the agents registered by this process: definitions this owner
+        created with the same name but another config hash, and duplicates of the current one,
+        except the keep_versions newest. Untagged and other owners' definitions are never touched.
+        Returns the IDs of the deleted (or, with dry_run, deletable) definitions.
+        """
+        client = self.get_client()
+        async with self._lock:
+            definitions = await self._load_definitions(client)
+            stale = []
+            for name, current in self._current.items():
+                # definitions are sorted newest first
+                owned = [version for version in definitions.get(name, []) if version.id != current and self._owns(version)]
+                stale.extend(owned[self.keep_versions:])
+            
+            deleted = []
+            for version in stale:
+                if not dry_run:
+                    try:
+                        await client.agents.delete_agent(version.id)
+                    except Exception as e:
+                        print(f"⚠️ Could not delete stale agent {version.name} ({version.id}): {str(e)}")
+                        continue
+                    definitions[version.name].remove(version)
+                deleted.append(version.id)
+            
+            if deleted:
+                print(f"🧹 {'Found' if dry_run else 'Deleted'} {len(deleted)} stale agent definition(s)")
+            return deleted
+
+    async def close(self):
+        """Close the project client and credential and drop the cached wrappers."""
+        client, credential = self._client, self._credential
+        self._client = None
+        self._credential = None
+        self._agents = {}
+        self._loop = None
+        for resource in (client, credential):
+            if resource is None:
+                continue
+            try:
+                await resource.close()
+            except Exception:
+                pass
+
+# Shared by every orchestration run in this process
+agent_registry = AgentRegistry()
+
 async def create_specialized_agents():
-    """Create our specialized insurance processing agents using Semantic Kernel."""
+    """Create our specialized insurance processing agents using Semantic Kernel, reusing existing agent definitions."""
     
     print("🔧 Creating specialized insurance agents...")
     
-    # Create Cosmos DB plugin instances for different agents
-    cosmos_plugin_claims = CosmosDBPlugin()
-    cosmos_plugin_risk = CosmosDBPlugin()
+    # Create non-blocking Cosmos DB plugin instances for different agents (both share the pooled async client)
+    cosmos_plugin_claims = AsyncCosmosDBPlugin(client_pool=async_cosmos_client_pool)
+    cosmos_plugin_risk = AsyncCosmosDBPlugin(client_pool=async_cosmos_client_pool)
     
     # Get environment variables
     endpoint = os.environ.get("AI_FOUNDRY_PROJECT_ENDPOINT")
     model_deployment = os.environ.get("MODEL_DEPLOYMENT_NAME", "gpt-4.1-mini")
     
-    agents = {}
+    # Definitions and wrappers are reused across runs; create_agent only runs for new or changed agents
+    agent_registry.endpoint = endpoint
+    client = agent_registry.get_client()
     
-    async with DefaultAzureCredential() as creds:
-        client = AzureAIAgent.create_client(credential=creds, endpoint=endpoint)
-        
-        # Create Claim Reviewer Agent with Cosmos DB access
-        print("🔍 Creating Claim Reviewer Agent...")
-        claim_reviewer_definition = await client.agents.create_agent(
-            model=model_deployment,
-            name="ClaimReviewer",
-            description="Expert Insurance Claim Reviewer Agent specialized in analyzing and validating insurance claims",
-            instructions="""You are an expert Insurance Claim Reviewer Agent specialized in analyzing and validating insurance claims. 
+    # Create Claim Reviewer Agent with Cosmos DB access
+    print("🔍 Creating Claim Reviewer Agent...")
+    claim_reviewer_agent = await agent_registry.get_or_create(
+        model=model_deployment,
+        name="ClaimReviewer",
+        description="Expert Insurance Claim Reviewer Agent specialized in analyzing and validating insurance claims",
+        instructions="""You are an expert Insurance Claim Reviewer Agent specialized in analyzing and validating insurance claims. 
             Your primary responsibilities include:
             1. Use the Cosmos DB plugin to retrieve claim data by claim_id, then:
             2.Review all claim details (dates, amounts, descriptions).
@@ -358,21 +1729,16 @@ async def create_specialized_agents():
 
             A short paragraph description if the CLAIM STATUS is: VALID / QUESTIONABLE / INVALID ; Analysis: Summary of findings by component; Any missing Info / Concerns: List of issues or gaps;
             Next Steps: Clear, actionable recommendations
-    """
-        )
-        
-        claim_reviewer_agent = AzureAIAgent(
-            client=client,
-            definition=claim_reviewer_definition,
-            plugins=[cosmos_plugin_claims]
-        )
-        
-        # Create Risk Analyzer Agent with Cosmos DB access
-        print("⚠️ Creating Risk Analyzer Agent...")
-        risk_analyzer_definition = await client.agents.create_agent(
-            model=model_deployment,
-            name="RiskAnalyzer",
-            instructions="""You are the Risk Analysis Agent. Your role is to evaluate the authenticity of insurance claims and detect potential fraud using available claim data.
+    """,
+        plugins=[cosmos_plugin_claims]
+    )
+    
+    # Create Risk Analyzer Agent with Cosmos DB access
+    print("⚠️ Creating Risk Analyzer Agent...")
+    risk_analyzer_agent = await agent_registry.get_or_create(
+        model=model_deployment,
+        name="RiskAnalyzer",
+        instructions="""You are the Risk Analysis Agent. Your role is to evaluate the authenticity of insurance claims and detect potential fraud using available claim data.
             Core Functions:
             - Analyze historical and current claim data
             - Identify suspicious patterns, inconsistencies, or anomalies
@@ -402,25 +1768,19 @@ async def create_specialized_agents():
 
             Base all assessments strictly on the available claim data. Use structured reasoning and avoid assumptions beyond the data.
             """,
-        )
-        
-        risk_analyzer_agent = AzureAIAgent(
-            client=client,
-            definition=risk_analyzer_definition,
-            plugins=[cosmos_plugin_risk]
-        )
-        
-        ai_agent_settings = AzureAIAgentSettings(model_deployment_name= os.environ.get("MODEL_DEPLOYMENT_NAME"), azure_ai_search_connection_id=os.environ.get("AZURE_AI_AGENT_ENDPOINT"))        
-        ai_search = AzureAISearchTool(
-            index_connection_id=os.environ.get("AZURE_AI_CONNECTION_ID"), 
-            index_name="insurance-documents-index"
-        )
+        plugins=[cosmos_plugin_risk]
+    )
+    
+    ai_search = AzureAISearchTool(
+        index_connection_id=os.environ.get("AZURE_AI_CONNECTION_ID"), 
+        index_name="insurance-documents-index"
+    )
 
-        # Create agent definition
-        policy_agent_definition = await client.agents.create_agent(
-            name="PolicyChecker", 
-            model=os.environ.get("MODEL_DEPLOYMENT_NAME"),
-            instructions=""""
+    # Create agent definition
+    policy_checker_agent = await agent_registry.get_or_create(
+        name="PolicyChecker", 
+        model=os.environ.get("MODEL_DEPLOYMENT_NAME"),
+        instructions=""""
             You are the Policy Checker Agent.
 
             Your task is to summarize a policy based on policy number.
@@ -439,44 +1799,33 @@ async def create_specialized_agents():
 
             Be precise, objective, and rely solely on the policy content.
             """,
-            tools=ai_search.definitions,
-            tool_resources=ai_search.resources,
-            headers={"x-ms-enable-preview": "true"},
-        )
-
-        policy_checker_agent = AzureAIAgent(
-            client=client, 
-            definition=policy_agent_definition
-        )
-
-        agents = {
-            'claim_reviewer': claim_reviewer_agent,
-            'risk_analyzer': risk_analyzer_agent,
-            'policy_checker': policy_checker_agent
-        }
-        
-        print("✅ All specialized agents created/loaded successfully!")
-        return agents, client
+        tools=ai_search.definitions,
+        tool_resources=ai_search.resources,
+        headers={"x-ms-enable-preview": "true"},
+    )
 
-async def run_insurance_claim_orchestration(claim_id: str, policy_number: str):
-    """Orchestrate multiple agents to process an insurance claim concurrently using only the claim ID."""
+    agents = {
+        'claim_reviewer': claim_reviewer_agent,
+        'risk_analyzer': risk_analyzer_agent,
+        'policy_checker': policy_checker_agent
+    }
     
-    print(f"🚀 Starting Concurrent Insurance Claim Processing Orchestration")
-    print(f"{'='*80}")
+    # Opt-in: remove older versions of these agents left behind by previous deployments
+    if os.environ.get("AGENT_REGISTRY_GC", "").lower() in ("1", "true", "yes"):
+        await agent_registry.collect_garbage()
     
-    # Create our specialized agents
-    agents, client = await create_specialized_agents()
+    print("✅ All specialized agents created/loaded successfully!")
+    return agents, client
+
+async def process_claim(agents: Dict[str, Any], runtime: InProcessRuntime, claim_id: str, policy_number: str, timeout: float = 300):
+    """Run one claim through the concurrent orchestration on an already started runtime."""
     
     # Create concurrent orchestration with all three agents
     orchestration = ConcurrentOrchestration(
         members=[agents['claim_reviewer'], agents['risk_analyzer'], agents['policy_checker']]
     )
     
-    # Create and start runtime
-    runtime = InProcessRuntime()
-    runtime.start()
-    
-    try:        
+    try:
         # Create task that instructs agents to retrieve claim details first
         task = f"""Analyze the insurance claim with ID: {claim_id} or the policy number {policy_number} and come back with a critical solution for if the credit should be approved.
 
@@ -518,7 +1867,7 @@ Do not provide generic responses - base your analysis on the specific claim data
         )
         
         # Get results from all agents
-        results = await orchestration_result.get(timeout=300)  # 5 minute timeout
+        results = await orchestration_result.get(timeout=timeout)
         
         print(f"\n🎉 All agents completed their analysis!")
         print(f"{'─'*60}")
@@ -544,16 +1893,349 @@ Do not provide generic responses - base your analysis on the specific claim data
     except Exception as e:
         print(f"❌ Error during orchestration: {str(e)}")
         raise
+
+async def run_insurance_claim_orchestration(claim_id: str, policy_number: str):
+    """Orchestrate multiple agents to process an insurance claim concurrently using only the claim ID."""
+    
+    print(f"🚀 Starting Concurrent Insurance Claim Processing Orchestration")
+    print(f"{'='*80}")
+    
+    # Create our specialized agents
+    agents, client = await create_specialized_agents()
+    
+    # Create and start runtime
+    runtime = InProcessRuntime()
+    runtime.start()
+    
+    try:
+        return await process_claim(agents, runtime, claim_id, policy_number)
         
     finally:
         await runtime.stop_when_idle()
         print(f"\n🧹 Orchestration cleanup complete.")
 
+def read_claim_batch(path: str):
+    """Yield {"claim_id", "policy_number"} rows from a CSV (with a header row) or JSONL file, one at a time."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            claim_id = (row.get("claim_id") or "").strip()
+            if claim_id:
+                yield {"claim_id": claim_id, "policy_number": (row.get("policy_number") or "").strip()}
+
+async def run_claim_batch(input_path: str, output_path: str, checkpoint_path: str = None, concurrency: int = None, claim_timeout: float = None):
+    """
+    Process a CSV/JSONL batch of claims through one set of shared agents and one runtime.
+    Results are appended to output_path (JSONL) as each claim finishes. Completed claims are
+    recorded in the checkpoint file, so rerunning the same command after a crash skips them;
+    failed or timed-out claims are written to the output but retried on the next run.
+    """
+    concurrency = concurrency or int(os.environ.get("BATCH_CONCURRENCY", "4"))
+    claim_timeout = claim_timeout or float(os.environ.get("BATCH_CLAIM_TIMEOUT_SECONDS", "300"))
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    
+    completed = set()
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            completed = {line.rstrip("\n") for line in f if line.strip()}
+        print(f"♻️ Resuming batch: {len(completed)} claims already completed")
+    
+    print(f"🚀 Starting batch orchestration of {input_path} ({concurrency} concurrent claims)")
+    agents, client = await create_specialized_agents()
+    runtime = InProcessRuntime()
+    runtime.start()
+    
+    # A small queue keeps only a few pending claims in memory, however large the input is
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    started = time.time()
+    
+    with open(output_path, "a", encoding="utf-8") as output, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        
+        async def worker():
+            while True:
+                row = await queue.get()
+                if row is None:
+                    return
+                key = json.dumps([row["claim_id"], row["policy_number"]])
+                claim_started = time.time()
+                result = dict(row)
+                try:
+                    result["analysis"] = await asyncio.wait_for(
+                        process_claim(agents, runtime, row["claim_id"], row["policy_number"], claim_timeout),
+                        timeout=claim_timeout
+                    )
+                    result["status"] = "completed"
+                except asyncio.TimeoutError:
+                    result["status"] = "timeout"
+                    result["error"] = f"No result within {claim_timeout}s"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                result["seconds"] = round(time.time() - claim_started, 3)
+                
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                if result["status"] == "completed":
+                    # Checkpoint only after the result is on disk
+                    checkpoint.write(key + "\n")
+                    checkpoint.flush()
+                    counts["completed"] += 1
+                    print(f"✅ {row['claim_id']} completed in {result['seconds']}s")
+                else:
+                    counts["failed"] += 1
+                    print(f"❌ {row['claim_id']} {result['status']}: {result['error']}")
+        
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for row in read_claim_batch(input_path):
+                if json.dumps([row["claim_id"], row["policy_number"]]) in completed:
+                    counts["skipped"] += 1
+                    continue
+                await queue.put(row)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await runtime.stop_when_idle()
+    
+    print(f"\n🎉 Batch complete in {time.time() - started:.1f}s: {counts['completed']} completed, {counts['failed']} failed, {counts['skipped']} skipped (already done)")
+    return counts
+
+class ClaimJob:
+    """A claim submitted to the orchestration service and its outcome."""
+
+    def __init__(self, claim_id: str, policy_number: str):
+        self.id = uuid.uuid4().hex
+        self.claim_id = claim_id
+        self.policy_number = policy_number
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        job = {
+            "job_id": self.id,
+            "claim_id": self.claim_id,
+            "policy_number": self.policy_number,
+            "status": self.status,
+        }
+        if self.started_at:
+            job["queue_seconds"] = round(self.started_at - self.submitted_at, 3)
+        if self.finished_at:
+            job["processing_seconds"] = round(self.finished_at - self.started_at, 3)
+        if self.result is not None:
+            job["analysis"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+class OrchestrationService:
+    """
+    Long-lived orchestration: credentials, project client, agents and the InProcessRuntime
+    are created once at startup and shared by every claim. Claims wait in a bounded queue
+    and at most max_concurrency of them run at a time; submit() fails fast when the queue
+    is full so callers get backpressure instead of unbounded latency.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue: int = None, claim_timeout: float = None, max_jobs: int = None):
+        self.max_concurrency = max_concurrency or int(os.environ.get("ORCHESTRATION_MAX_CONCURRENCY", "4"))
+        self.max_queue = max_queue or int(os.environ.get("ORCHESTRATION_MAX_QUEUE", "32"))
+        self.claim_timeout = claim_timeout or float(os.environ.get("ORCHESTRATION_CLAIM_TIMEOUT_SECONDS", "300"))
+        self.max_jobs = max_jobs or int(os.environ.get("ORCHESTRATION_MAX_JOBS", "1000"))
+        self.agents = None
+        self.runtime = None
+        self._queue = None
+        self._workers = []
+        self._running = 0
+        # Recent jobs by ID, oldest first; finished ones are dropped beyond max_jobs
+        self._jobs = OrderedDict()
+
+    async def start(self):
+        """Create the agents and runtime and start the workers."""
+        print(f"🚀 Starting orchestration service ({self.max_concurrency} concurrent claims, queue of {self.max_queue})")
+        self.agents, _ = await create_specialized_agents()
+        # Open the pooled Cosmos DB client and load the shared claim index before the first claim
+        try:
+            await AsyncCosmosDBPlugin(client_pool=async_cosmos_client_pool).warmup()
+        except Exception as e:
+            print(f"⚠️ Cosmos DB warmup failed, continuing cold: {str(e)}")
+        self.runtime = InProcessRuntime()
+        self.runtime.start()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        print("✅ Orchestration service ready")
+
+    async def stop(self):
+        """Stop the workers and release the runtime, agents and pooled clients."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.runtime is not None:
+            await self.runtime.stop_when_idle()
+            self.runtime = None
+        await agent_registry.close()
+        await close_async_cosmos_clients()
+        print("🧹 Orchestration service stopped")
+
+    def submit(self, claim_id: str, policy_number: str) -> ClaimJob:
+        """Queue a claim; raises asyncio.QueueFull when the service is saturated."""
+        job = ClaimJob(claim_id, policy_number)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._trim_jobs()
+        return job
+
+    def get_job(self, job_id: str) -> ClaimJob:
+        return self._jobs.get(job_id)
+
+    def _trim_jobs(self):
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done.is_set()][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await process_claim(self.agents, self.runtime, job.claim_id, job.policy_number, self.claim_timeout)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                self._running -= 1
+                job.finished_at = time.time()
+                job.done.set()
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "status": "ok" if self._workers else "starting",
+            "running": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+def create_service_app(service: OrchestrationService = None):
+    """
+    Starlette app exposing the orchestration service:
+    POST /claims {"claim_id", "policy_number", "wait"} - 200 with the analysis, or 202 with a job ID
+    (when wait is false or the claim is still running after ORCHESTRATION_WAIT_SECONDS);
+    429 with Retry-After when the queue is full. GET /claims/{job_id} polls a job, GET /health reports load.
+    """
+    from contextlib import asynccontextmanager
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+    
+    service = service or OrchestrationService()
+    wait_seconds = float(os.environ.get("ORCHESTRATION_WAIT_SECONDS", "290"))
+    
+    async def submit_claim(request):
+        try:
+            body = await request.json()
+        except Exception:
+            return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+        claim_id = body.get("claim_id")
+        if not claim_id:
+            return JSONResponse({"error": "claim_id is required"}, status_code=400)
+        try:
+            job = service.submit(claim_id, body.get("policy_number", ""))
+        except asyncio.QueueFull:
+            return JSONResponse(
+                {"error": "Orchestration queue is full, retry later", **service.stats()},
+                status_code=429,
+                headers={"Retry-After": str(max(1, int(service.claim_timeout // 10)))}
+            )
+        if body.get("wait", True):
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=wait_seconds)
+            except asyncio.TimeoutError:
+                pass
+        if not job.done.is_set():
+            return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/claims/{job.id}"})
+        return JSONResponse(job.to_dict(), status_code=200 if job.status == "completed" else 500)
+    
+    async def get_claim(request):
+        job = service.get_job(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "Unknown job"}, status_code=404)
+        return JSONResponse(job.to_dict())
+    
+    async def health(request):
+        return JSONResponse(service.stats())
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        await service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+    
+    return Starlette(
+        routes=[
+            Route("/claims", submit_claim, methods=["POST"]),
+            Route("/claims/{job_id}", get_claim, methods=["GET"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+def serve():
+    """Run the orchestration service on PORT (default 8000)."""
+    import uvicorn
+    uvicorn.run(create_service_app(), host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "8000")))
+
 if __name__ == "__main__":
     import os
+    import sys
+    # ORCHESTRATION_MODE=service (or "serve" as an argument) keeps the agents warm behind an HTTP API
+    if os.environ.get("ORCHESTRATION_MODE", "once").lower() == "service" or sys.argv[1:2] == ["serve"]:
+        serve()
+        sys.exit(0)
+    
+    # python orchestration.py batch <claims.jsonl|claims.csv> <results.jsonl> [checkpoint]
+    if sys.argv[1:2] == ["batch"]:
+        async def run_batch():
+            try:
+                await run_claim_batch(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+            finally:
+                await agent_registry.close()
+                await close_async_cosmos_clients()
+        
+        asyncio.run(run_batch())
+        sys.exit(0)
+    
     # Get claim ID and policy number from environment variables or use defaults
     claim_id = os.environ.get("CLAIM_ID", "CL001")  # Use a real claim ID
     policy_number = os.environ.get("POLICY_NUMBER", "LIAB-AUTO-001")  # Use a real policy number
     
     print(f"Processing Claim ID: {claim_id}, Policy Number: {policy_number}")
-    asyncio.run(run_insurance_claim_orchestration(claim_id, policy_number))
\ No newline at end of file
+    
+    async def main():
+        try:
+            await run_insurance_claim_orchestration(claim_id, policy_number)
+        finally:
+            await agent_registry.close()
+            await close_async_cosmos_clients()
+    
+    asyncio.run(main())
\ No newline at end of file